@@ -0,0 +1,73 @@
+"""
+Temps d'importació en fred del model de costos.
+
+Cada mesura es fa en un intèrpret nou, perquè cap mòdul no estigui ja carregat, i es queda la mediana de diverses
+repeticions. Falla (codi de sortida 1) si algun mòdul supera el pressupost o si carrega alguna de les dependències
+pesades de la interfície.
+
+Ús:
+    python benchmarks/bench_importacio.py
+    python benchmarks/bench_importacio.py --repeticions 20 --pressupost-ms 30
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ARREL = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Mòduls que s'han de poder importar ràpidament per fer servir el model des d'altres eines
+MODULS = ('cost_model', 'cluster_cost_calculator')
+DEPENDENCIES_PESADES = ('numpy', 'pandas', 'streamlit', 'altair')
+PRESSUPOST_MS_PER_DEFECTE = 50.0
+
+_MESURA = """
+import json, sys, time
+inici = time.perf_counter()
+import {modul}
+durada = time.perf_counter() - inici
+print(json.dumps({{'ms': durada * 1000, 'carregades': [nom for nom in {pesades!r} if nom in sys.modules]}}))
+"""
+
+
+def mesurar_importacio(modul, repeticions=10):
+    """
+    Importa `modul` en `repeticions` intèrprets nous i retorna la mediana del temps (ms) i les dependències pesades
+    que s'han carregat.
+    """
+    temps = []
+    carregades = set()
+    for _ in range(repeticions):
+        sortida = subprocess.run([sys.executable, '-c', _MESURA.format(modul=modul, pesades=DEPENDENCIES_PESADES)],
+                                 cwd=ARREL, capture_output=True, text=True, check=True).stdout
+        mesura = json.loads(sortida.strip().splitlines()[-1])
+        temps.append(mesura['ms'])
+        carregades.update(mesura['carregades'])
+    return statistics.median(temps), sorted(carregades)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comprova el temps d'importació en fred del model de costos.")
+    parser.add_argument('--repeticions', type=int, default=10, help="Intèrprets nous per mòdul (per defecte: %(default)s)")
+    parser.add_argument('--pressupost-ms', type=float, default=PRESSUPOST_MS_PER_DEFECTE,
+                        help="Temps màxim d'importació per mòdul, en ms (per defecte: %(default)s)")
+    args = parser.parse_args(argv)
+
+    correcte = True
+    for modul in MODULS:
+        mediana, carregades = mesurar_importacio(modul, args.repeticions)
+        estat = 'ok'
+        if mediana > args.pressupost_ms:
+            estat = f"SUPERA EL PRESSUPOST ({args.pressupost_ms:.0f} ms)"
+            correcte = False
+        if carregades:
+            estat = f"CARREGA {', '.join(carregades)}"
+            correcte = False
+        print(f"{modul:<28} {mediana:8.1f} ms  {estat}")
+    return 0 if correcte else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Benchmarks del model de costos i de l'execució de l'aplicació.
+
+Mesura el rendiment de les funcions escalars, el càlcul vectoritzat de graelles d'escenaris de 1e3 a 1e7 punts,
+l'empaquetament d'una cartera de 10.000 càrregues, les consultes a taules de costos precalculades, el temps
+d'importació en fred i l'execució completa de main() amb l'AppTest de Streamlit. Els resultats es desen
+en JSON i, si s'indica un fitxer de referència, es comparen amb ell: el procés acaba amb codi 1 si algun
+benchmark és més lent que la referència més la tolerància.
+
+Ús:
+    python benchmarks/bench_rendiment.py --sortida resultats.json
+    python benchmarks/bench_rendiment.py --referencia referencia.json --tolerancia 0.25
+    python benchmarks/bench_rendiment.py --mida-maxima 1000000 --sense-app
+
+Si el fitxer de referència no existeix, s'hi desen els resultats actuals. Les referències només són comparables si
+s'han generat a la mateixa màquina (o al mateix tipus de runner d'integració contínua).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+ARREL = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ARREL)
+
+from cost_model import INSTANCIES, calcular_cost_job_cluster, calcular_cost_all_purpose, calcular_escenaris  # noqa: E402
+from bench_importacio import MODULS, mesurar_importacio  # noqa: E402
+
+MIDES_GRAELLA = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+CRIDES_ESCALARS = 100_000
+CARREGUES_CARTERA = 10_000
+CONSULTES_TAULA = 10_000
+TOLERANCIA_PER_DEFECTE = 0.5
+# Diferència absoluta per sota de la qual no es considera regressió (soroll del rellotge i del sistema)
+MARGE_MINIM_S = 0.002
+
+
+def cronometrar(funcio, temps_minim=0.2, repeticions_minimes=3):
+    """
+    Executa `funcio` com a mínim `repeticions_minimes` vegades i fins a sumar `temps_minim` segons, i retorna la
+    mediana i el mínim dels temps (s) i el nombre de repeticions.
+    """
+    temps = []
+    inici = time.perf_counter()
+    while len(temps) < repeticions_minimes or time.perf_counter() - inici < temps_minim:
+        t = time.perf_counter()
+        funcio()
+        temps.append(time.perf_counter() - t)
+    return {'segons': statistics.median(temps), 'minim': min(temps), 'repeticions': len(temps)}
+
+
+def bench_escalars():
+    driver, worker = INSTANCIES[0], INSTANCIES[1]
+
+    def job():
+        for tasques in range(CRIDES_ESCALARS):
+            calcular_cost_job_cluster(driver.cost_per_hour, worker.cost_per_hour, driver.DBUs + worker.DBUs, 0.288,
+                                      2.5, 10.0, 35, tasques)
+
+    def all_purpose():
+        for temps in range(CRIDES_ESCALARS):
+            calcular_cost_all_purpose(driver.cost_per_hour, worker.cost_per_hour, driver.DBUs + worker.DBUs, 0.528,
+                                      temps)
+
+    resultats = {}
+    for nom, funcio in (('escalar_job_cluster', job), ('escalar_all_purpose', all_purpose)):
+        resultat = cronometrar(funcio)
+        resultat['crides_per_segon'] = CRIDES_ESCALARS / resultat['segons']
+        resultats[nom] = resultat
+    return resultats
+
+
+def escenaris_aleatoris(n, llavor=0):
+    import numpy as np
+    rng = np.random.default_rng(llavor)
+    return {
+        'driver': rng.integers(0, len(INSTANCIES), n),
+        'worker': rng.integers(0, len(INSTANCIES), n),
+        'nombre_workers': rng.integers(1, 50, n),
+        'max_parallel_tasks': rng.integers(1, 200, n),
+        'nombre_tasques': rng.integers(1, 10_000, n),
+        'temps_execucio_per_tasca_min': rng.uniform(0.1, 120, n),
+        'startup_overhead_time': rng.uniform(0.1, 10, n),
+    }
+
+
+def bench_graelles(mida_maxima):
+    resultats = {}
+    for mida in MIDES_GRAELLA:
+        if mida > mida_maxima:
+            break
+        escenaris = escenaris_aleatoris(mida)
+        resultat = cronometrar(lambda: calcular_escenaris(escenaris, INSTANCIES), temps_minim=0.5)
+        resultat['escenaris_per_segon'] = mida / resultat['segons']
+        resultats[f'graella_{mida}'] = resultat
+    return resultats
+
+
+def bench_empaquetament():
+    import random
+    from cluster_packing import CarregaTreball, empaquetar_cartera
+    rng = random.Random(0)
+    carregues = [CarregaTreball(f'carrega_{i}', rng.randint(1, 500), rng.uniform(1, 30), rng.uniform(0, 24 * 60),
+                                rng.randint(1, 32), rng.choice([1, 1, 2, 4]), rng.choice([0, 2, 4, 8]),
+                                rng.choice([None, 120, 240, 600]))
+                 for i in range(CARREGUES_CARTERA)]
+    resultat = cronometrar(lambda: empaquetar_cartera(carregues, INSTANCIES, INSTANCIES[2], INSTANCIES[2], 10, 2.5),
+                           temps_minim=0, repeticions_minimes=1)
+    resultat['carregues_per_segon'] = CARREGUES_CARTERA / resultat['segons']
+    return {'empaquetament_cartera': resultat}
+
+
+def bench_taules():
+    """
+    Temps de construir la taula de costos per defecte i de consultar-la en punts de la graella i entre punts.
+    """
+    import random
+    import tempfile
+    from cost_tables import TaulaCostos, construir_taula
+    with tempfile.TemporaryDirectory() as directori:
+        ruta = os.path.join(directori, 'costos')
+        resultats = {'taula_construccio': cronometrar(lambda: construir_taula(ruta, INSTANCIES), temps_minim=0,
+                                                      repeticions_minimes=1)}
+        taula = TaulaCostos(ruta)
+        rng = random.Random(0)
+        noms = [inst.name for inst in INSTANCIES]
+        for nom, consultes in (
+                ('taula_consulta_exacta', [(rng.choice(noms), rng.choice(noms), 8, 32, 100, 10.0, 2.5)
+                                           for _ in range(CONSULTES_TAULA)]),
+                ('taula_consulta_interpolada', [(rng.choice(noms), rng.choice(noms), rng.randint(1, 64),
+                                                 rng.randint(1, 256), rng.randint(1, 10_000), rng.uniform(0.1, 120),
+                                                 rng.uniform(0, 10)) for _ in range(CONSULTES_TAULA)])):
+            resultat = cronometrar(lambda: [taula.consultar(*consulta) for consulta in consultes])
+            resultat['consultes_per_segon'] = CONSULTES_TAULA / resultat['segons']
+            resultats[nom] = resultat
+    return resultats
+
+
+def bench_importacio(repeticions=10):
+    resultats = {}
+    for modul in MODULS:
+        mediana, _carregades = mesurar_importacio(modul, repeticions)
+        resultats[f'importacio_{modul}'] = {'segons': mediana / 1000, 'repeticions': repeticions}
+    return resultats
+
+
+def bench_app():
+    """
+    Temps d'una execució completa de main() amb les caches buides (primera) i amb les caches plenes (rerun).
+    """
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("Streamlit no està instal·lat: s'ometen els benchmarks de l'aplicació", file=sys.stderr)
+        return {}
+    script = os.path.join(ARREL, 'cluster_cost_calculator.py')
+    at = AppTest.from_file(script, default_timeout=300)
+    inici = time.perf_counter()
+    at.run()
+    primera = time.perf_counter() - inici
+    if at.exception:
+        raise RuntimeError(f"L'aplicació ha fallat: {at.exception}")
+
+    def rerun():
+        at.run()
+
+    resultat = cronometrar(rerun, temps_minim=1.0)
+    return {'app_main_primera': {'segons': primera, 'repeticions': 1}, 'app_main_rerun': resultat}
+
+
+def comparar(resultats, referencia, tolerancia):
+    """
+    Retorna les regressions respecte de la referència com a llista de (nom, segons de referència, segons actuals).
+    Es compara el temps mínim quan n'hi ha, perquè és molt menys sensible a la càrrega de la màquina que la mediana.
+    """
+    regressions = []
+    for nom, resultat in resultats.items():
+        if nom not in referencia:
+            continue
+        clau = 'minim' if 'minim' in resultat and 'minim' in referencia[nom] else 'segons'
+        anterior, actual = referencia[nom][clau], resultat[clau]
+        if actual > anterior * (1 + tolerancia) and actual - anterior > MARGE_MINIM_S:
+            regressions.append((nom, anterior, actual))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del model de costos i de l'aplicació.")
+    parser.add_argument('--sortida', help="Fitxer JSON on desar els resultats")
+    parser.add_argument('--referencia', help="Fitxer JSON de referència amb què comparar els resultats")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PER_DEFECTE,
+                        help="Alentiment relatiu permès respecte de la referència (per defecte: %(default)s)")
+    parser.add_argument('--mida-maxima', type=int, default=MIDES_GRAELLA[-1],
+                        help="Mida màxima de les graelles d'escenaris (per defecte: %(default)s)")
+    parser.add_argument('--sense-app', action='store_true', help="No executa els benchmarks de l'aplicació")
+    args = parser.parse_args(argv)
+
+    resultats = {}
+    resultats.update(bench_escalars())
+    resultats.update(bench_graelles(args.mida_maxima))
+    resultats.update(bench_empaquetament())
+    resultats.update(bench_taules())
+    resultats.update(bench_importacio())
+    if not args.sense_app:
+        resultats.update(bench_app())
+
+    for nom, resultat in resultats.items():
+        extra = ''
+        if 'crides_per_segon' in resultat:
+            extra = f"{resultat['crides_per_segon']:,.0f} crides/s"
+        elif 'escenaris_per_segon' in resultat:
+            extra = f"{resultat['escenaris_per_segon']:,.0f} escenaris/s"
+        elif 'carregues_per_segon' in resultat:
+            extra = f"{resultat['carregues_per_segon']:,.0f} càrregues/s"
+        elif 'consultes_per_segon' in resultat:
+            extra = f"{resultat['consultes_per_segon']:,.0f} consultes/s"
+        print(f"{nom:<36} {resultat['segons'] * 1000:10.2f} ms  {extra}")
+
+    document = {
+        'data': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'processadors': os.cpu_count(),
+        'resultats': resultats,
+    }
+    if args.sortida:
+        with open(args.sortida, 'w', encoding='utf-8') as fitxer:
+            json.dump(document, fitxer, indent=2)
+
+    if args.referencia:
+        if not os.path.exists(args.referencia):
+            with open(args.referencia, 'w', encoding='utf-8') as fitxer:
+                json.dump(document, fitxer, indent=2)
+            print(f"Referència desada a {args.referencia}")
+            return 0
+        with open(args.referencia, encoding='utf-8') as fitxer:
+            referencia = json.load(fitxer)['resultats']
+        regressions = comparar(resultats, referencia, args.tolerancia)
+        for nom, anterior, actual in regressions:
+            print(f"REGRESSIÓ {nom}: {anterior * 1000:.2f} ms -> {actual * 1000:.2f} ms "
+                  f"({actual / anterior - 1:+.0%})", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Prova de càrrega de l'API HTTP de preus.
+
+Obre diverses connexions HTTP/1.1 persistents contra l'API i envia peticions POST /preus tan de pressa com pot
+durant el temps indicat. Una part de les peticions repeteix escenaris d'un conjunt petit (que haurien de sortir de
+la cache) i la resta són escenaris nous. En acabar, mostra les peticions per segon i les latències p50, p90 i p99,
+i opcionalment les desa en JSON.
+
+Sense --url, arrenca un servidor local amb `pricing_api.py` en un port lliure i l'atura en acabar.
+
+Ús:
+    python benchmarks/load_test_api.py --durada 10 --connexions 32
+    python benchmarks/load_test_api.py --url http://127.0.0.1:8000 --mida-lot 1000 --sortida carrega.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+ARREL = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ARREL)
+
+from cost_model import INSTANCIES  # noqa: E402
+
+ESCENARIS_REPETITS = 100
+
+
+def escenari_aleatori(rng):
+    return {
+        'driver': rng.choice(INSTANCIES).name,
+        'worker': rng.choice(INSTANCIES).name,
+        'nombre_workers': rng.randint(1, 50),
+        'max_parallel_tasks': rng.randint(1, 200),
+        'nombre_tasques': rng.randint(1, 10_000),
+        'temps_execucio_per_tasca_min': round(rng.uniform(0.5, 120), 2),
+        'startup_overhead_time': round(rng.uniform(0.5, 10), 2),
+    }
+
+
+def percentil(valors_ordenats, p):
+    if not valors_ordenats:
+        return float('nan')
+    return valors_ordenats[min(len(valors_ordenats) - 1, int(p / 100 * len(valors_ordenats)))]
+
+
+async def _peticio(lector, escriptor, host, cos):
+    escriptor.write(b'POST /preus HTTP/1.1\r\nHost: ' + host.encode() + b'\r\nContent-Type: application/json\r\n'
+                    b'Content-Length: ' + str(len(cos)).encode() + b'\r\n\r\n' + cos)
+    await escriptor.drain()
+    capcaleres = await lector.readuntil(b'\r\n\r\n')
+    estat = int(capcaleres.split(b' ', 2)[1])
+    mida = 0
+    for linia in capcaleres.split(b'\r\n'):
+        if linia.lower().startswith(b'content-length:'):
+            mida = int(linia.split(b':', 1)[1])
+    await lector.readexactly(mida)
+    return estat
+
+
+async def _connexio(host, port, final, mida_lot, repeticio, llavor, latencies, errors):
+    rng = random.Random(llavor)
+    repetits = [escenari_aleatori(random.Random(i)) for i in range(ESCENARIS_REPETITS)]
+    lector, escriptor = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < final:
+            escenaris = [rng.choice(repetits) if rng.random() < repeticio else escenari_aleatori(rng)
+                         for _ in range(mida_lot)]
+            cos = json.dumps({'escenaris': escenaris}).encode()
+            inici = time.perf_counter()
+            estat = await _peticio(lector, escriptor, host, cos)
+            latencies.append(time.perf_counter() - inici)
+            if estat != 200:
+                errors.append(estat)
+    finally:
+        escriptor.close()
+
+
+async def provar(host, port, durada, connexions, mida_lot, repeticio):
+    """
+    Executa la prova de càrrega i retorna les latències (s) de les peticions, els errors i el temps total.
+    """
+    latencies, errors = [], []
+    inici = time.perf_counter()
+    final = inici + durada
+    await asyncio.gather(*(_connexio(host, port, final, mida_lot, repeticio, i, latencies, errors)
+                           for i in range(connexions)))
+    return latencies, errors, time.perf_counter() - inici
+
+
+def _port_lliure():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _arrencar_servidor(port, workers):
+    servidor = subprocess.Popen([sys.executable, os.path.join(ARREL, 'pricing_api.py'), '--port', str(port),
+                                 '--workers', str(workers)], cwd=ARREL)
+    limit = time.monotonic() + 30
+    while time.monotonic() < limit:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return servidor
+        except OSError:
+            if servidor.poll() is not None:
+                break
+            time.sleep(0.1)
+    servidor.kill()
+    raise RuntimeError("No s'ha pogut arrencar el servidor de l'API")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prova de càrrega de l'API HTTP de preus.")
+    parser.add_argument('--url', help="URL de l'API; sense URL s'arrenca un servidor local")
+    parser.add_argument('--workers', type=int, default=1, help="Processos del servidor local (per defecte: %(default)s)")
+    parser.add_argument('--durada', type=float, default=10.0, help="Durada de la prova en segons (per defecte: %(default)s)")
+    parser.add_argument('--connexions', type=int, default=32, help="Connexions simultànies (per defecte: %(default)s)")
+    parser.add_argument('--mida-lot', type=int, default=1, help="Escenaris per petició (per defecte: %(default)s)")
+    parser.add_argument('--repeticio', type=float, default=0.8,
+                        help="Fracció d'escenaris repetits, servits des de la cache (per defecte: %(default)s)")
+    parser.add_argument('--sortida', help="Fitxer JSON on desar els resultats")
+    args = parser.parse_args(argv)
+
+    servidor = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = '127.0.0.1', _port_lliure()
+        servidor = _arrencar_servidor(port, args.workers)
+    try:
+        latencies, errors, total = asyncio.run(provar(host, port, args.durada, args.connexions, args.mida_lot,
+                                                      args.repeticio))
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+    latencies.sort()
+    resultats = {
+        'peticions': len(latencies),
+        'errors': len(errors),
+        'peticions_per_segon': len(latencies) / total,
+        'escenaris_per_segon': len(latencies) * args.mida_lot / total,
+        'p50_ms': percentil(latencies, 50) * 1000,
+        'p90_ms': percentil(latencies, 90) * 1000,
+        'p99_ms': percentil(latencies, 99) * 1000,
+        'maxim_ms': latencies[-1] * 1000 if latencies else float('nan'),
+    }
+    print(f"{resultats['peticions']} peticions en {total:.1f} s ({resultats['errors']} errors): "
+          f"{resultats['peticions_per_segon']:,.0f} peticions/s, {resultats['escenaris_per_segon']:,.0f} escenaris/s")
+    print(f"Latència: p50 {resultats['p50_ms']:.2f} ms, p90 {resultats['p90_ms']:.2f} ms, "
+          f"p99 {resultats['p99_ms']:.2f} ms, màxim {resultats['maxim_ms']:.2f} ms")
+    if args.sortida:
+        with open(args.sortida, 'w', encoding='utf-8') as fitxer:
+            json.dump({'data': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                       'parametres': vars(args), 'resultats': resultats}, fitxer, indent=2)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""
+Punts d'equilibri entre Job Cluster i All-Purpose Cluster.
+
+Calcula, sense escombrar cap graella, els valors d'un paràmetre on canvia l'opció més econòmica:
+
+- El cost del Job Cluster no depèn del paral·lelisme i el de l'All-Purpose només en depèn a través del nombre
+  d'onades ceil(tasques / paral·lelisme). Per això, la diferència de costos és lineal en el temps d'execució per
+  tasca, el startup overhead, el nombre de workers de cada clúster i el preu de les DBUs, i el punt d'equilibri
+  s'obté de forma tancada.
+- En el nombre de tasques, la diferència és lineal dins de cada bloc de `max_parallel_tasks` tasques (on el
+  nombre d'onades és constant), i també ho és d'un bloc al següent. Només es resolen un per un, de forma
+  vectoritzada, els blocs on canvia l'opció; la resta es fusionen sense calcular-los, sigui quin sigui el rang.
+- En el paral·lelisme de l'All-Purpose, el cost només baixa quan baixa el nombre d'onades, i el llindar és el
+  paral·lelisme mínim que assoleix el nombre d'onades màxim que encara fa l'All-Purpose més econòmic.
+"""
+from math import ceil, floor
+
+import numpy as np
+
+from cost_model import (
+    COST_DBU_JOB, COST_DBU_ALL_PURPOSE, TIPUS_JOB, TIPUS_ALL_PURPOSE,
+    calcular_cost_job_cluster, calcular_cost_all_purpose,
+    calcular_cost_job_cluster_lot, calcular_cost_all_purpose_lot, calcular_escenaris,
+)
+
+# Paràmetres en què la diferència de costos és lineal; els marcats com a enters només prenen valors enters
+PARAMETRES_LINEALS = {
+    'temps_execucio_per_tasca_min': False,
+    'startup_overhead_time': False,
+    'nombre_workers_job': True,
+    'nombre_workers_all_purpose': True,
+    'multiplicador_dbu': False,
+}
+PARAMETRES_EQUILIBRI = tuple(PARAMETRES_LINEALS) + ('nombre_tasques', 'max_parallel_tasks_all_purpose')
+
+# Nombre màxim de blocs de `max_parallel_tasks` tasques amb un canvi d'opció a dins que es calculen un per un
+MAX_BLOCS_TASQUES = 100_000
+
+
+class ConfiguracioComparacio:
+    """
+    Configuració completa dels dos clústers i de la càrrega de treball que es comparen.
+    """
+    def __init__(self, driver_job, worker_job, nombre_workers_job, driver_all_purpose, worker_all_purpose,
+                 nombre_workers_all_purpose, max_parallel_tasks_all_purpose, nombre_tasques,
+                 temps_execucio_per_tasca_min, startup_overhead_time, max_parallel_tasks_job=1,
+                 cost_dbu_job=COST_DBU_JOB, cost_dbu_all_purpose=COST_DBU_ALL_PURPOSE, multiplicador_dbu=1.0):
+        self.driver_job = driver_job
+        self.worker_job = worker_job
+        self.nombre_workers_job = nombre_workers_job
+        self.max_parallel_tasks_job = max_parallel_tasks_job
+        self.driver_all_purpose = driver_all_purpose
+        self.worker_all_purpose = worker_all_purpose
+        self.nombre_workers_all_purpose = nombre_workers_all_purpose
+        self.max_parallel_tasks_all_purpose = max_parallel_tasks_all_purpose
+        self.nombre_tasques = nombre_tasques
+        self.temps_execucio_per_tasca_min = temps_execucio_per_tasca_min
+        self.startup_overhead_time = startup_overhead_time
+        self.cost_dbu_job = cost_dbu_job
+        self.cost_dbu_all_purpose = cost_dbu_all_purpose
+        self.multiplicador_dbu = multiplicador_dbu
+
+    def amb(self, parametre, valor):
+        """
+        Retorna una còpia de la configuració amb un paràmetre canviat.
+        """
+        copia = ConfiguracioComparacio.__new__(ConfiguracioComparacio)
+        copia.__dict__.update(self.__dict__)
+        setattr(copia, parametre, valor)
+        return copia
+
+    def costos(self):
+        """
+        Retorna el cost total del Job Cluster i de l'All-Purpose Cluster amb les funcions de l'aplicació.
+        """
+        total_DBUs_job = (1 * self.driver_job.DBUs) + (self.nombre_workers_job * self.worker_job.DBUs)
+        cost_per_tasca_job = calcular_cost_job_cluster(
+            1 * self.driver_job.cost_per_hour, self.nombre_workers_job * self.worker_job.cost_per_hour,
+            total_DBUs_job, self.cost_dbu_job * self.multiplicador_dbu, self.startup_overhead_time,
+            self.temps_execucio_per_tasca_min, self.max_parallel_tasks_job, self.nombre_tasques)[0]
+
+        total_DBUs_all_purpose = ((1 * self.driver_all_purpose.DBUs)
+                                  + (self.nombre_workers_all_purpose * self.worker_all_purpose.DBUs))
+        nombre_onades = ceil(self.nombre_tasques / self.max_parallel_tasks_all_purpose)
+        temps_total_actiu = self.startup_overhead_time + nombre_onades * self.temps_execucio_per_tasca_min
+        cost_all_purpose = calcular_cost_all_purpose(
+            1 * self.driver_all_purpose.cost_per_hour,
+            self.nombre_workers_all_purpose * self.worker_all_purpose.cost_per_hour,
+            total_DBUs_all_purpose, self.cost_dbu_all_purpose * self.multiplicador_dbu, temps_total_actiu)[0]
+        return self.nombre_tasques * cost_per_tasca_job, cost_all_purpose
+
+    def cost_per_hora_all_purpose(self):
+        """
+        Cost total per hora de l'All-Purpose Cluster (VM + DBUs).
+        """
+        total_DBUs = (1 * self.driver_all_purpose.DBUs) + (self.nombre_workers_all_purpose * self.worker_all_purpose.DBUs)
+        return calcular_cost_all_purpose(
+            1 * self.driver_all_purpose.cost_per_hour,
+            self.nombre_workers_all_purpose * self.worker_all_purpose.cost_per_hour,
+            total_DBUs, self.cost_dbu_all_purpose * self.multiplicador_dbu, 0)[3]
+
+    def diferencia(self, parametre=None, valor=None):
+        config = self if parametre is None else self.amb(parametre, valor)
+        cost_job, cost_all_purpose = config.costos()
+        return cost_job - cost_all_purpose
+
+
+def _mes_economic(diferencia):
+    return TIPUS_JOB if diferencia < 0 else TIPUS_ALL_PURPOSE
+
+
+def _regio(des_de, fins_a, opcio):
+    return {'des_de': des_de, 'fins_a': fins_a, 'opcio': opcio}
+
+
+def _regions_lineals(config, parametre, minim, maxim):
+    enter = PARAMETRES_LINEALS[parametre]
+    d_min = config.diferencia(parametre, minim)
+    d_max = config.diferencia(parametre, maxim)
+    if maxim == minim or (d_min < 0) == (d_max < 0):
+        return [_regio(minim, maxim, _mes_economic(d_min))]
+    arrel = minim - d_min * (maxim - minim) / (d_max - d_min)
+    if not enter:
+        return [_regio(minim, arrel, _mes_economic(d_min)), _regio(arrel, maxim, _mes_economic(d_max))]
+    # Paràmetre enter: últim valor que manté l'opció de `minim`, comprovat amb el model exacte
+    ultim = min(max(floor(arrel), minim), maxim - 1)
+    while ultim > minim and (config.diferencia(parametre, ultim) < 0) != (d_min < 0):
+        ultim -= 1
+    while ultim + 1 < maxim and (config.diferencia(parametre, ultim + 1) < 0) == (d_min < 0):
+        ultim += 1
+    return [_regio(minim, ultim, _mes_economic(d_min)), _regio(ultim + 1, maxim, _mes_economic(d_max))]
+
+
+def _diferencia_tasques(config, nombre_tasques):
+    """
+    Diferència exacta de costos (Job − All-Purpose) per a un array de nombres de tasques.
+    """
+    total_DBUs_job = (1 * config.driver_job.DBUs) + (config.nombre_workers_job * config.worker_job.DBUs)
+    cost_per_tasca_job = calcular_cost_job_cluster_lot(
+        1 * config.driver_job.cost_per_hour, config.nombre_workers_job * config.worker_job.cost_per_hour,
+        total_DBUs_job, config.cost_dbu_job * config.multiplicador_dbu, config.startup_overhead_time,
+        config.temps_execucio_per_tasca_min, config.max_parallel_tasks_job, nombre_tasques)[0]
+    total_DBUs_all_purpose = ((1 * config.driver_all_purpose.DBUs)
+                              + (config.nombre_workers_all_purpose * config.worker_all_purpose.DBUs))
+    nombre_onades = np.ceil(nombre_tasques / config.max_parallel_tasks_all_purpose)
+    temps_total_actiu = config.startup_overhead_time + nombre_onades * config.temps_execucio_per_tasca_min
+    cost_all_purpose = calcular_cost_all_purpose_lot(
+        1 * config.driver_all_purpose.cost_per_hour,
+        config.nombre_workers_all_purpose * config.worker_all_purpose.cost_per_hour,
+        total_DBUs_all_purpose, config.cost_dbu_all_purpose * config.multiplicador_dbu, temps_total_actiu)[0]
+    return nombre_tasques * cost_per_tasca_job - cost_all_purpose
+
+
+def _blocs_tasques(config, onades, minim, maxim):
+    """
+    Per a cada bloc de tasques amb el nombre d'`onades` indicat a l'All-Purpose, retorna l'inici, el final i l'últim
+    nombre de tasques on el Job Cluster és més econòmic (inici − 1 si no ho és en cap punt del bloc).
+    """
+    paral_lelisme = config.max_parallel_tasks_all_purpose
+    cost_per_tasca = config.amb('nombre_tasques', 1).costos()[0]
+    cost_per_hora = config.cost_per_hora_all_purpose()
+
+    # Dins del bloc el cost de l'All-Purpose és constant
+    inicis = np.maximum((onades - 1) * paral_lelisme + 1, minim)
+    finals = np.minimum(onades * paral_lelisme, maxim)
+    cost_bloc = (config.startup_overhead_time + onades * config.temps_execucio_per_tasca_min) / 60 * cost_per_hora
+
+    # El Job Cluster és més econòmic mentre tasques * cost per tasca < cost del bloc
+    if cost_per_tasca > 0:
+        limit = np.ceil(cost_bloc / cost_per_tasca).astype(np.int64) - 1
+    else:
+        limit = np.where(cost_bloc > 0, finals, inicis - 1)
+    limit = np.clip(limit, inicis - 1, finals)
+
+    # Correcció amb el model exacte dels límits afectats per l'arrodoniment en coma flotant
+    for _ in range(3):
+        massa_alt = (limit >= inicis) & (_diferencia_tasques(config, np.maximum(limit, 1)) >= 0)
+        massa_baix = (limit < finals) & (_diferencia_tasques(config, limit + 1) < 0)
+        if not massa_alt.any() and not massa_baix.any():
+            break
+        limit = limit - massa_alt + massa_baix
+    return inicis, finals, limit
+
+
+def _regions_tasques(config, minim, maxim):
+    paral_lelisme = config.max_parallel_tasks_all_purpose
+    primer_bloc, ultim_bloc = max(ceil(minim / paral_lelisme), 1), ceil(maxim / paral_lelisme)
+    if primer_bloc > ultim_bloc:
+        return []
+    cost_per_tasca = config.amb('nombre_tasques', 1).costos()[0]
+    cost_per_hora = config.cost_per_hora_all_purpose()
+
+    # La diferència Job − All-Purpose a l'inici i al final del bloc w és lineal en w, amb pendent
+    # cost per tasca * P − temps * cost per hora / 60. Només els blocs amb diferència negativa a l'inici i positiva
+    # al final contenen un canvi d'opció; la resta són sencers d'una sola opció i no cal calcular-los un per un.
+    fix = config.startup_overhead_time * cost_per_hora / 60
+    pendent = cost_per_tasca * paral_lelisme - config.temps_execucio_per_tasca_min * cost_per_hora / 60
+    marge_inicial = cost_per_tasca * (paral_lelisme - 1)
+    if pendent != 0:
+        zeros = (fix / pendent, (fix + marge_inicial) / pendent)
+        primer_mixt = max(primer_bloc, floor(min(zeros)) - 2)
+        ultim_mixt = min(ultim_bloc, ceil(max(zeros)) + 2)
+    elif -fix - marge_inicial < 0 <= -fix:
+        primer_mixt, ultim_mixt = primer_bloc, ultim_bloc
+    else:
+        primer_mixt, ultim_mixt = 1, 0
+    if ultim_mixt - primer_mixt + 1 > MAX_BLOCS_TASQUES:
+        raise ValueError(f"L'opció més econòmica canvia dins de més de {MAX_BLOCS_TASQUES} blocs de "
+                         f"{paral_lelisme} tasques: cal reduir el rang del nombre de tasques")
+    onades = np.unique(np.concatenate([np.arange(primer_mixt, ultim_mixt + 1, dtype=np.int64),
+                                       np.array([primer_bloc, ultim_bloc], dtype=np.int64)]))
+    inicis, finals, limit = _blocs_tasques(config, onades, minim, maxim)
+
+    # Segments [inici, límit] → Job i [límit + 1, final] → All-Purpose de cada bloc calculat
+    des_de = np.column_stack([inicis, limit + 1]).ravel()
+    fins_a = np.column_stack([limit, finals]).ravel()
+    opcio = np.tile([0, 1], len(inicis))
+    # Trams de blocs sencers entre blocs calculats: tots són de l'opció del final del tram
+    salts = np.flatnonzero(np.diff(onades) > 1)
+    if len(salts):
+        inici_tram = onades[salts] * paral_lelisme + 1
+        final_tram = (onades[salts + 1] - 1) * paral_lelisme
+        opcio_tram = np.where(_diferencia_tasques(config, final_tram) < 0, 0, 1)
+        ordre = np.argsort(np.concatenate([des_de, inici_tram]), kind='stable')
+        des_de = np.concatenate([des_de, inici_tram])[ordre]
+        fins_a = np.concatenate([fins_a, final_tram])[ordre]
+        opcio = np.concatenate([opcio, opcio_tram])[ordre]
+
+    # Fusió dels segments contigus de la mateixa opció
+    valids = des_de <= fins_a
+    des_de, fins_a, opcio = des_de[valids], fins_a[valids], opcio[valids]
+    if len(opcio) == 0:
+        return []
+    canvis = np.flatnonzero(np.diff(opcio)) + 1
+    primers = np.concatenate([[0], canvis])
+    ultims = np.concatenate([canvis - 1, [len(opcio) - 1]])
+    noms = (TIPUS_JOB, TIPUS_ALL_PURPOSE)
+    return [_regio(int(a), int(b), noms[o])
+            for a, b, o in zip(des_de[primers].tolist(), fins_a[ultims].tolist(), opcio[primers].tolist())]
+
+
+def _regions_paral_lelisme(config, minim, maxim):
+    # L'All-Purpose és més econòmic (o empata) si (overhead + onades * temps) / 60 * cost per hora <= cost del Job
+    cost_job = config.costos()[0]
+    cost_per_hora = config.cost_per_hora_all_purpose()
+    if cost_per_hora > 0 and config.temps_execucio_per_tasca_min > 0:
+        onades_maximes = floor((cost_job * 60 / cost_per_hora - config.startup_overhead_time)
+                               / config.temps_execucio_per_tasca_min)
+    else:
+        onades_maximes = config.nombre_tasques if config.diferencia('max_parallel_tasks_all_purpose', 1) >= 0 else 0
+    onades_maximes = min(onades_maximes, config.nombre_tasques)
+    if onades_maximes < 1:
+        llindar = maxim + 1
+    else:
+        # Paral·lelisme mínim per no superar `onades_maximes`, ajustat amb el model exacte
+        llindar = ceil(config.nombre_tasques / onades_maximes)
+        while llindar > 1 and config.diferencia('max_parallel_tasks_all_purpose', llindar - 1) >= 0:
+            llindar -= 1
+        while llindar <= maxim and config.diferencia('max_parallel_tasks_all_purpose', llindar) < 0:
+            llindar += 1
+    if llindar <= minim:
+        return [_regio(minim, maxim, TIPUS_ALL_PURPOSE)]
+    if llindar > maxim:
+        return [_regio(minim, maxim, TIPUS_JOB)]
+    return [_regio(minim, llindar - 1, TIPUS_JOB), _regio(llindar, maxim, TIPUS_ALL_PURPOSE)]
+
+
+def regions_equilibri(config, parametre, minim, maxim):
+    """
+    Divideix l'interval [minim, maxim] d'un paràmetre en regions on és més econòmic el mateix tipus de clúster.
+
+    Retorna una llista ordenada de diccionaris amb `des_de`, `fins_a` i `opcio` (TIPUS_JOB o TIPUS_ALL_PURPOSE).
+    En els paràmetres continus, el límit entre dues regions és el punt d'equilibri exacte (on els dos costos
+    coincideixen); en els enters, cada regió acaba en l'últim valor enter on aquella opció és més econòmica.
+    En cas d'empat es considera més econòmic l'All-Purpose Cluster, igual que a la secció de resultats de l'aplicació.
+    """
+    if parametre not in PARAMETRES_EQUILIBRI:
+        raise ValueError(f"Paràmetre desconegut: {parametre}. Opcions: {', '.join(PARAMETRES_EQUILIBRI)}")
+    if minim > maxim:
+        raise ValueError("El mínim no pot ser més gran que el màxim")
+    if parametre in PARAMETRES_LINEALS:
+        return _regions_lineals(config, parametre, minim, maxim)
+    if parametre == 'nombre_tasques':
+        return _regions_tasques(config, int(minim), int(maxim))
+    return _regions_paral_lelisme(config, int(minim), int(maxim))
+
+
+def punts_equilibri(config, parametre, minim, maxim):
+    """
+    Retorna els valors del paràmetre on canvia l'opció més econòmica dins de [minim, maxim].
+    """
+    regions = regions_equilibri(config, parametre, minim, maxim)
+    return [regio['des_de'] for regio in regions[1:]]
+
+
+def llindars_lot(escenaris, parametre, instancies, cost_dbu_job=COST_DBU_JOB,
+                 cost_dbu_all_purpose=COST_DBU_ALL_PURPOSE):
+    """
+    Calcula de forma vectoritzada, per a cada escenari, el valor d'un paràmetre lineal on el Job Cluster i
+    l'All-Purpose Cluster amb la mateixa configuració costen el mateix.
+
+    `escenaris` té les columnes de `calcular_escenaris`; `parametre` és 'temps_execucio_per_tasca_min',
+    'startup_overhead_time', 'nombre_workers' o 'multiplicador_dbu'. Retorna un array amb el punt d'equilibri
+    (NaN si les dues rectes són paral·leles) i un array booleà que indica si per sobre del punt el Job Cluster és
+    més econòmic.
+    """
+    if parametre not in ('temps_execucio_per_tasca_min', 'startup_overhead_time', 'nombre_workers',
+                         'multiplicador_dbu'):
+        raise ValueError(f"Paràmetre no lineal o desconegut: {parametre}")
+    diferencies = []
+    for valor in (0.0, 1.0):
+        escenaris_valor = {columna: escenaris[columna] for columna in
+                           ('driver', 'worker', 'nombre_workers', 'max_parallel_tasks', 'nombre_tasques',
+                            'temps_execucio_per_tasca_min', 'startup_overhead_time')}
+        multiplicador = 1.0
+        if parametre == 'multiplicador_dbu':
+            multiplicador = valor
+        else:
+            escenaris_valor[parametre] = np.full(len(np.asarray(escenaris['driver'])), valor)
+        resultats = calcular_escenaris(escenaris_valor, instancies, cost_dbu_job=cost_dbu_job * multiplicador,
+                                       cost_dbu_all_purpose=cost_dbu_all_purpose * multiplicador)
+        diferencies.append(resultats['job_cost_total'] - resultats['all_purpose_cost_total'])
+    pendent = diferencies[1] - diferencies[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        llindar = np.where(pendent != 0, -diferencies[0] / pendent, np.nan)
+    return llindar, pendent < 0
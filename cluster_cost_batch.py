@@ -0,0 +1,232 @@
+"""
+Càlcul de costos per lots des de la línia d'ordres, sense Streamlit.
+
+Llegeix un fitxer CSV o Parquet d'execucions per blocs, calcula el cost de cada execució com a Job Cluster i com a
+All-Purpose Cluster amb el model de `cost_model`, i escriu els resultats a un fitxer CSV o Parquet a mesura que
+es calculen, de manera que la memòria no depèn de la mida de l'entrada.
+
+Ús:
+    python cluster_cost_batch.py execucions.csv resultats.csv
+    python cluster_cost_batch.py execucions.parquet resultats.parquet --chunk-size 200000 --processos 4
+    python cluster_cost_batch.py execucions.csv resultats.csv --cataleg preus.json --regio westeurope
+
+Columnes d'entrada necessàries: driver, worker (noms d'instància), nombre_workers, max_parallel_tasks,
+nombre_tasques, temps_execucio_per_tasca_min i startup_overhead_time. Les columnes numèriques han de ser nombres
+finits, amb max_parallel_tasks >= 1 i la resta >= 0; si no, no s'escriu cap resultat més i s'indiquen les files.
+"""
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cost_model import INSTANCIES, COST_DBU_JOB, COST_DBU_ALL_PURPOSE, calcular_escenaris
+from instance_catalog import PREU_ON_DEMAND, carregar_cataleg
+
+COLUMNES_ENTRADA = ['driver', 'worker', 'nombre_workers', 'max_parallel_tasks', 'nombre_tasques',
+                    'temps_execucio_per_tasca_min', 'startup_overhead_time']
+COLUMNES_NUMERIQUES = COLUMNES_ENTRADA[2:]
+# Valor mínim de cada columna numèrica
+MINIMS = {'nombre_workers': 0, 'max_parallel_tasks': 1, 'nombre_tasques': 0, 'temps_execucio_per_tasca_min': 0,
+          'startup_overhead_time': 0}
+MIDA_BLOC_PER_DEFECTE = 100_000
+# Files que s'esmenten com a màxim en un error de validació
+MAX_FILES_ERROR = 10
+
+
+def _es_parquet(ruta):
+    return os.path.splitext(ruta)[1].lower() in ('.parquet', '.pq')
+
+
+def llegir_blocs(ruta, mida_bloc=MIDA_BLOC_PER_DEFECTE):
+    """
+    Llegeix un fitxer CSV o Parquet per blocs de com a màxim `mida_bloc` files i en retorna DataFrames. L'índex
+    de cada bloc és la posició de la fila dins del fitxer (començant per 0).
+    """
+    if _es_parquet(ruta):
+        import pyarrow.parquet as pq
+        fitxer = pq.ParquetFile(ruta)
+        inici = 0
+        for lot in fitxer.iter_batches(batch_size=mida_bloc):
+            bloc = lot.to_pandas()
+            bloc.index = pd.RangeIndex(inici, inici + len(bloc))
+            inici += len(bloc)
+            yield bloc
+    else:
+        yield from pd.read_csv(ruta, chunksize=mida_bloc)
+
+
+def validar_bloc(bloc):
+    """
+    Comprova que les columnes numèriques del bloc siguin nombres finits dins del seu rang (`MINIMS`). Si no, llança
+    ValueError amb la columna i els números de fila (començant per 1, sense la capçalera).
+    """
+    for columna in COLUMNES_NUMERIQUES:
+        valors = pd.to_numeric(bloc[columna], errors='coerce').to_numpy(dtype=np.float64)
+        for incorrectes, motiu in ((~np.isfinite(valors), "valors buits, no numèrics o infinits"),
+                                   (np.isfinite(valors) & (valors < MINIMS[columna]),
+                                    f"valors inferiors a {MINIMS[columna]}")):
+            if incorrectes.any():
+                files = (bloc.index[incorrectes] + 1).tolist()
+                text = ', '.join(map(str, files[:MAX_FILES_ERROR])) + (' …' if len(files) > MAX_FILES_ERROR else '')
+                raise ValueError(f"La columna {columna} té {motiu} a les files {text}")
+
+
+def calcular_bloc(bloc, cost_dbu_job=COST_DBU_JOB, cost_dbu_all_purpose=COST_DBU_ALL_PURPOSE, instancies=None):
+    """
+    Calcula els costos d'un bloc d'execucions i retorna el bloc amb les columnes de resultat afegides.
+    """
+    absents = [columna for columna in COLUMNES_ENTRADA if columna not in bloc.columns]
+    if absents:
+        raise ValueError(f"Falten columnes a l'entrada: {', '.join(absents)}")
+    validar_bloc(bloc)
+    resultats = calcular_escenaris(bloc, INSTANCIES if instancies is None else instancies,
+                                   cost_dbu_job=cost_dbu_job, cost_dbu_all_purpose=cost_dbu_all_purpose)
+    return pd.concat([bloc.reset_index(drop=True), pd.DataFrame(resultats)], axis=1)
+
+
+def _calcular_en_ordre(blocs, processos, **opcions):
+    """
+    Calcula els blocs en ordre, repartint-los entre `processos` processos i amb un nombre limitat de blocs
+    pendents perquè la memòria no creixi.
+    """
+    if processos <= 1:
+        for bloc in blocs:
+            yield calcular_bloc(bloc, **opcions)
+        return
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        pendents = deque()
+        for bloc in blocs:
+            pendents.append(executor.submit(calcular_bloc, bloc, **opcions))
+            if len(pendents) >= 2 * processos:
+                yield pendents.popleft().result()
+        while pendents:
+            yield pendents.popleft().result()
+
+
+def _esquema_parquet(taula):
+    """
+    Esquema fix de la sortida Parquet. Els tipus no es poden deduir de cada bloc: un bloc posterior amb decimals
+    o valors nuls en una columna que al primer bloc era entera faria fallar l'escriptura a mig fitxer.
+    """
+    import pyarrow as pa
+    camps = []
+    for camp in taula.schema:
+        if camp.name in ('driver', 'worker'):
+            tipus = pa.string()
+        elif camp.name.endswith('_nombre_onades'):
+            tipus = pa.int64()
+        elif camp.name in COLUMNES_ENTRADA:
+            tipus = pa.float64()
+        elif taula.column(camp.name).null_count == len(taula):
+            # Columna addicional sense cap valor al primer bloc (el CSV la llegeix com a decimals nuls)
+            tipus = pa.string()
+        elif pa.types.is_integer(camp.type) or pa.types.is_floating(camp.type):
+            tipus = pa.float64()
+        else:
+            tipus = camp.type
+        camps.append(pa.field(camp.name, tipus))
+    return pa.schema(camps)
+
+
+class _EscriptorResultats:
+    """
+    Escriu els blocs de resultats de manera incremental a un fitxer CSV o Parquet.
+    """
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.parquet = _es_parquet(ruta)
+        self._escriptor = None
+        self._esquema = None
+        self._primer = True
+
+    def escriure(self, bloc):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            taula = pa.Table.from_pandas(bloc, preserve_index=False)
+            if self._escriptor is None:
+                self._esquema = _esquema_parquet(taula)
+                self._escriptor = pq.ParquetWriter(self.ruta, self._esquema)
+            if taula.column_names != self._esquema.names:
+                raise ValueError(f"Les columnes d'un bloc no coincideixen amb les del primer: {taula.column_names}")
+            self._escriptor.write_table(taula.cast(self._esquema))
+        else:
+            try:
+                import pyarrow as pa
+                import pyarrow.csv as pacsv
+            except ImportError:
+                bloc.to_csv(self.ruta, mode='w' if self._primer else 'a', header=self._primer, index=False)
+            else:
+                # L'escriptor CSV de pyarrow és molt més ràpid que DataFrame.to_csv per a columnes numèriques
+                with open(self.ruta, 'wb' if self._primer else 'ab') as fitxer:
+                    pacsv.write_csv(pa.Table.from_pandas(bloc, preserve_index=False), fitxer,
+                                    pacsv.WriteOptions(include_header=self._primer))
+        self._primer = False
+
+    def tancar(self):
+        if self._escriptor is not None:
+            self._escriptor.close()
+
+
+def processar_fitxer(entrada, sortida, mida_bloc=MIDA_BLOC_PER_DEFECTE, processos=1,
+                     cost_dbu_job=COST_DBU_JOB, cost_dbu_all_purpose=COST_DBU_ALL_PURPOSE, instancies=None):
+    """
+    Calcula els costos de totes les execucions d'`entrada` i els escriu a `sortida`. Retorna el nombre de files.
+    Sense `instancies`, es fan servir les instàncies per defecte.
+    """
+    escriptor = _EscriptorResultats(sortida)
+    files = 0
+    try:
+        for resultat in _calcular_en_ordre(llegir_blocs(entrada, mida_bloc), processos,
+                                           cost_dbu_job=cost_dbu_job, cost_dbu_all_purpose=cost_dbu_all_purpose,
+                                           instancies=instancies):
+            escriptor.escriure(resultat)
+            files += len(resultat)
+    finally:
+        escriptor.tancar()
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calcula els costos de Job Cluster i All-Purpose Cluster "
+                                                 "per a un fitxer CSV o Parquet d'execucions.")
+    parser.add_argument('entrada', help="Fitxer d'execucions (.csv o .parquet)")
+    parser.add_argument('sortida', help="Fitxer de resultats (.csv o .parquet)")
+    parser.add_argument('--chunk-size', type=int, default=MIDA_BLOC_PER_DEFECTE,
+                        help="Nombre de files per bloc (per defecte: %(default)s)")
+    parser.add_argument('--processos', type=int, default=1,
+                        help="Nombre de processos per calcular blocs en paral·lel (0 = tots els nuclis)")
+    parser.add_argument('--cataleg', help="Full de preus d'instàncies (.json o .csv); per defecte, les instàncies de l'aplicació")
+    parser.add_argument('--regio', help="Regió del catàleg a fer servir")
+    parser.add_argument('--modalitat', default=PREU_ON_DEMAND, help="Modalitat de preu (per defecte: %(default)s)")
+    parser.add_argument('--photon', action='store_true', help="Aplica el multiplicador de DBUs de Photon")
+    parser.add_argument('--cost-dbu-job', type=float, help="€/DBU-hora del Job Cluster (per defecte, el del catàleg)")
+    parser.add_argument('--cost-dbu-all-purpose', type=float,
+                        help="€/DBU-hora de l'All-Purpose Cluster (per defecte, el del catàleg)")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size ha de ser com a mínim 1")
+
+    processos = args.processos if args.processos > 0 else (os.cpu_count() or 1)
+    try:
+        cataleg = carregar_cataleg(args.cataleg)
+        instancies = cataleg.instancies_per_nom(region=args.regio, pricing=args.modalitat)
+        cost_dbu_job = args.cost_dbu_job if args.cost_dbu_job is not None else cataleg.cost_dbu(True, args.photon)
+        cost_dbu_all_purpose = (args.cost_dbu_all_purpose if args.cost_dbu_all_purpose is not None
+                                else cataleg.cost_dbu(False, args.photon))
+        files = processar_fitxer(args.entrada, args.sortida, mida_bloc=args.chunk_size, processos=processos,
+                                 cost_dbu_job=cost_dbu_job, cost_dbu_all_purpose=cost_dbu_all_purpose,
+                                 instancies=instancies)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{files} execucions calculades a {args.sortida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,88 +1,66 @@
-import streamlit as st
+import importlib
+import os
+import uuid
+from functools import lru_cache
 from math import ceil
-import pandas as pd
-import altair as alt
-
-# Define the VMInstance class
-class VMInstance:
-    def __init__(self, name, vCPUs, DBUs, cost_per_hour, RAM_GB):
-        self.name = name
-        self.vCPUs = vCPUs
-        self.DBUs = DBUs
-        self.cost_per_hour = cost_per_hour
-        self.RAM_GB = RAM_GB  # Memòria RAM en GB
-
-# Define cost calculation functions
-def calcular_cost_job_cluster(driver_cost_per_hour, worker_cost_per_hour, total_DBUs, cost_dbu_job,
-                                startup_overhead_time, temps_execucio_min, max_parallel_tasks, total_tasks):
-    """
-    Calcula el cost total per tasca en un Job Cluster, considerant una limitació de tasques en paral·lel.
-    """
-    # Nombre d'onades necessàries
-    nombre_onades_job = ceil(total_tasks / max_parallel_tasks)
-    
-    # Temps total actiu incloent el temps de spin-up per onada
-    temps_total_min_job = nombre_onades_job * (startup_overhead_time + temps_execucio_min)
-    
-    # Càlcul del cost de les VM durant el spin-up i l'execució per onada
-    cost_vm_total_job = ((startup_overhead_time + temps_execucio_min) / 60) * (driver_cost_per_hour + worker_cost_per_hour)
-    
-    # Càlcul del cost de les DBUs durant l'execució per onada
-    cost_dbu_execucio_job = (temps_execucio_min / 60) * total_DBUs * cost_dbu_job
-    
-    # Càlcul del cost total per tasca
-    cost_total_per_tasca_job = cost_vm_total_job + cost_dbu_execucio_job
-    
-    return cost_total_per_tasca_job, cost_vm_total_job, cost_dbu_execucio_job, temps_total_min_job, nombre_onades_job
 
-def calcular_cost_all_purpose(driver_cost_per_hour, workers_cost_per_hour, total_DBUs, cost_dbu_all_purpose,
-                              temps_total_actiu_min):
+from cost_model import VMInstance, calcular_cost_job_cluster, calcular_cost_all_purpose
+from stage_cache import (
+    etapa_en_cache, iniciar_execucio, execucio_actual, estadistiques,
+    configurar_instrumentacio, instrumentacio_activa, seccio, seccions_actuals, estadistiques_seccions, reruns,
+    escriure_metriques,
+)
+
+class _ModulMandros:
     """
-    Calcula el cost total en un All-Purpose Cluster.
+    Mòdul que s'importa la primera vegada que se'n consulta un atribut. Així, importar aquest fitxer per fer
+    servir el model de costos no carrega Streamlit, pandas, Altair ni NumPy.
     """
-    # Càlcul del cost de les VM per hora
-    cost_vm_all_purpose_per_hour = driver_cost_per_hour + workers_cost_per_hour
+    def __init__(self, nom):
+        self._nom = nom
+        self._modul = None
 
-    # Càlcul del cost de les DBUs per hora
-    cost_dbu_all_purpose_per_hour = total_DBUs * cost_dbu_all_purpose
+    def __getattr__(self, atribut):
+        if self._modul is None:
+            self._modul = importlib.import_module(self._nom)
+        return getattr(self._modul, atribut)
 
-    # Càlcul del cost total per hora de l'All-Purpose Cluster
-    cost_total_per_hour_all_purpose = cost_vm_all_purpose_per_hour + cost_dbu_all_purpose_per_hour
+st = _ModulMandros('streamlit')
+np = _ModulMandros('numpy')
+pd = _ModulMandros('pandas')
+alt = _ModulMandros('altair')
 
-    # Càlcul del cost total en funció del temps actiu
-    cost_total_all_purpose = (temps_total_actiu_min / 60) * cost_total_per_hour_all_purpose
+@lru_cache(maxsize=16)
+def _instancies_cataleg(clau_cataleg):
+    """
+    Instàncies del catàleg per a una clau (ruta, versió del fitxer, regió, modalitat de preu). El catàleg i la
+    llista d'instàncies de cada clau es construeixen una sola vegada per procés i es comparteixen entre sessions
+    i reruns; la versió del fitxer a la clau fa que un full de preus modificat es torni a llegir.
+    """
+    from instance_catalog import carregar_cataleg
+    ruta, _versio, regio, modalitat = clau_cataleg
+    return tuple(carregar_cataleg(ruta).instancies(region=regio, pricing=modalitat))
 
-    return cost_total_all_purpose, cost_dbu_all_purpose_per_hour, cost_vm_all_purpose_per_hour, cost_total_per_hour_all_purpose
+def _id_sessio():
+    """
+    Identificador de la sessió de Streamlit actual, guardat a l'estat de la sessió per comptar-ne els reruns.
+    """
+    if 'id_sessio' not in st.session_state:
+        st.session_state['id_sessio'] = uuid.uuid4().hex
+    return st.session_state['id_sessio']
 
-# Streamlit App
-def main():
-    # Configure the page
-    st.set_page_config(page_title="📊 Cluster Cost Calculator", layout="wide", initial_sidebar_state="expanded")
-    
-    # Main title with logo
-    col_title, col_logo = st.columns([4, 1])
-    with col_title:
-        st.title("📊 Cluster Cost Calculator")
-    with col_logo:
-        try:
-            st.image("logo.png", width=200)
-        except:
-            st.write("![Logo](https://via.placeholder.com/200)")
-    
-    st.markdown("""
-    Aquesta aplicació permet calcular els costos i els temps d'execució dels **Job Clusters** i **All-Purpose Clusters** segons la seva configuració i les tasques que han de realitzar.
-    """)
-    
-    # Summary table of instance costs
-    st.header("📋 Resum dels Costos de les Instàncies")
-    
-    instancies = [
-        VMInstance('DS4_V2', 8, 1.5, 0.5219, 32),
-        VMInstance('D4A_V4', 4, 0.75, 0.2207, 16),
-        VMInstance('D8A_V4', 8, 1.5, 0.4414, 32),
-        VMInstance('E4DS_V5', 4, 1.5, 0.3320, 24),
-        VMInstance('D4DS_V5', 4, 1.0, 0.2610, 16)
-    ]
+def _clau_instancia(inst):
+    """
+    Clau hashable d'una instància, per fer-la servir com a argument de les etapes en cache.
+    """
+    return (inst.name, inst.vCPUs, inst.DBUs, inst.cost_per_hour, inst.RAM_GB)
+
+@etapa_en_cache("Taules d'instàncies", max_entries=16)
+def taules_instancies(clau_cataleg, cost_dbu_job, cost_dbu_all_purpose):
+    """
+    Construeix les taules resum de les instàncies i dels costos per DBU-hora.
+    """
+    instancies = _instancies_cataleg(clau_cataleg)
     
     data_instances = pd.DataFrame({
         'Nom de la Instància': [inst.name for inst in instancies],
@@ -95,70 +73,22 @@ def main():
     data_compute_costs = pd.DataFrame({
         'Compute Type': ['All-Purpose Compute', 'Jobs Compute'],
         '€/DBU-hora': [
-            f"{0.528:.3f}".replace('.', ',') + ' €',
-            f"{0.288:.3f}".replace('.', ',') + ' €'
+            f"{cost_dbu_all_purpose:.3f}".replace('.', ',') + ' €',
+            f"{cost_dbu_job:.3f}".replace('.', ',') + ' €'
         ]
     })
     
-    col_instances, col_compute_costs = st.columns(2)
-    with col_instances:
-        st.subheader("Instàncies Disponibles")
-        st.table(data_instances)
-    with col_compute_costs:
-        st.subheader("Costos per Tipus de Càlcul")
-        st.table(data_compute_costs)
-    
-    # Sidebar inputs
-    st.sidebar.header("🛠️ Configuració")
-    
-    # --- Job Cluster Configuration ---
-    st.sidebar.subheader("Job Cluster Configuració")
-    instance_names = [inst.name for inst in instancies]
-    selected_instance_job_driver = st.sidebar.selectbox("🔍 Tipus d'instància per al **Driver del Job Cluster**", instance_names, index=0)
-    instancia_job_driver = next(inst for inst in instancies if inst.name == selected_instance_job_driver)
-    
-    selected_instance_job_worker = st.sidebar.selectbox("🔍 Tipus d'instància per als **Workers del Job Cluster**", instance_names, index=1)
-    instancia_job_worker = next(inst for inst in instancies if inst.name == selected_instance_job_worker)
-    
-    nombre_workers_job = st.sidebar.number_input("👥 Nombre de workers (Job Cluster)", min_value=1, value=1, step=1)
-    
-    # New: Job Cluster maximum parallel tasks input
-    max_parallel_tasks_job = st.sidebar.number_input("⚙️ Nombre màxim de tasques en paral·lel (Job Cluster)", 
-                                                     min_value=1, value=35, step=1)
-    
-    st.sidebar.markdown("---")
-    
-    # --- All-Purpose Cluster Configuration ---
-    st.sidebar.subheader("All-Purpose Cluster Configuració")
-    selected_instance_all_purpose_driver = st.sidebar.selectbox("🔍 Tipus d'instància per al **Driver de l'All-Purpose Cluster**", instance_names, index=2)
-    instancia_all_purpose_driver = next(inst for inst in instancies if inst.name == selected_instance_all_purpose_driver)
-    
-    selected_instance_all_purpose_worker = st.sidebar.selectbox("🔍 Tipus d'instància per als **Workers de l'All-Purpose Cluster**", instance_names, index=3)
-    instancia_all_purpose_worker = next(inst for inst in instancies if inst.name == selected_instance_all_purpose_worker)
-    
-    nombre_workers_all_purpose = st.sidebar.number_input("👥 Nombre de workers (All-Purpose)", min_value=1, value=5, step=1)
-    
-    # New: All-Purpose Cluster maximum parallel tasks input
-    max_parallel_tasks_all_purpose = st.sidebar.number_input("⚙️ Nombre màxim de tasques en paral·lel (All-Purpose)", 
-                                                             min_value=1, 
-                                                             value=nombre_workers_all_purpose, 
-                                                             step=1)
-    
-    st.sidebar.markdown("---")
-    
-    # --- Task and Overhead Configuration ---
-    temps_execucio_per_tasca_min = st.sidebar.number_input("⏱️ Temps d'execució per tasca (minuts)", min_value=0.1, value=10.0, step=0.1)
-    nombre_tasques = st.sidebar.number_input("🔢 Nombre de tasques", min_value=1, value=100, step=1)
-    
-    # New: Startup overhead time input (in minutes)
-    startup_overhead_time = st.sidebar.number_input("⏱️ Startup Overhead Time (minuts)", min_value=0.1, value=2.5, step=0.1)
-    
-    # Constants for DBU costs (remain unchanged)
-    cost_dbu_job = 0.288
-    cost_dbu_all_purpose = 0.528
+    return data_instances, data_compute_costs
+
+@etapa_en_cache("Càlculs Job Cluster")
+def resultats_job_cluster(clau_driver, clau_worker, nombre_workers_job, max_parallel_tasks_job, nombre_tasques,
+                          temps_execucio_per_tasca_min, startup_overhead_time, cost_dbu_job):
+    """
+    Calcula els costos i els temps del Job Cluster i en prepara els textos de detall.
+    """
+    instancia_job_driver = VMInstance(*clau_driver)
+    instancia_job_worker = VMInstance(*clau_worker)
     
-    # -------------------------------
-    # Job Cluster Calculations
     nodes_job_driver = 1
     nodes_job_workers = nombre_workers_job
     total_DBUs_job = (nodes_job_driver * instancia_job_driver.DBUs) + (nodes_job_workers * instancia_job_worker.DBUs)
@@ -177,34 +107,7 @@ def main():
     )
     cost_total_job = nombre_tasques * cost_per_tasca_job
     
-    # -------------------------------
-    # All-Purpose Cluster Calculations
-    nodes_all_purpose_driver = 1
-    nodes_all_purpose_workers = nombre_workers_all_purpose
-    dbus_all_purpose = (nodes_all_purpose_driver * instancia_all_purpose_driver.DBUs) + (nodes_all_purpose_workers * instancia_all_purpose_worker.DBUs)
-    cost_vm_all_purpose_driver = nodes_all_purpose_driver * instancia_all_purpose_driver.cost_per_hour
-    cost_vm_all_purpose_workers = nodes_all_purpose_workers * instancia_all_purpose_worker.cost_per_hour
-    
-    total_parallel_tasks_all_purpose = max_parallel_tasks_all_purpose
-    nombre_onades_all_purpose = ceil(nombre_tasques / total_parallel_tasks_all_purpose)
-    temps_execucio_total_min_all_purpose = nombre_onades_all_purpose * temps_execucio_per_tasca_min
-    temps_total_actiu_min_all_purpose = startup_overhead_time + temps_execucio_total_min_all_purpose
-    
-    cost_total_all_purpose, cost_dbu_all_purpose_per_hour, cost_vm_all_purpose_per_hour, cost_total_per_hour_all_purpose = calcular_cost_all_purpose(
-        driver_cost_per_hour=cost_vm_all_purpose_driver,
-        workers_cost_per_hour=cost_vm_all_purpose_workers,
-        total_DBUs=dbus_all_purpose,
-        cost_dbu_all_purpose=cost_dbu_all_purpose,
-        temps_total_actiu_min=temps_total_actiu_min_all_purpose
-    )
-    
-    # -------------------------------
-    # Display Results
-    col1, col2 = st.columns(2)
-    with col1:
-        st.header("📈 Resultats Job Cluster")
-        with st.expander("📋 Detalls del Job Cluster"):
-            st.markdown(f"""
+    detalls = f"""
             - **Tipus d'Instància del Driver**: {instancia_job_driver.name}
             - **Tipus d'Instància dels Workers**: {instancia_job_worker.name}
             - **Nombre de Drivers**: {nodes_job_driver}
@@ -216,9 +119,8 @@ def main():
             - **RAM per Driver**: {instancia_job_driver.RAM_GB} GB
             - **RAM per Worker**: {instancia_job_worker.RAM_GB} GB
             - **Nombre màxim de tasques en paral·lel**: {max_parallel_tasks_job}
-            """)
-        with st.expander("💰 Càlculs de Cost Job Cluster"):
-            st.markdown(f"""
+            """
+    calculs = f"""
             **Passos per calcular el cost total en un Job Cluster:**
             
             1. **Nombre d'Onades**:
@@ -248,15 +150,44 @@ def main():
             7. **Cost Total del Job Cluster**:
                 - **Fórmula**: Nombre de Tasques * Cost Total per Tasca
                 - **Aplicació**: {nombre_tasques} tasques * €{cost_per_tasca_job:.4f} = **€{cost_total_job:.4f}**
-            """)
-        st.metric(label="**Cost per tasca**", value=f"€{cost_per_tasca_job:.4f}")
-        st.metric(label="**Cost total**", value=f"€{cost_total_job:.4f}")
-        st.metric(label="**Temps Total Actiu**", value=f"{temps_total_min_job} minuts")
+            """
+    return {
+        'cost_per_tasca': cost_per_tasca_job,
+        'cost_total': cost_total_job,
+        'temps_total_min': temps_total_min_job,
+        'detalls': detalls,
+        'calculs': calculs
+    }
+
+@etapa_en_cache("Càlculs All-Purpose Cluster")
+def resultats_all_purpose_cluster(clau_driver, clau_worker, nombre_workers_all_purpose, max_parallel_tasks_all_purpose,
+                                  nombre_tasques, temps_execucio_per_tasca_min, startup_overhead_time, cost_dbu_all_purpose):
+    """
+    Calcula els costos i els temps de l'All-Purpose Cluster i en prepara els textos de detall.
+    """
+    instancia_all_purpose_driver = VMInstance(*clau_driver)
+    instancia_all_purpose_worker = VMInstance(*clau_worker)
+    
+    nodes_all_purpose_driver = 1
+    nodes_all_purpose_workers = nombre_workers_all_purpose
+    dbus_all_purpose = (nodes_all_purpose_driver * instancia_all_purpose_driver.DBUs) + (nodes_all_purpose_workers * instancia_all_purpose_worker.DBUs)
+    cost_vm_all_purpose_driver = nodes_all_purpose_driver * instancia_all_purpose_driver.cost_per_hour
+    cost_vm_all_purpose_workers = nodes_all_purpose_workers * instancia_all_purpose_worker.cost_per_hour
     
-    with col2:
-        st.header("📉 Resultats All-Purpose Cluster")
-        with st.expander("📋 Detalls de l'All-Purpose Cluster"):
-            st.markdown(f"""
+    total_parallel_tasks_all_purpose = max_parallel_tasks_all_purpose
+    nombre_onades_all_purpose = ceil(nombre_tasques / total_parallel_tasks_all_purpose)
+    temps_execucio_total_min_all_purpose = nombre_onades_all_purpose * temps_execucio_per_tasca_min
+    temps_total_actiu_min_all_purpose = startup_overhead_time + temps_execucio_total_min_all_purpose
+    
+    cost_total_all_purpose, cost_dbu_all_purpose_per_hour, cost_vm_all_purpose_per_hour, cost_total_per_hour_all_purpose = calcular_cost_all_purpose(
+        driver_cost_per_hour=cost_vm_all_purpose_driver,
+        workers_cost_per_hour=cost_vm_all_purpose_workers,
+        total_DBUs=dbus_all_purpose,
+        cost_dbu_all_purpose=cost_dbu_all_purpose,
+        temps_total_actiu_min=temps_total_actiu_min_all_purpose
+    )
+    
+    detalls = f"""
             - **Tipus d'Instància del Driver**: {instancia_all_purpose_driver.name}
             - **Tipus d'Instància dels Workers**: {instancia_all_purpose_worker.name}
             - **Nombre de Drivers**: {nodes_all_purpose_driver}
@@ -268,9 +199,8 @@ def main():
             - **RAM per Driver**: {instancia_all_purpose_driver.RAM_GB} GB
             - **RAM per Worker**: {instancia_all_purpose_worker.RAM_GB} GB
             - **Nombre màxim de tasques en paral·lel**: {max_parallel_tasks_all_purpose}
-            """)
-        with st.expander("💰 Càlculs de Cost All-Purpose Cluster"):
-            st.markdown(f"""
+            """
+    calculs = f"""
             **Passos per calcular el cost total en un All-Purpose Cluster:**
             
             1. **Nombre d'Onades**:
@@ -300,13 +230,20 @@ def main():
             7. **Cost Total de l'All-Purpose Cluster**:
                 - **Fórmula**: Nombre d'Onades * Cost Total per Onada
                 - **Aplicació**: {nombre_onades_all_purpose} onades * (Cost Total per Onada) = **€{cost_total_all_purpose:.4f}**
-            """)
-        st.metric(label="**Cost total**", value=f"€{cost_total_all_purpose:.4f}")
-        st.metric(label="**Temps Total Actiu**", value=f"{temps_total_actiu_min_all_purpose} minuts")
-    
-    # -------------------------------
+            """
+    return {
+        'cost_total': cost_total_all_purpose,
+        'temps_total_min': temps_total_actiu_min_all_purpose,
+        'detalls': detalls,
+        'calculs': calculs
+    }
+
+@etapa_en_cache("Gràfics de comparació", max_entries=64, recurs=True)
+def grafics_comparacio(cost_total_job, cost_total_all_purpose, temps_total_min_job, temps_total_actiu_min_all_purpose):
+    """
+    Construeix els gràfics de comparació de costos i temps. Es comparteixen entre sessions i no s'han de modificar.
+    """
     # Graphical Comparison of Costs
-    st.header("📊 Comparació de Costos")
     data_cost = pd.DataFrame({
         'Clúster': ['Job Cluster', 'All-Purpose Cluster'],
         'Cost Total (€)': [cost_total_job, cost_total_all_purpose]
@@ -321,10 +258,8 @@ def main():
         height=400,
         title='Comparació dels Costos Totals'
     )
-    st.altair_chart(bar_chart_cost, use_container_width=True)
     
     # Graphical Comparison of Execution Times
-    st.header("⏰ Comparació de Temps d'Execució")
     data_time = pd.DataFrame({
         'Clúster': ['Job Cluster', 'All-Purpose Cluster'],
         'Temps Total Actiu (minuts)': [temps_total_min_job, temps_total_actiu_min_all_purpose]
@@ -338,10 +273,8 @@ def main():
         height=400,
         title='Comparació dels Temps Totals Actius'
     )
-    st.altair_chart(bar_chart_time, use_container_width=True)
     
     # Scatter plot: Cost vs Time
-    st.header("📈 Optimalitat en Temps vs Cost")
     data_optimal = pd.DataFrame({
         'Clúster': ['Job Cluster', 'All-Purpose Cluster'],
         'Cost Total (€)': [cost_total_job, cost_total_all_purpose],
@@ -357,33 +290,659 @@ def main():
         height=400,
         title='Optimalitat en Temps vs Cost'
     )
-    st.altair_chart(scatter_chart, use_container_width=True)
-    
-    # Final Results and Conclusion
-    st.header("🏆 Resultats Finals")
-    st.write(f"**Cost total Job Cluster:** €{cost_total_job:.4f}")
-    st.write(f"**Cost total All-Purpose:** €{cost_total_all_purpose:.4f}")
-    st.write(f"**Temps total actiu Job Cluster:** {temps_total_min_job} minuts")
-    st.write(f"**Temps total actiu All-Purpose Cluster:** {temps_total_actiu_min_all_purpose} minuts")
     
-    diferencia_cost = abs(cost_total_job - cost_total_all_purpose)
-    if cost_total_job < cost_total_all_purpose:
-        estalvi = diferencia_cost
-        percentatge_estalvi = (diferencia_cost / cost_total_all_purpose) * 100
-        st.success(f"La opció més econòmica és **Job Cluster**")
-        st.write(f"**Estalvi en Cost:** €{estalvi:.4f}")
-        st.write(f"**Percentatge d'estalvi en Cost:** {percentatge_estalvi:.2f}%")
+    return bar_chart_cost, bar_chart_time, scatter_chart
+
+@etapa_en_cache("Optimitzador")
+def front_optimitzador(clau_cataleg, nombre_tasques, temps_execucio_per_tasca_min, startup_overhead_time,
+                       termini_min, pressupost, max_workers, cost_dbu_job, cost_dbu_all_purpose):
+    """
+    Calcula el front de Pareto de l'optimitzador per a la càrrega de treball i les restriccions donades.
+    """
+    from cluster_optimizer import optimitzar_clusters
+    return optimitzar_clusters(
+        nombre_tasques=nombre_tasques,
+        temps_execucio_per_tasca_min=temps_execucio_per_tasca_min,
+        startup_overhead_time=startup_overhead_time,
+        instancies=_instancies_cataleg(clau_cataleg),
+        termini_min=termini_min,
+        pressupost=pressupost,
+        max_workers=max_workers,
+        cost_dbu_job=cost_dbu_job,
+        cost_dbu_all_purpose=cost_dbu_all_purpose
+    )
+
+# Tasques simulades (rèpliques × tasques) a partir de les quals surt a compte repartir les rèpliques entre processos
+MIN_TASQUES_SIMULACIO_PARAL_LELA = 200_000
+
+@etapa_en_cache("Simulació", max_entries=32)
+def resultats_simulacio(clau_driver, clau_worker, nombre_tasques, temps_execucio_per_tasca_min, distribucio,
+                        coeficient_variacio, min_workers, max_workers, max_parallel_tasks, startup_overhead_time,
+                        cost_dbu, nombre_repliques, processos):
+    """
+    Simula la càrrega de treball amb durades variables i autoescalat i en resumeix les rèpliques.
+    """
+    from cluster_simulation import simular_monte_carlo
+    return simular_monte_carlo(
+        nombre_repliques, nombre_tasques, temps_execucio_per_tasca_min,
+        driver=VMInstance(*clau_driver),
+        worker=VMInstance(*clau_worker),
+        distribucio=distribucio,
+        coeficient_variacio=coeficient_variacio,
+        llavor=0,
+        processos=processos,
+        min_workers=min_workers,
+        max_workers=max_workers,
+        max_parallel_tasks=max_parallel_tasks,
+        startup_overhead_time=startup_overhead_time,
+        cost_dbu=cost_dbu
+    )
+
+NOMS_PARAMETRES = {
+    'nombre_workers': 'Nombre de workers',
+    'max_parallel_tasks': 'Nombre màxim de tasques en paral·lel',
+    'nombre_tasques': 'Nombre de tasques',
+    'temps_execucio_per_tasca_min': "Temps d'execució per tasca (minuts)",
+    'startup_overhead_time': 'Startup Overhead Time (minuts)',
+    'multiplicador_dbu': 'Multiplicador del preu de les DBUs'
+}
+
+# Nombre màxim de punts calculats en un escombrat 2D
+MAX_PUNTS_GRAELLA = 1_000_000
+
+# Nombre màxim de canvis de l'opció més econòmica que es marquen i es llisten (se'n poden detectar molts)
+MAX_CANVIS_MOSTRATS = 100
+
+@etapa_en_cache("Escombrat", max_entries=32)
+def resultats_escombrat(clau_cataleg, config_job, config_all_purpose, eixos, cost_dbu_job, cost_dbu_all_purpose,
+                        max_punts):
+    """
+    Calcula un escombrat d'un o dos paràmetres i en retorna només les dades reduïdes que es dibuixen.
+    """
+    from cost_sweep import valors_eix, escombrar, reduir_corba, reduir_graella
+    eixos_valors = [(parametre, valors_eix(parametre, minim, maxim, punts)) for parametre, minim, maxim, punts in eixos]
+    series = escombrar(dict(config_job), dict(config_all_purpose), _instancies_cataleg(clau_cataleg), eixos_valors,
+                       cost_dbu_job=cost_dbu_job, cost_dbu_all_purpose=cost_dbu_all_purpose)
+    x = eixos_valors[0][1]
+    if len(eixos_valors) == 1:
+        index, creua = reduir_corba(series, max_punts=max_punts, max_creuaments=MAX_CANVIS_MOSTRATS)
+        corbes = pd.DataFrame({'x': np.concatenate([x[index], x[index]]),
+                               'Clúster': ['Job Cluster'] * len(index) + ['All-Purpose Cluster'] * len(index),
+                               'Cost Total (€)': np.concatenate([series['job_cost_total'][index],
+                                                                 series['all_purpose_cost_total'][index]]),
+                               'Temps Total Actiu (minuts)': np.concatenate([series['job_temps_total_min'][index],
+                                                                             series['all_purpose_temps_total_min'][index]])})
+        primers = creua[:MAX_CANVIS_MOSTRATS]
+        canvis = pd.DataFrame({
+            'Des de': x[primers],
+            'Fins a': x[np.minimum(primers + 1, len(x) - 1)],
+            'Més econòmic abans': np.where(series['job_cost_total'][primers] < series['all_purpose_cost_total'][primers],
+                                           'Job Cluster', 'All-Purpose Cluster'),
+        })
+        return {'punts': len(x), 'corbes': corbes, 'canvis': canvis, 'nombre_canvis': len(creua)}
+
+    y = eixos_valors[1][1]
+    inicis_x, inicis_y, mitjanes, frontera = reduir_graella(series, max_x=max_punts, max_y=max_punts)
+    cel_x, cel_y = np.meshgrid(x[inicis_x], y[inicis_y], indexing='ij')
+    graella = pd.DataFrame({
+        'x': cel_x.ravel(),
+        'y': cel_y.ravel(),
+        'Diferència de Cost Job − All-Purpose (€)': (mitjanes['job_cost_total'] - mitjanes['all_purpose_cost_total']).ravel(),
+        'Canvi d\'opció': frontera.ravel()
+    })
+    return {'punts': len(x) * len(y), 'graella': graella}
+
+@seccio("Explorador de sensibilitat")
+def mostrar_escombrat(clau_cataleg, config_job, config_all_purpose, cost_dbu_job, cost_dbu_all_purpose):
+    """
+    Mostra la secció de l'escombrat de sensibilitat d'un o dos paràmetres per als dos tipus de clúster.
+    """
+    from cost_sweep import PARAMETRES_ESCOMBRAT
+    st.header("🔬 Explorador de Sensibilitat")
+    st.markdown("""
+    Varia un o dos paràmetres sobre un rang i compara el cost i el temps dels dos clústers. Els resultats es redueixen 
+    abans de dibuixar-los, però els punts on canvia l'opció més econòmica es conserven exactament.
+    """)
+    valors_actuals = dict(config_job, multiplicador_dbu=1.0)
+    eixos = []
+    for eix, columna in enumerate(st.columns(2)):
+        with columna:
+            if eix == 0:
+                parametre = st.selectbox("Paràmetre X", PARAMETRES_ESCOMBRAT, index=PARAMETRES_ESCOMBRAT.index('nombre_tasques'),
+                                         format_func=NOMS_PARAMETRES.get, key="escombrat_parametre_0")
+            else:
+                parametre = st.selectbox("Paràmetre Y (opcional)", ('—',) + PARAMETRES_ESCOMBRAT,
+                                         format_func=lambda p: NOMS_PARAMETRES.get(p, p), key="escombrat_parametre_1")
+            if parametre == '—':
+                continue
+            actual = float(valors_actuals[parametre])
+            minim = st.number_input("Mínim", min_value=0.01, value=actual / 4, key=f"escombrat_minim_{eix}")
+            maxim = st.number_input("Màxim", min_value=0.01, value=actual * 4, key=f"escombrat_maxim_{eix}")
+            punts = st.number_input("Punts", min_value=2, max_value=1_000_000 if eix == 0 else 1000,
+                                    value=100_000 if eix == 0 else 200, step=1, key=f"escombrat_punts_{eix}")
+            eixos.append((parametre, minim, maxim, punts))
+    if len(eixos) == 2 and eixos[0][0] == eixos[1][0]:
+        st.warning("Els paràmetres X i Y han de ser diferents.")
+        return
+    if len(eixos) == 2 and eixos[0][3] * eixos[1][3] > MAX_PUNTS_GRAELLA:
+        # Limitar la mida de la graella 2D reduint els punts de l'eix X
+        parametre, minim, maxim, _ = eixos[0]
+        eixos[0] = (parametre, minim, maxim, max(2, MAX_PUNTS_GRAELLA // eixos[1][3]))
+
+    resultat = resultats_escombrat(clau_cataleg, tuple(sorted(config_job.items())),
+                                   tuple(sorted(config_all_purpose.items())), tuple(eixos),
+                                   cost_dbu_job, cost_dbu_all_purpose, 2000 if len(eixos) == 1 else 60)
+    titol_x = NOMS_PARAMETRES[eixos[0][0]]
+    if len(eixos) == 1:
+        corbes = resultat['corbes']
+        st.caption(f"{resultat['punts']} punts calculats, {len(corbes) // 2} dibuixats per clúster")
+        for columna in ('Cost Total (€)', 'Temps Total Actiu (minuts)'):
+            grafic = alt.Chart(corbes).mark_line().encode(
+                x=alt.X('x', title=titol_x),
+                y=alt.Y(columna, title=columna),
+                color='Clúster'
+            )
+            if columna == 'Cost Total (€)' and len(resultat['canvis']):
+                grafic = grafic + alt.Chart(resultat['canvis']).mark_rule(strokeDash=[4, 4]).encode(
+                    x='Fins a', tooltip=list(resultat['canvis'].columns))
+            st.altair_chart(grafic.properties(height=400, title=f"{columna} segons {titol_x}"), use_container_width=True)
+        if len(resultat['canvis']):
+            st.subheader(f"Punts de canvi de l'opció més econòmica ({resultat['nombre_canvis']})")
+            if resultat['nombre_canvis'] > len(resultat['canvis']):
+                st.caption(f"Es mostren els primers {len(resultat['canvis'])} canvis de {resultat['nombre_canvis']}.")
+            st.dataframe(resultat['canvis'], hide_index=True)
+        else:
+            st.info("L'opció més econòmica no canvia en aquest rang.")
     else:
-        estalvi = diferencia_cost
-        percentatge_estalvi = (diferencia_cost / cost_total_job) * 100
-        st.success(f"La opció més econòmica és **All-Purpose Cluster**")
-        st.write(f"**Estalvi en Cost:** €{estalvi:.4f}")
-        st.write(f"**Percentatge d'estalvi en Cost:** {percentatge_estalvi:.2f}%")
+        graella = resultat['graella']
+        st.caption(f"{resultat['punts']} punts calculats, agrupats en {len(graella)} cel·les")
+        base = alt.Chart(graella).encode(
+            x=alt.X('x:O', title=titol_x, axis=alt.Axis(format='~s')),
+            y=alt.Y('y:O', title=NOMS_PARAMETRES[eixos[1][0]], sort='descending', axis=alt.Axis(format='~s'))
+        )
+        mapa = base.mark_rect().encode(
+            color=alt.Color('Diferència de Cost Job − All-Purpose (€):Q', scale=alt.Scale(scheme='redblue', domainMid=0, reverse=True)),
+            tooltip=list(graella.columns)
+        )
+        frontera = base.transform_filter(alt.datum["Canvi d'opció"]).mark_rect(fill=None, stroke='black', strokeWidth=1.5)
+        st.altair_chart((mapa + frontera).properties(height=500, title="Diferència de cost (negatiu: Job Cluster més econòmic)"),
+                        use_container_width=True)
+
+NOMS_PARAMETRES_EQUILIBRI = {
+    'temps_execucio_per_tasca_min': "Temps d'execució per tasca (minuts)",
+    'startup_overhead_time': 'Startup Overhead Time (minuts)',
+    'nombre_workers_job': 'Nombre de workers (Job Cluster)',
+    'nombre_workers_all_purpose': 'Nombre de workers (All-Purpose)',
+    'multiplicador_dbu': 'Multiplicador del preu de les DBUs',
+    'nombre_tasques': 'Nombre de tasques',
+    'max_parallel_tasks_all_purpose': 'Nombre màxim de tasques en paral·lel (All-Purpose)'
+}
+
+# Nombre màxim de regions que es dibuixen (el nombre de tasques pot generar-ne moltes)
+MAX_REGIONS_DIBUIXADES = 500
+
+@etapa_en_cache("Punts d'equilibri", max_entries=64)
+def resultats_equilibri(claus_configuracio, parametre, minim, maxim):
+    """
+    Calcula les regions on cada clúster és més econòmic en variar un paràmetre.
+    """
+    from break_even import ConfiguracioComparacio, regions_equilibri
+    configuracio = dict(claus_configuracio)
+    for clau in ('driver_job', 'worker_job', 'driver_all_purpose', 'worker_all_purpose'):
+        configuracio[clau] = VMInstance(*configuracio[clau])
+    return regions_equilibri(ConfiguracioComparacio(**configuracio), parametre, minim, maxim)
+
+@seccio("Punts d'equilibri")
+def mostrar_equilibri(configuracio):
+    """
+    Mostra les regions del paràmetre escollit on és més econòmic cada tipus de clúster.
+    """
+    from break_even import PARAMETRES_EQUILIBRI, PARAMETRES_LINEALS
+    st.subheader("⚖️ Punts d'Equilibri")
+    col_parametre, col_minim, col_maxim = st.columns(3)
+    with col_parametre:
+        parametre = st.selectbox("Paràmetre", PARAMETRES_EQUILIBRI, index=PARAMETRES_EQUILIBRI.index('nombre_tasques'),
+                                 format_func=NOMS_PARAMETRES_EQUILIBRI.get, key="equilibri_parametre")
+    actual = configuracio.get(parametre, 1.0)
+    enter = parametre not in PARAMETRES_LINEALS or PARAMETRES_LINEALS[parametre]
+    with col_minim:
+        if enter:
+            minim = st.number_input("Mínim", min_value=1, value=1, step=1, key=f"equilibri_minim_{parametre}")
+        else:
+            minim = st.number_input("Mínim", min_value=0.0, value=0.0, key=f"equilibri_minim_{parametre}")
+    with col_maxim:
+        if enter:
+            maxim = st.number_input("Màxim", min_value=1, value=max(int(actual) * 10, 100), step=1,
+                                    key=f"equilibri_maxim_{parametre}")
+        else:
+            maxim = st.number_input("Màxim", min_value=0.0, value=float(actual) * 10, key=f"equilibri_maxim_{parametre}")
+    if minim > maxim:
+        st.warning("El mínim no pot ser més gran que el màxim.")
+        return
+
+    claus_configuracio = tuple(sorted(
+        (clau, _clau_instancia(valor) if isinstance(valor, VMInstance) else valor) for clau, valor in configuracio.items()))
+    try:
+        regions = resultats_equilibri(claus_configuracio, parametre, minim, maxim)
+    except ValueError as e:
+        st.warning(str(e))
+        return
+    canvis = [regio['des_de'] for regio in regions[1:]]
+    if not canvis:
+        st.info(f"En tot el rang, l'opció més econòmica és **{regions[0]['opcio']}**.")
+    else:
+        format_valor = (lambda v: f"{v}") if enter else (lambda v: f"{v:.4f}")
+        st.write(f"**Canvis de l'opció més econòmica ({len(canvis)}):** "
+                 + ", ".join(format_valor(v) for v in canvis[:20]) + (" …" if len(canvis) > 20 else ""))
+
+    data_regions = pd.DataFrame(regions[:MAX_REGIONS_DIBUIXADES]).rename(
+        columns={'des_de': 'Des de', 'fins_a': 'Fins a', 'opcio': 'Més econòmic'})
+    regions_chart = alt.Chart(data_regions).mark_bar(height=30).encode(
+        x=alt.X('Des de:Q', title=NOMS_PARAMETRES_EQUILIBRI[parametre]),
+        x2='Fins a:Q',
+        color='Més econòmic:N',
+        tooltip=list(data_regions.columns)
+    ).properties(height=80)
+    st.altair_chart(regions_chart, use_container_width=True)
+    if len(regions) > MAX_REGIONS_DIBUIXADES:
+        st.caption(f"Es mostren les primeres {MAX_REGIONS_DIBUIXADES} regions de {len(regions)}.")
+
+def mostrar_rendiment():
+    """
+    Mostra a la barra lateral els encerts i fallades de cache de cada etapa i el temps d'aquesta execució i, si
+    la instrumentació està activada, el temps i la memòria de cada secció i els reruns.
+    """
+    execucio, temps_total = execucio_actual()
+    acumulat = estadistiques()
+    with st.sidebar.expander("⏱️ Rendiment i cache"):
+        st.write(f"**Temps d'aquesta execució:** {temps_total * 1000:.1f} ms")
+        st.dataframe(pd.DataFrame({
+            'Etapa': [nom for nom, _, _ in execucio],
+            'Cache': ['encert' if encert else 'fallada' for _, encert, _ in execucio],
+            'Temps (ms)': [durada * 1000 for _, _, durada in execucio]
+        }), hide_index=True)
+        st.write("**Acumulat de totes les sessions:**")
+        st.dataframe(pd.DataFrame({
+            'Etapa': list(acumulat),
+            'Encerts': [valors['encerts'] for valors in acumulat.values()],
+            'Fallades': [valors['fallades'] for valors in acumulat.values()],
+            'Temps fallades (ms)': [valors['temps_fallades'] * 1000 for valors in acumulat.values()]
+        }), hide_index=True)
+        if not instrumentacio_activa():
+            return
+        
+        # Seccions de main() i reruns, només amb CLUSTER_COST_INSTRUMENTACIO
+        total_reruns, sessions = reruns()
+        st.write(f"**Reruns d'aquesta sessió:** {reruns(_id_sessio())} · "
+                 f"**Totals:** {total_reruns} en {sessions} sessions")
+        seccions = seccions_actuals()
+        data_seccions = pd.DataFrame({
+            'Secció': ['\u2003' * nivell + nom for nom, nivell, _, _, _ in seccions],
+            'Temps (ms)': [durada * 1000 for _, _, durada, _, _ in seccions]
+        })
+        if seccions and seccions[0][3] is not None:
+            data_seccions['Memòria neta (KB)'] = [(neta or 0) / 1024 for _, _, _, neta, _ in seccions]
+            data_seccions['Pic de memòria (KB)'] = [(pic or 0) / 1024 for _, _, _, _, pic in seccions]
+        st.dataframe(data_seccions, hide_index=True)
+        acumulat_seccions = estadistiques_seccions()
+        st.write("**Seccions, acumulat de totes les sessions:**")
+        st.dataframe(pd.DataFrame({
+            'Secció': list(acumulat_seccions),
+            'Execucions': [valors['execucions'] for valors in acumulat_seccions.values()],
+            'Temps mitjà (ms)': [valors['temps_total'] / valors['execucions'] * 1000
+                                 for valors in acumulat_seccions.values()],
+            'Temps màxim (ms)': [valors['temps_maxim'] * 1000 for valors in acumulat_seccions.values()]
+        }), hide_index=True)
+
+@seccio("Optimitzador")
+def mostrar_optimitzador(clau_cataleg, nombre_tasques, temps_execucio_per_tasca_min, startup_overhead_time,
+                         cost_dbu_job, cost_dbu_all_purpose):
+    """
+    Mostra la secció de l'optimitzador: el front de Pareto cost vs. temps per a la càrrega de treball actual.
+    """
+    st.header("🧭 Optimitzador de Configuració")
+    st.markdown("""
+    Cerca entre totes les instàncies, nombres de workers i tasques en paral·lel (fins a una tasca per vCPU dels workers) 
+    les configuracions més econòmiques per a la càrrega de treball actual, i mostra les que no són pitjors en cost i en temps alhora.
+    """)
+    col_termini, col_pressupost, col_workers = st.columns(3)
+    with col_termini:
+        termini_min = st.number_input("⏳ Termini màxim (minuts, 0 = sense límit)", min_value=0.0, value=0.0, step=1.0)
+    with col_pressupost:
+        pressupost = st.number_input("💶 Pressupost màxim (€, 0 = sense límit)", min_value=0.0, value=0.0, step=1.0)
+    with col_workers:
+        max_workers = st.number_input("👥 Nombre màxim de workers", min_value=1, value=1000, step=1)
+
+    front = front_optimitzador(clau_cataleg, nombre_tasques, temps_execucio_per_tasca_min, startup_overhead_time,
+                               termini_min or None, pressupost or None, max_workers, cost_dbu_job, cost_dbu_all_purpose)
+    if not front:
+        st.warning("Cap configuració compleix el termini i el pressupost indicats.")
+        return
+
+    millor = front[0]
+    st.success(f"La configuració més econòmica és **{millor['tipus']}** amb driver **{millor['driver']}**, "
+               f"**{millor['nombre_workers']}** workers **{millor['worker']}** i **{millor['max_parallel_tasks']}** "
+               f"tasques en paral·lel: **€{millor['cost_total']:.4f}** en **{millor['temps_total_min']} minuts**")
+
+    data_front = pd.DataFrame({
+        'Clúster': [c['tipus'] for c in front],
+        'Driver': [c['driver'] for c in front],
+        'Worker': [c['worker'] for c in front],
+        'Nombre de Workers': [c['nombre_workers'] for c in front],
+        'Tasques en Paral·lel': [c['max_parallel_tasks'] for c in front],
+        'Onades': [c['nombre_onades'] for c in front],
+        'Temps Total Actiu (minuts)': [c['temps_total_min'] for c in front],
+        'Cost Total (€)': [c['cost_total'] for c in front]
+    })
+    st.dataframe(data_front, use_container_width=True)
+
+    front_chart = alt.Chart(data_front).mark_line(point=True).encode(
+        x=alt.X('Cost Total (€)', title='Cost Total (€)'),
+        y=alt.Y('Temps Total Actiu (minuts)', title='Temps Total Actiu (minuts)'),
+        color='Clúster',
+        tooltip=list(data_front.columns)
+    ).properties(
+        width=600,
+        height=400,
+        title='Front de Pareto Cost vs Temps'
+    )
+    st.altair_chart(front_chart, use_container_width=True)
+
+@seccio("Simulació")
+def mostrar_simulacio(configuracions, nombre_tasques, temps_execucio_per_tasca_min, startup_overhead_time):
+    """
+    Mostra la secció de simulació: cost i temps amb durades de tasca variables i autoescalat, per a cada clúster.
+    `configuracions` és una llista de (nom del clúster, driver, worker, workers mínims, tasques en paral·lel,
+    cost DBU, cost del model).
+    """
+    from cluster_simulation import DISTRIBUCIONS
+    st.header("🎲 Simulació amb Durades Variables")
+    st.markdown("""
+    Simula l'execució tasca a tasca amb durades aleatòries al voltant del temps d'execució per tasca, amb com a màxim 
+    el nombre de tasques en paral·lel configurat (i una tasca per vCPU de cada worker) i autoescalat entre el nombre de 
+    workers configurat i el màxim indicat.
+    """)
+    col_distribucio, col_variacio, col_maxim, col_repliques = st.columns(4)
+    with col_distribucio:
+        distribucio = st.selectbox("📐 Distribució de les durades", DISTRIBUCIONS, index=DISTRIBUCIONS.index('lognormal'))
+    with col_variacio:
+        coeficient_variacio = st.number_input("📊 Coeficient de variació", min_value=0.0, value=0.5, step=0.1)
+    with col_maxim:
+        factor_maxim = st.number_input("📈 Màxim de workers (× configurats)", min_value=1, value=2, step=1)
+    with col_repliques:
+        nombre_repliques = st.number_input("🔁 Rèpliques", min_value=1, max_value=200, value=20, step=1)
+
+    # Les rèpliques es reparteixen entre processos quan la feina compensa el cost d'arrencar-los
+    processos = 1
+    if nombre_repliques * nombre_tasques >= MIN_TASQUES_SIMULACIO_PARAL_LELA:
+        processos = min(os.cpu_count() or 1, nombre_repliques)
+
+    files = []
+    for nom, driver, worker, workers, max_parallel_tasks, cost_dbu, cost_model in configuracions:
+        resum = resultats_simulacio(
+            _clau_instancia(driver), _clau_instancia(worker), nombre_tasques, temps_execucio_per_tasca_min,
+            distribucio, coeficient_variacio, workers, workers * factor_maxim, max_parallel_tasks,
+            startup_overhead_time, cost_dbu, nombre_repliques, processos)
+        files.append({
+            'Clúster': nom,
+            'Cost Model (€)': cost_model,
+            'Cost Simulat (€)': resum['cost_total']['mitjana'],
+            'Interval Cost 95% (€)': "{:.4f} – {:.4f}".format(*resum['cost_total']['interval']),
+            'Temps Simulat (minuts)': resum['makespan_min']['mitjana'],
+            'Interval Temps 95% (minuts)': "{:.1f} – {:.1f}".format(*resum['makespan_min']['interval']),
+            'Màxim de Workers': resum['maxim_workers']['mitjana']
+        })
+    st.dataframe(pd.DataFrame(files), hide_index=True, use_container_width=True)
+
+# Streamlit App
+def main():
+    # Configure the page
+    st.set_page_config(page_title="📊 Cluster Cost Calculator", layout="wide", initial_sidebar_state="expanded")
+    configurar_instrumentacio()
+    iniciar_execucio(_id_sessio() if instrumentacio_activa() else None)
+    
+    with seccio("Capçalera i logo"):
+        # Main title with logo
+        col_title, col_logo = st.columns([4, 1])
+        with col_title:
+            st.title("📊 Cluster Cost Calculator")
+        with col_logo:
+            try:
+                st.image("logo.png", width=200)
+            except:
+                st.write("![Logo](https://via.placeholder.com/200)")
+
+        st.markdown("""
+        Aquesta aplicació permet calcular els costos i els temps d'execució dels **Job Clusters** i **All-Purpose Clusters** segons la seva configuració i les tasques que han de realitzar.
+        """)
+    
+    with seccio("Catàleg i taules d'instàncies"):
+        # Summary table of instance costs
+        st.header("📋 Resum dels Costos de les Instàncies")
+
+        # Catàleg de preus: el per defecte o un full de preus local indicat amb CLUSTER_COST_CATALOG
+        from instance_catalog import carregar_cataleg
+        ruta_cataleg = os.environ.get('CLUSTER_COST_CATALOG') or None
+        cataleg = carregar_cataleg(ruta_cataleg)
+        versio_cataleg = os.stat(ruta_cataleg).st_mtime_ns if ruta_cataleg else None
+        regions = cataleg.regions_disponibles()
+        modalitats = cataleg.modalitats_disponibles()
+        if len(regions) > 1 or len(modalitats) > 1:
+            st.sidebar.subheader("📚 Catàleg de preus")
+        regio = st.sidebar.selectbox("🌍 Regió", regions) if len(regions) > 1 else regions[0]
+        modalitat = st.sidebar.selectbox("💲 Modalitat de preu", modalitats) if len(modalitats) > 1 else modalitats[0]
+        photon = st.sidebar.checkbox("⚡ Photon (multiplica el cost de les DBUs)", value=False)
+        clau_cataleg = (ruta_cataleg, versio_cataleg, regio, modalitat)
+        instancies = _instancies_cataleg(clau_cataleg)
+
+        # Constants for DBU costs (remain unchanged)
+        cost_dbu_job = cataleg.cost_dbu(job=True, photon=photon)
+        cost_dbu_all_purpose = cataleg.cost_dbu(job=False, photon=photon)
+
+        data_instances, data_compute_costs = taules_instancies(clau_cataleg, cost_dbu_job, cost_dbu_all_purpose)
+
+        col_instances, col_compute_costs = st.columns(2)
+        with col_instances:
+            st.subheader("Instàncies Disponibles")
+            if len(data_instances) > 20:
+                st.dataframe(data_instances, hide_index=True)
+            else:
+                st.table(data_instances)
+        with col_compute_costs:
+            st.subheader("Costos per Tipus de Càlcul")
+            st.table(data_compute_costs)
+    
+    with seccio("Barra lateral"):
+        # Sidebar inputs
+        st.sidebar.header("🛠️ Configuració")
+
+        # --- Job Cluster Configuration ---
+        st.sidebar.subheader("Job Cluster Configuració")
+        instance_names = [inst.name for inst in instancies]
+        if not instance_names:
+            st.error(f"El catàleg no té instàncies per a la regió {regio or '(sense regió)'} i la modalitat {modalitat}.")
+            st.stop()
+        # Instàncies per defecte de cada selector; un catàleg pot tenir menys de quatre SKUs
+        ultima = len(instance_names) - 1
+        selected_instance_job_driver = st.sidebar.selectbox("🔍 Tipus d'instància per al **Driver del Job Cluster**", instance_names, index=0)
+        instancia_job_driver = cataleg.obtenir(selected_instance_job_driver, region=regio, pricing=modalitat)
+
+        selected_instance_job_worker = st.sidebar.selectbox("🔍 Tipus d'instància per als **Workers del Job Cluster**", instance_names, index=min(1, ultima))
+        instancia_job_worker = cataleg.obtenir(selected_instance_job_worker, region=regio, pricing=modalitat)
+
+        nombre_workers_job = st.sidebar.number_input("👥 Nombre de workers (Job Cluster)", min_value=1, value=1, step=1)
+
+        # New: Job Cluster maximum parallel tasks input
+        max_parallel_tasks_job = st.sidebar.number_input("⚙️ Nombre màxim de tasques en paral·lel (Job Cluster)", 
+                                                         min_value=1, value=35, step=1)
+
+        st.sidebar.markdown("---")
+
+        # --- All-Purpose Cluster Configuration ---
+        st.sidebar.subheader("All-Purpose Cluster Configuració")
+        selected_instance_all_purpose_driver = st.sidebar.selectbox("🔍 Tipus d'instància per al **Driver de l'All-Purpose Cluster**", instance_names, index=min(2, ultima))
+        instancia_all_purpose_driver = cataleg.obtenir(selected_instance_all_purpose_driver, region=regio, pricing=modalitat)
+
+        selected_instance_all_purpose_worker = st.sidebar.selectbox("🔍 Tipus d'instància per als **Workers de l'All-Purpose Cluster**", instance_names, index=min(3, ultima))
+        instancia_all_purpose_worker = cataleg.obtenir(selected_instance_all_purpose_worker, region=regio, pricing=modalitat)
+
+        nombre_workers_all_purpose = st.sidebar.number_input("👥 Nombre de workers (All-Purpose)", min_value=1, value=5, step=1)
+
+        # New: All-Purpose Cluster maximum parallel tasks input
+        max_parallel_tasks_all_purpose = st.sidebar.number_input("⚙️ Nombre màxim de tasques en paral·lel (All-Purpose)", 
+                                                                 min_value=1, 
+                                                                 value=nombre_workers_all_purpose, 
+                                                                 step=1)
+
+        st.sidebar.markdown("---")
+
+        # --- Task and Overhead Configuration ---
+        temps_execucio_per_tasca_min = st.sidebar.number_input("⏱️ Temps d'execució per tasca (minuts)", min_value=0.1, value=10.0, step=0.1)
+        nombre_tasques = st.sidebar.number_input("🔢 Nombre de tasques", min_value=1, value=100, step=1)
+
+        # New: Startup overhead time input (in minutes)
+        startup_overhead_time = st.sidebar.number_input("⏱️ Startup Overhead Time (minuts)", min_value=0.1, value=2.5, step=0.1)
+
+        st.sidebar.markdown("---")
+        mode_optimitzador = st.sidebar.checkbox("🧭 Mostrar l'optimitzador de configuració", value=False)
+        mode_simulacio = st.sidebar.checkbox("🎲 Mostrar la simulació amb durades variables", value=False)
+        mode_escombrat = st.sidebar.checkbox("🔬 Mostrar l'explorador de sensibilitat", value=False)
+    
+    
+    
+    # -------------------------------
+    with seccio("Càlculs dels clústers"):
+        # Job Cluster Calculations
+        resultats_job = resultats_job_cluster(
+            _clau_instancia(instancia_job_driver), _clau_instancia(instancia_job_worker), nombre_workers_job,
+            max_parallel_tasks_job, nombre_tasques, temps_execucio_per_tasca_min, startup_overhead_time, cost_dbu_job)
+        cost_per_tasca_job = resultats_job['cost_per_tasca']
+        cost_total_job = resultats_job['cost_total']
+        temps_total_min_job = resultats_job['temps_total_min']
+
+        # -------------------------------
+        # All-Purpose Cluster Calculations
+        resultats_all_purpose = resultats_all_purpose_cluster(
+            _clau_instancia(instancia_all_purpose_driver), _clau_instancia(instancia_all_purpose_worker),
+            nombre_workers_all_purpose, max_parallel_tasks_all_purpose, nombre_tasques, temps_execucio_per_tasca_min,
+            startup_overhead_time, cost_dbu_all_purpose)
+        cost_total_all_purpose = resultats_all_purpose['cost_total']
+        temps_total_actiu_min_all_purpose = resultats_all_purpose['temps_total_min']
+    
+    # -------------------------------
+    with seccio("Resultats i detalls"):
+        # Display Results
+        col1, col2 = st.columns(2)
+        with col1:
+            st.header("📈 Resultats Job Cluster")
+            with st.expander("📋 Detalls del Job Cluster"):
+                st.markdown(resultats_job['detalls'])
+            with st.expander("💰 Càlculs de Cost Job Cluster"):
+                st.markdown(resultats_job['calculs'])
+            st.metric(label="**Cost per tasca**", value=f"€{cost_per_tasca_job:.4f}")
+            st.metric(label="**Cost total**", value=f"€{cost_total_job:.4f}")
+            st.metric(label="**Temps Total Actiu**", value=f"{temps_total_min_job} minuts")
+
+        with col2:
+            st.header("📉 Resultats All-Purpose Cluster")
+            with st.expander("📋 Detalls de l'All-Purpose Cluster"):
+                st.markdown(resultats_all_purpose['detalls'])
+            with st.expander("💰 Càlculs de Cost All-Purpose Cluster"):
+                st.markdown(resultats_all_purpose['calculs'])
+            st.metric(label="**Cost total**", value=f"€{cost_total_all_purpose:.4f}")
+            st.metric(label="**Temps Total Actiu**", value=f"{temps_total_actiu_min_all_purpose} minuts")
+    
+    # -------------------------------
+    with seccio("Gràfics de comparació"):
+        # Graphical Comparison of Costs
+        bar_chart_cost, bar_chart_time, scatter_chart = grafics_comparacio(
+            cost_total_job, cost_total_all_purpose, temps_total_min_job, temps_total_actiu_min_all_purpose)
+        st.header("📊 Comparació de Costos")
+        st.altair_chart(bar_chart_cost, use_container_width=True)
+
+        # Graphical Comparison of Execution Times
+        st.header("⏰ Comparació de Temps d'Execució")
+        st.altair_chart(bar_chart_time, use_container_width=True)
+
+        # Scatter plot: Cost vs Time
+        st.header("📈 Optimalitat en Temps vs Cost")
+        st.altair_chart(scatter_chart, use_container_width=True)
+    
+    with seccio("Resultats finals"):
+        # Final Results and Conclusion
+        st.header("🏆 Resultats Finals")
+        st.write(f"**Cost total Job Cluster:** €{cost_total_job:.4f}")
+        st.write(f"**Cost total All-Purpose:** €{cost_total_all_purpose:.4f}")
+        st.write(f"**Temps total actiu Job Cluster:** {temps_total_min_job} minuts")
+        st.write(f"**Temps total actiu All-Purpose Cluster:** {temps_total_actiu_min_all_purpose} minuts")
+
+        diferencia_cost = abs(cost_total_job - cost_total_all_purpose)
+        if cost_total_job < cost_total_all_purpose:
+            estalvi = diferencia_cost
+            percentatge_estalvi = (diferencia_cost / cost_total_all_purpose) * 100
+            st.success(f"La opció més econòmica és **Job Cluster**")
+            st.write(f"**Estalvi en Cost:** €{estalvi:.4f}")
+            st.write(f"**Percentatge d'estalvi en Cost:** {percentatge_estalvi:.2f}%")
+        else:
+            estalvi = diferencia_cost
+            percentatge_estalvi = (diferencia_cost / cost_total_job) * 100
+            st.success(f"La opció més econòmica és **All-Purpose Cluster**")
+            st.write(f"**Estalvi en Cost:** €{estalvi:.4f}")
+            st.write(f"**Percentatge d'estalvi en Cost:** {percentatge_estalvi:.2f}%")
+    
+    mostrar_equilibri({
+        'driver_job': instancia_job_driver,
+        'worker_job': instancia_job_worker,
+        'nombre_workers_job': nombre_workers_job,
+        'max_parallel_tasks_job': max_parallel_tasks_job,
+        'driver_all_purpose': instancia_all_purpose_driver,
+        'worker_all_purpose': instancia_all_purpose_worker,
+        'nombre_workers_all_purpose': nombre_workers_all_purpose,
+        'max_parallel_tasks_all_purpose': max_parallel_tasks_all_purpose,
+        'nombre_tasques': nombre_tasques,
+        'temps_execucio_per_tasca_min': temps_execucio_per_tasca_min,
+        'startup_overhead_time': startup_overhead_time,
+        'cost_dbu_job': cost_dbu_job,
+        'cost_dbu_all_purpose': cost_dbu_all_purpose
+    })
+    
+    if mode_optimitzador:
+        mostrar_optimitzador(clau_cataleg, nombre_tasques, temps_execucio_per_tasca_min, startup_overhead_time,
+                             cost_dbu_job, cost_dbu_all_purpose)
+    
+    if mode_simulacio:
+        mostrar_simulacio([
+            ('Job Cluster', instancia_job_driver, instancia_job_worker, nombre_workers_job, max_parallel_tasks_job,
+             cost_dbu_job, cost_total_job),
+            ('All-Purpose Cluster', instancia_all_purpose_driver, instancia_all_purpose_worker, nombre_workers_all_purpose,
+             max_parallel_tasks_all_purpose, cost_dbu_all_purpose, cost_total_all_purpose)
+        ], nombre_tasques, temps_execucio_per_tasca_min, startup_overhead_time)
+    
+    if mode_escombrat:
+        config_comuna = {
+            'nombre_tasques': nombre_tasques,
+            'temps_execucio_per_tasca_min': temps_execucio_per_tasca_min,
+            'startup_overhead_time': startup_overhead_time
+        }
+        mostrar_escombrat(
+            clau_cataleg,
+            dict(config_comuna, driver=instancia_job_driver.name, worker=instancia_job_worker.name,
+                 nombre_workers=nombre_workers_job, max_parallel_tasks=max_parallel_tasks_job),
+            dict(config_comuna, driver=instancia_all_purpose_driver.name, worker=instancia_all_purpose_worker.name,
+                 nombre_workers=nombre_workers_all_purpose, max_parallel_tasks=max_parallel_tasks_all_purpose),
+            cost_dbu_job, cost_dbu_all_purpose)
     
     st.markdown("---")
     st.markdown("""
     📝 **Nota**: Aquests càlculs són aproximacions i poden variar segons la naturalesa específica de les tasques, la configuració del clúster i altres factors operatius.
     """)
+    
+    mostrar_rendiment()
+    
+    # Mètriques en format Prometheus per a un recol·lector local (p. ex. el textfile collector del node exporter)
+    ruta_metriques = os.environ.get('CLUSTER_COST_METRIQUES')
+    if ruta_metriques:
+        escriure_metriques(ruta_metriques)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,179 @@
+"""
+Optimitzador de configuracions de clúster.
+
+Cerca, per a una càrrega de treball donada, la combinació d'instàncies (driver i workers), nombre de workers
+i tasques en paral·lel més econòmica per a cada tipus de clúster, i retorna el front de Pareto cost vs. temps.
+
+En lloc de provar totes les combinacions, la cerca aprofita l'estructura del model de cost:
+
+- El driver no afecta el temps d'execució i el seu cost és un terme independent dels workers, de manera que
+  el millor driver es tria per separat.
+- Amb `max_parallel_tasks` limitat a les vCPUs dels workers, mai surt a compte fer servir menys paral·lelisme
+  del disponible: el cost no baixa i el temps no millora.
+- Per a un nombre d'onades fix, el cost creix amb el nombre de workers, així que només cal el nombre mínim de
+  workers que assoleix aquestes onades. Els valors diferents de ceil(tasques / paral·lelisme) són O(√tasques).
+"""
+from math import ceil, isqrt
+import numpy as np
+
+from cost_model import (
+    COST_DBU_JOB, COST_DBU_ALL_PURPOSE, TIPUS_JOB, TIPUS_ALL_PURPOSE,
+    calcular_cost_job_cluster, calcular_cost_all_purpose,
+)
+
+
+def _onades_possibles(total_tasks):
+    """
+    Retorna, ordenats, tots els valors diferents de ceil(total_tasks / p) per a p >= 1.
+    """
+    arrel = isqrt(total_tasks) + 1
+    petits = np.arange(1, arrel + 1, dtype=np.int64)
+    onades = np.concatenate([petits, -(-total_tasks // petits)])
+    return np.unique(onades[onades <= total_tasks])
+
+
+def _workers_no_dominats(instancies):
+    """
+    Descarta els tipus de worker dominats: un worker és dominat si n'hi ha un altre amb almenys les mateixes
+    vCPUs i un cost per hora i DBUs que no són superiors.
+    """
+    ordre = sorted(range(len(instancies)),
+                   key=lambda i: (-instancies[i].vCPUs, instancies[i].cost_per_hour, instancies[i].DBUs))
+    seleccionats = []
+    for i in ordre:
+        inst = instancies[i]
+        if any(instancies[j].cost_per_hour <= inst.cost_per_hour and instancies[j].DBUs <= inst.DBUs
+               for j in seleccionats):
+            continue
+        seleccionats.append(i)
+    return [instancies[i] for i in seleccionats]
+
+
+def _front_pareto(candidats):
+    """
+    Manté només els candidats no dominats (menys cost o menys temps), ordenats per temps creixent.
+    """
+    front = []
+    millor_cost = float('inf')
+    for candidat in sorted(candidats, key=lambda c: (c['temps_total_min'], c['cost_total'])):
+        if candidat['cost_total'] < millor_cost:
+            front.append(candidat)
+            millor_cost = candidat['cost_total']
+    return front
+
+
+def _candidats_tipus(tipus, instancies, workers, total_tasks, temps_execucio_min, startup_overhead_time,
+                     cost_dbu, max_workers, tasques_per_vcpu, termini_min):
+    """
+    Calcula, per a cada nombre d'onades possible, la configuració més barata d'un tipus de clúster.
+    """
+    preu_minut = 1 / 60
+    if tipus == TIPUS_JOB:
+        # Cost total = tasques * ((overhead + execució) / 60 * cost VM + execució / 60 * DBUs * cost DBU)
+        pes_vm = total_tasks * (startup_overhead_time + temps_execucio_min) * preu_minut
+        pes_dbu = total_tasks * temps_execucio_min * preu_minut * cost_dbu
+    else:
+        # Cost total = temps actiu / 60 * (cost VM + DBUs * cost DBU); el temps actiu depèn de les onades
+        pes_vm = 1.0
+        pes_dbu = cost_dbu
+    driver = min(instancies, key=lambda inst: pes_vm * inst.cost_per_hour + pes_dbu * inst.DBUs)
+
+    onades = _onades_possibles(total_tasks)
+    if tipus == TIPUS_JOB:
+        temps = onades * (startup_overhead_time + temps_execucio_min)
+    else:
+        temps = startup_overhead_time + onades * temps_execucio_min
+    if termini_min is not None:
+        dins_termini = temps <= termini_min
+        onades, temps = onades[dins_termini], temps[dins_termini]
+    if len(onades) == 0:
+        return []
+
+    # Matriu onades x workers: nombre mínim de workers per no superar cada nombre d'onades
+    slots = np.array([inst.vCPUs * tasques_per_vcpu for inst in workers], dtype=np.int64)
+    paral_lelisme_necessari = -(-total_tasks // onades)
+    nombre_workers = -(-paral_lelisme_necessari[:, None] // slots[None, :])
+    cost_worker = np.array([pes_vm * inst.cost_per_hour + pes_dbu * inst.DBUs for inst in workers])
+    cost_driver = pes_vm * driver.cost_per_hour + pes_dbu * driver.DBUs
+    cost = cost_driver + nombre_workers * cost_worker[None, :]
+    if tipus == TIPUS_ALL_PURPOSE:
+        cost = cost * (temps[:, None] * preu_minut)
+    cost = np.where(nombre_workers <= max_workers, cost, np.inf)
+
+    millor_worker = np.argmin(cost, axis=1)
+    files = np.arange(len(onades))
+    factibles = np.isfinite(cost[files, millor_worker])
+
+    candidats = []
+    for fila in files[factibles]:
+        worker = workers[millor_worker[fila]]
+        n = int(nombre_workers[fila, millor_worker[fila]])
+        max_parallel_tasks = min(total_tasks, n * worker.vCPUs * tasques_per_vcpu)
+        candidats.append(_avaluar_configuracio(
+            tipus, driver, worker, n, max_parallel_tasks, total_tasks, temps_execucio_min,
+            startup_overhead_time, cost_dbu))
+    return candidats
+
+
+def _avaluar_configuracio(tipus, driver, worker, nombre_workers, max_parallel_tasks, total_tasks,
+                          temps_execucio_min, startup_overhead_time, cost_dbu):
+    """
+    Calcula el cost exacte d'una configuració amb les mateixes funcions que fa servir l'aplicació.
+    """
+    total_DBUs = (1 * driver.DBUs) + (nombre_workers * worker.DBUs)
+    cost_vm_driver = 1 * driver.cost_per_hour
+    cost_vm_workers = nombre_workers * worker.cost_per_hour
+    if tipus == TIPUS_JOB:
+        cost_per_tasca, _, _, temps_total_min, nombre_onades = calcular_cost_job_cluster(
+            cost_vm_driver, cost_vm_workers, total_DBUs, cost_dbu,
+            startup_overhead_time, temps_execucio_min, max_parallel_tasks, total_tasks)
+        cost_total = total_tasks * cost_per_tasca
+    else:
+        nombre_onades = ceil(total_tasks / max_parallel_tasks)
+        temps_total_min = startup_overhead_time + nombre_onades * temps_execucio_min
+        cost_total = calcular_cost_all_purpose(
+            cost_vm_driver, cost_vm_workers, total_DBUs, cost_dbu, temps_total_min)[0]
+    return {
+        'tipus': tipus,
+        'driver': driver.name,
+        'worker': worker.name,
+        'nombre_workers': nombre_workers,
+        'max_parallel_tasks': max_parallel_tasks,
+        'nombre_onades': nombre_onades,
+        'temps_total_min': temps_total_min,
+        'cost_total': cost_total,
+    }
+
+
+def optimitzar_clusters(nombre_tasques, temps_execucio_per_tasca_min, startup_overhead_time, instancies,
+                        termini_min=None, pressupost=None, max_workers=1000, tasques_per_vcpu=1,
+                        cost_dbu_job=COST_DBU_JOB, cost_dbu_all_purpose=COST_DBU_ALL_PURPOSE):
+    """
+    Cerca les configuracions de Job Cluster i All-Purpose Cluster més econòmiques per a una càrrega de treball.
+
+    El paral·lelisme d'un clúster es limita a `tasques_per_vcpu` tasques per vCPU dels workers. Es poden
+    restringir els resultats amb un termini (temps total actiu màxim, en minuts) i/o un pressupost (€).
+
+    Retorna el front de Pareto cost vs. temps de tots dos tipus de clúster, ordenat de més econòmic a més car.
+    Cada element és un diccionari amb el tipus, les instàncies, el nombre de workers, el paral·lelisme, les
+    onades, el temps total actiu i el cost total.
+    """
+    if nombre_tasques < 1 or max_workers < 1 or tasques_per_vcpu < 1:
+        raise ValueError("El nombre de tasques, de workers i de tasques per vCPU ha de ser com a mínim 1")
+    if not instancies:
+        return []
+    nombre_tasques = int(nombre_tasques)
+    workers = _workers_no_dominats(instancies)
+
+    candidats = []
+    for tipus, cost_dbu in ((TIPUS_JOB, cost_dbu_job), (TIPUS_ALL_PURPOSE, cost_dbu_all_purpose)):
+        candidats.extend(_candidats_tipus(
+            tipus, instancies, workers, nombre_tasques, temps_execucio_per_tasca_min, startup_overhead_time,
+            cost_dbu, max_workers, tasques_per_vcpu, termini_min))
+
+    if termini_min is not None:
+        candidats = [c for c in candidats if c['temps_total_min'] <= termini_min]
+    if pressupost is not None:
+        candidats = [c for c in candidats if c['cost_total'] <= pressupost]
+
+    return sorted(_front_pareto(candidats), key=lambda c: (c['cost_total'], c['temps_total_min']))
@@ -0,0 +1,578 @@
+"""
+Empaquetament d'una cartera de càrregues de treball en All-Purpose Clusters compartits o en Job Clusters.
+
+L'aplicació compara una sola càrrega de treball en un clúster dedicat. Aquí, en canvi, es reparteix una cartera
+de càrregues (cadascuna amb les seves tasques, temps per tasca, instant d'arribada, paral·lelisme, vCPUs i RAM per
+tasca i, opcionalment, un termini) entre clústers All-Purpose compartits d'una configuració donada i Job Clusters
+dedicats, per minimitzar el cost total complint els terminis.
+
+- Job Cluster: cada càrrega té el seu clúster, amb el driver i el tipus de worker més econòmics que caben en el
+  termini. El cost es calcula amb `calcular_cost_job_cluster`, de forma vectoritzada per a tota la cartera.
+- All-Purpose compartit: la càrrega ocupa `max_parallel_tasks` × (vCPUs, RAM) per tasca del clúster durant
+  ceil(tasques / paral·lelisme) × temps per tasca, a partir de la seva arribada o, si té termini, d'un retard que
+  encara el compleixi. Si el clúster està aturat quan arriba la càrrega, arrenca llavors i la càrrega no comença
+  fins que ha passat el startup overhead. El clúster es factura amb `calcular_cost_all_purpose` pels períodes en què està engegat: des
+  de l'inici de la primera càrrega fins al final de l'última, més un startup overhead per arrencada i el temps
+  d'inactivitat fins que s'atura. Si entre dues càrregues passa menys temps que el d'inactivitat, el clúster no
+  s'atura i es factura l'interval.
+
+L'heurística és first-fit decreasing: les càrregues s'ordenen de més a menys vCPUs i cadascuna va al clúster
+compartit on cap (comprovant l'ús de vCPUs i RAM al llarg del temps amb perfils indexats per instants) amb menys
+cost marginal, o a un clúster nou si no cap enlloc. Després, es treuen dels clústers compartits les càrregues que
+surten més barates en un Job Cluster, i es dissolen els clústers que costen més que els Job Clusters de totes les
+seves càrregues.
+
+Ús:
+    python cluster_packing.py cartera.csv --worker D8A_V4 --nombre-workers 10
+    python cluster_packing.py cartera.parquet --worker E4DS_V5 --nombre-workers 20 --max-clusters 5 --sortida pla.csv
+"""
+import argparse
+import os
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+import numpy as np
+
+from cost_model import (
+    COST_DBU_JOB, COST_DBU_ALL_PURPOSE, TIPUS_JOB,
+    calcular_cost_all_purpose, calcular_cost_job_cluster_lot,
+)
+from instance_catalog import PREU_ON_DEMAND, carregar_cataleg
+
+# Tipus d'assignació d'una càrrega: un Job Cluster propi (TIPUS_JOB) o un All-Purpose compartit
+COMPARTIT = 'All-Purpose compartit'
+COLUMNES_CARTERA = ['nombre_tasques', 'temps_execucio_per_tasca_min', 'arribada_min']
+
+# Tolerància de les comparacions d'ús i de temps, per als errors d'arrodoniment de les sumes
+_EPSILON = 1e-9
+# Amplada (minuts) de les franges de l'índex temporal de clústers compartits
+AMPLADA_FRANJA_MIN = 60.0
+
+
+class CarregaTreball:
+    """
+    Una càrrega de treball de la cartera. `termini_min` és el temps màxim des de l'arribada fins que acaba
+    (None = sense termini); sense termini, la càrrega comença en arribar o, si el clúster compartit està aturat,
+    tan bon punt ha arrencat.
+    """
+    __slots__ = ('nom', 'nombre_tasques', 'temps_execucio_per_tasca_min', 'arribada_min', 'max_parallel_tasks',
+                 'vCPUs_per_tasca', 'RAM_GB_per_tasca', 'termini_min')
+
+    def __init__(self, nom, nombre_tasques, temps_execucio_per_tasca_min, arribada_min=0.0, max_parallel_tasks=1,
+                 vCPUs_per_tasca=1, RAM_GB_per_tasca=0.0, termini_min=None):
+        if nombre_tasques < 1 or max_parallel_tasks < 1 or vCPUs_per_tasca < 1:
+            raise ValueError(f"{nom}: el nombre de tasques, el paral·lelisme i les vCPUs per tasca han de ser "
+                             f"com a mínim 1")
+        if temps_execucio_per_tasca_min <= 0 or RAM_GB_per_tasca < 0:
+            raise ValueError(f"{nom}: el temps per tasca ha de ser positiu i la RAM per tasca no pot ser negativa")
+        self.nom = nom
+        self.nombre_tasques = int(nombre_tasques)
+        self.temps_execucio_per_tasca_min = float(temps_execucio_per_tasca_min)
+        self.arribada_min = float(arribada_min)
+        self.max_parallel_tasks = int(max_parallel_tasks)
+        self.vCPUs_per_tasca = int(vCPUs_per_tasca)
+        self.RAM_GB_per_tasca = float(RAM_GB_per_tasca)
+        self.termini_min = None if termini_min is None else float(termini_min)
+
+
+def opcions_job_cluster(carregues, instancies, startup_overhead_time, cost_dbu_job=COST_DBU_JOB, max_workers=1000):
+    """
+    Calcula, per a totes les càrregues alhora, el Job Cluster dedicat més econòmic.
+
+    Cada worker hi té tants slots com tasques hi caben per vCPUs i per RAM, i es fan servir els workers mínims per
+    arribar al paral·lelisme de la càrrega. Retorna un diccionari d'arrays amb el cost total, el temps total, el
+    driver i el worker (índexs dins d'`instancies`), el nombre de workers i si es compleix el termini. Si cap
+    configuració no compleix el termini, es dona la més econòmica igualment.
+    """
+    tasques = np.array([c.nombre_tasques for c in carregues], dtype=np.float64)
+    temps = np.array([c.temps_execucio_per_tasca_min for c in carregues], dtype=np.float64)
+    paral_lelisme = np.minimum(np.array([c.max_parallel_tasks for c in carregues], dtype=np.float64), tasques)
+    vcpus_tasca = np.array([c.vCPUs_per_tasca for c in carregues], dtype=np.float64)
+    ram_tasca = np.array([c.RAM_GB_per_tasca for c in carregues], dtype=np.float64)
+    termini = np.array([np.inf if c.termini_min is None else c.termini_min for c in carregues], dtype=np.float64)
+
+    vcpus = np.array([inst.vCPUs for inst in instancies], dtype=np.float64)
+    ram = np.array([inst.RAM_GB for inst in instancies], dtype=np.float64)
+    dbus = np.array([inst.DBUs for inst in instancies], dtype=np.float64)
+    costos = np.array([inst.cost_per_hour for inst in instancies], dtype=np.float64)
+
+    # El driver no executa tasques: és el que té menys cost per al temps de VM i de DBUs de cada càrrega
+    pes_vm = tasques * (startup_overhead_time + temps)
+    pes_dbu = tasques * temps * cost_dbu_job
+    driver = np.argmin(pes_vm[:, None] * costos[None, :] + pes_dbu[:, None] * dbus[None, :], axis=1)
+
+    # Matriu càrregues x tipus de worker: slots per worker i workers necessaris
+    with np.errstate(divide='ignore'):
+        slots_ram = np.where(ram_tasca[:, None] > 0, np.floor(ram[None, :] / ram_tasca[:, None]), np.inf)
+    slots = np.minimum(np.floor(vcpus[None, :] / vcpus_tasca[:, None]), slots_ram)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nombre_workers = np.where(slots >= 1, np.ceil(paral_lelisme[:, None] / slots), np.inf)
+    nombre_workers = np.where(nombre_workers <= max_workers, nombre_workers, np.inf)
+    factible = np.isfinite(nombre_workers)
+    n = np.where(factible, nombre_workers, 1.0)
+
+    cost_per_tasca, _, _, temps_total, _ = calcular_cost_job_cluster_lot(
+        costos[driver][:, None], n * costos[None, :], dbus[driver][:, None] + n * dbus[None, :], cost_dbu_job,
+        startup_overhead_time, temps[:, None], paral_lelisme[:, None], tasques[:, None])
+    cost = np.where(factible, tasques[:, None] * cost_per_tasca, np.inf)
+
+    # El temps no depèn del tipus de worker: o totes les configuracions compleixen el termini o cap
+    temps_total = temps_total[:, 0]
+    compleix = temps_total <= termini + _EPSILON
+    worker = np.argmin(cost, axis=1)
+    files = np.arange(len(carregues))
+    return {
+        'cost_total': cost[files, worker],
+        'temps_total_min': temps_total,
+        'driver': driver,
+        'worker': worker,
+        'nombre_workers': nombre_workers[files, worker],
+        'compleix_termini': compleix & np.isfinite(cost[files, worker]),
+    }
+
+
+class _ClusterCompartit:
+    """
+    Estat d'un All-Purpose Cluster compartit durant l'empaquetament.
+
+    L'ús de vCPUs i de RAM és una funció esglaonada del temps: `instants` són els punts de canvi ordenats i
+    `us_vcpus[k]` i `us_ram[k]` l'ús entre `instants[k]` i `instants[k + 1]`. Els períodes en què el clúster està
+    engegat es guarden fusionats i ordenats a `inicis` i `finals`.
+    """
+    def __init__(self, capacitat_vcpus, capacitat_ram, startup_overhead_time, temps_inactivitat_min):
+        self.capacitat_vcpus = capacitat_vcpus
+        self.capacitat_ram = capacitat_ram
+        self.startup_overhead_time = startup_overhead_time
+        self.temps_inactivitat_min = temps_inactivitat_min
+        self.instants = []
+        self.us_vcpus = []
+        self.us_ram = []
+        self.inicis = []
+        self.finals = []
+        self.carregues = []
+
+    def _segments(self, inici, final):
+        # Segments de la funció esglaonada que se solapen amb [inici, final)
+        return max(bisect_right(self.instants, inici) - 1, 0), bisect_left(self.instants, final)
+
+    def engegat(self, instant):
+        """
+        Indica si el clúster ja està engegat a `instant` (o encara no s'ha aturat per inactivitat).
+        """
+        k = bisect_right(self.inicis, instant) - 1
+        return k >= 0 and instant <= self.finals[k] + self.temps_inactivitat_min
+
+    def primer_inici(self, inici, final_maxim, durada, vcpus, ram, inici_fred=None):
+        """
+        Retorna el primer instant entre `inici` i `final_maxim` - `durada` en què la càrrega hi cap, o None.
+
+        Amb `inici_fred`, els inicis en què el clúster està aturat han de ser com a mínim `inici_fred`: si la
+        càrrega l'ha d'arrencar, no pot començar fins que ha passat el startup overhead.
+        """
+        while True:
+            inici = self._primer_inici_amb_capacitat(inici, final_maxim, durada, vcpus, ram)
+            if inici is None or inici_fred is None or inici >= inici_fred - _EPSILON or self.engegat(inici):
+                return inici
+            # Aturat: el següent període engegat o quan la càrrega ja l'hauria arrencat
+            k = bisect_right(self.inicis, inici)
+            inici = min(self.inicis[k], inici_fred) if k < len(self.inicis) else inici_fred
+
+    def _primer_inici_amb_capacitat(self, inici, final_maxim, durada, vcpus, ram):
+        limit_vcpus = self.capacitat_vcpus - vcpus + _EPSILON
+        limit_ram = self.capacitat_ram - ram + _EPSILON
+        while inici + durada <= final_maxim + _EPSILON:
+            primer, ultim = self._segments(inici, inici + durada)
+            if primer >= ultim or (max(self.us_vcpus[primer:ultim]) <= limit_vcpus
+                                   and max(self.us_ram[primer:ultim]) <= limit_ram):
+                return inici
+            # Cap inici anterior al final de l'últim segment ple no pot evitar-lo
+            bloqueig = ultim - 1
+            while self.us_vcpus[bloqueig] <= limit_vcpus and self.us_ram[bloqueig] <= limit_ram:
+                bloqueig -= 1
+            inici = self.instants[bloqueig + 1]
+        return None
+
+    def minuts_marginals(self, inici, final):
+        """
+        Minuts facturats de més si el clúster també ha d'estar engegat entre `inici` i `final`.
+        """
+        inactivitat = self.temps_inactivitat_min
+        primer = bisect_left(self.finals, inici - inactivitat)
+        ultim = bisect_right(self.inicis, final + inactivitat)
+        fixos = self.startup_overhead_time + inactivitat
+        if primer >= ultim:
+            return fixos + final - inici
+        anteriors = sum(self.finals[primer:ultim]) - sum(self.inicis[primer:ultim]) + (ultim - primer) * fixos
+        nou = max(final, self.finals[ultim - 1]) - min(inici, self.inicis[primer]) + fixos
+        return nou - anteriors
+
+    def _punt(self, instant):
+        posicio = bisect_left(self.instants, instant)
+        if posicio < len(self.instants) and self.instants[posicio] == instant:
+            return posicio
+        self.instants.insert(posicio, instant)
+        self.us_vcpus.insert(posicio, self.us_vcpus[posicio - 1] if posicio else 0.0)
+        self.us_ram.insert(posicio, self.us_ram[posicio - 1] if posicio else 0.0)
+        return posicio
+
+    def afegir(self, index, inici, final, vcpus, ram):
+        """
+        Ocupa el clúster amb la càrrega `index` entre `inici` i `final`.
+        """
+        primer = self._punt(inici)
+        ultim = self._punt(final)
+        for k in range(primer, ultim):
+            self.us_vcpus[k] += vcpus
+            self.us_ram[k] += ram
+        self.carregues.append((index, inici, final))
+
+        inactivitat = self.temps_inactivitat_min
+        primer = bisect_left(self.finals, inici - inactivitat)
+        ultim = bisect_right(self.inicis, final + inactivitat)
+        if primer < ultim:
+            inici = min(inici, self.inicis[primer])
+            final = max(final, self.finals[ultim - 1])
+        self.inicis[primer:ultim] = [inici]
+        self.finals[primer:ultim] = [final]
+
+
+def _minuts_facturats(intervals, startup_overhead_time, temps_inactivitat_min):
+    """
+    Minuts facturats d'un clúster compartit que ha d'estar engegat en tots els `intervals` (inici, final).
+    """
+    minuts = 0.0
+    inici_periode = final_periode = None
+    for inici, final in sorted(intervals):
+        if final_periode is not None and inici <= final_periode + temps_inactivitat_min:
+            final_periode = max(final_periode, final)
+            continue
+        if final_periode is not None:
+            minuts += final_periode - inici_periode + startup_overhead_time + temps_inactivitat_min
+        inici_periode, final_periode = inici, final
+    if final_periode is not None:
+        minuts += final_periode - inici_periode + startup_overhead_time + temps_inactivitat_min
+    return minuts
+
+
+def _arrencades_possibles(intervals, inicis_freds, temps_inactivitat_min):
+    """
+    Comprova que cada període engegat d'un clúster compartit, a partir dels `intervals` {índex: (inici, final)},
+    comenci amb una càrrega que ja l'hagi pogut arrencar (inici >= `inicis_freds[índex]`).
+    """
+    final_periode = None
+    arrencat = True
+    for index, (inici, final) in sorted(intervals.items(), key=lambda parell: parell[1]):
+        if final_periode is None or inici > final_periode + temps_inactivitat_min:
+            if not arrencat:
+                return False
+            inici_periode, final_periode, arrencat = inici, final, False
+        final_periode = max(final_periode, final)
+        if inici == inici_periode and inici >= inicis_freds[index] - _EPSILON:
+            arrencat = True
+    return arrencat
+
+
+def _minuts_exclusius(carregues):
+    """
+    Minuts en què cada càrrega és l'única en curs en el clúster, a partir de (índex, inici, final).
+
+    Amb una sola càrrega en curs, la XOR dels índexs actius és precisament el seu índex.
+    """
+    esdeveniments = []
+    for index, inici, final in carregues:
+        esdeveniments.append((inici, 1, index))
+        esdeveniments.append((final, 0, index))
+    esdeveniments.sort()
+    exclusius = {}
+    actives = 0
+    xor = 0
+    anterior = None
+    for instant, tipus, index in esdeveniments:
+        if actives == 1 and instant > anterior:
+            exclusius[xor] = exclusius.get(xor, 0.0) + instant - anterior
+        actives += 1 if tipus else -1
+        xor ^= index
+        anterior = instant
+    return exclusius
+
+
+def empaquetar_cartera(carregues, instancies, driver_compartit, worker_compartit, workers_compartit,
+                       startup_overhead_time, temps_inactivitat_min=10.0, max_clusters_compartits=None,
+                       max_workers_job=1000, cost_dbu_job=COST_DBU_JOB, cost_dbu_all_purpose=COST_DBU_ALL_PURPOSE):
+    """
+    Reparteix `carregues` entre All-Purpose Clusters compartits (tots amb un driver `driver_compartit` i
+    `workers_compartit` workers `worker_compartit`) i Job Clusters dedicats triats entre `instancies`.
+
+    Retorna un diccionari amb:
+    - `assignacions`: per a cada càrrega (en l'ordre d'entrada), el tipus de clúster, el clúster compartit
+      (índex) o la configuració del Job Cluster, l'inici i el final, el cost atribuït i si compleix el termini.
+      El cost d'un clúster compartit es reparteix entre les seves càrregues segons les vCPUs-minut.
+    - `clusters`: per a cada clúster compartit, les càrregues, els períodes engegat, els minuts facturats i el cost.
+    - `cost_total`, `cost_tot_job_clusters` (totes les càrregues en Job Clusters) i `estalvi`.
+    """
+    if workers_compartit < 1:
+        raise ValueError("Els clústers compartits han de tenir com a mínim un worker")
+    carregues = list(carregues)
+    if not carregues:
+        return {'assignacions': [], 'clusters': [], 'cost_total': 0.0, 'cost_tot_job_clusters': 0.0,
+                'estalvi': 0.0}
+    jobs = opcions_job_cluster(carregues, instancies, startup_overhead_time, cost_dbu_job, max_workers_job)
+    cost_job = jobs['cost_total'].tolist()
+    compleix_job = jobs['compleix_termini'].tolist()
+
+    total_DBUs = driver_compartit.DBUs + workers_compartit * worker_compartit.DBUs
+    cost_per_hora = calcular_cost_all_purpose(driver_compartit.cost_per_hour,
+                                              workers_compartit * worker_compartit.cost_per_hour,
+                                              total_DBUs, cost_dbu_all_purpose, 60)[3]
+    cost_minut = cost_per_hora / 60
+    capacitat_vcpus = workers_compartit * worker_compartit.vCPUs
+    capacitat_ram = workers_compartit * worker_compartit.RAM_GB
+
+    # Ocupació de cada càrrega en un clúster compartit (ja engegat: sense startup overhead per càrrega). Sense
+    # termini, la càrrega no pot acabar més tard que en un clúster que arrenca quan arriba
+    necessitats = []
+    inicis_freds = [carrega.arribada_min + startup_overhead_time for carrega in carregues]
+    for carrega in carregues:
+        paral_lelisme = min(carrega.max_parallel_tasks, carrega.nombre_tasques)
+        durada = -(-carrega.nombre_tasques // paral_lelisme) * carrega.temps_execucio_per_tasca_min
+        final_maxim = (carrega.arribada_min + carrega.termini_min if carrega.termini_min is not None
+                       else carrega.arribada_min + startup_overhead_time + durada)
+        necessitats.append((paral_lelisme * carrega.vCPUs_per_tasca, paral_lelisme * carrega.RAM_GB_per_tasca,
+                            durada, final_maxim))
+
+    # First-fit decreasing: primer les càrregues que ocupen més vCPUs
+    ordre = sorted(range(len(carregues)),
+                   key=lambda i: (-necessitats[i][0], -necessitats[i][2], carregues[i].arribada_min))
+    clusters = []
+    ubicacio = [None] * len(carregues)
+    # Índex temporal: per a cada franja, els clústers amb alguna càrrega que hi passa. Un clúster sense càrregues
+    # a prop de la finestra d'una càrrega la pot acollir en arribar, amb el cost marginal d'una arrencada nova.
+    per_franja = defaultdict(set)
+    marge = 2 * temps_inactivitat_min
+    for i in ordre:
+        vcpus, ram, durada, final_maxim = necessitats[i]
+        arribada = carregues[i].arribada_min
+        if vcpus > capacitat_vcpus + _EPSILON or ram > capacitat_ram + _EPSILON:
+            continue
+        propers = set()
+        for franja in range(int((arribada - marge) // AMPLADA_FRANJA_MIN),
+                            int((final_maxim + marge) // AMPLADA_FRANJA_MIN) + 1):
+            propers.update(per_franja.get(franja, ()))
+        millor = None
+        for index_cluster in sorted(propers):
+            cluster = clusters[index_cluster]
+            inici = cluster.primer_inici(arribada, final_maxim, durada, vcpus, ram, inicis_freds[i])
+            if inici is None:
+                continue
+            marginal = cluster.minuts_marginals(inici, inici + durada)
+            if millor is None or marginal < millor[0]:
+                millor = (marginal, index_cluster, inici)
+                if marginal <= _EPSILON:
+                    break
+        marginal_nou = startup_overhead_time + temps_inactivitat_min + durada
+        # En un clúster nou, la càrrega comença quan ha acabat d'arrencar
+        if (millor is None or marginal_nou < millor[0]) and inicis_freds[i] + durada <= final_maxim + _EPSILON:
+            lliure = next((index for index in range(len(clusters)) if index not in propers), None)
+            if lliure is None and (max_clusters_compartits is None or len(clusters) < max_clusters_compartits):
+                clusters.append(_ClusterCompartit(capacitat_vcpus, capacitat_ram, startup_overhead_time,
+                                                  temps_inactivitat_min))
+                lliure = len(clusters) - 1
+            if lliure is not None:
+                millor = (marginal_nou, lliure, inicis_freds[i])
+        if millor is None:
+            continue
+        marginal, index_cluster, inici = millor
+        # Si la càrrega compleix el termini en un Job Cluster que ja costa menys que el marginal, no cal compartir
+        if compleix_job[i] and cost_job[i] < marginal * cost_minut and clusters[index_cluster].carregues:
+            continue
+        clusters[index_cluster].afegir(i, inici, inici + durada, vcpus, ram)
+        ubicacio[i] = (index_cluster, inici)
+        for franja in range(int(inici // AMPLADA_FRANJA_MIN), int((inici + durada) // AMPLADA_FRANJA_MIN) + 1):
+            per_franja[franja].add(index_cluster)
+
+    # Millora: treure les càrregues (o clústers sencers) que surten més barates en Job Clusters
+    membres = []
+    for cluster in clusters:
+        actuals = {index: (inici, final) for index, inici, final in cluster.carregues}
+        if all(compleix_job[index] for index in actuals):
+            minuts = _minuts_facturats(actuals.values(), startup_overhead_time, temps_inactivitat_min)
+            if sum(cost_job[index] for index in actuals) < minuts * cost_minut:
+                for index in actuals:
+                    ubicacio[index] = None
+                membres.append({})
+                continue
+        exclusius = _minuts_exclusius(cluster.carregues)
+        fixos = startup_overhead_time + temps_inactivitat_min
+        candidats = sorted((index for index in actuals
+                            if compleix_job[index]
+                            and cost_job[index] < (exclusius.get(index, 0.0) + fixos) * cost_minut),
+                           key=lambda index: cost_job[index] - exclusius.get(index, 0.0) * cost_minut)
+        minuts = _minuts_facturats(actuals.values(), startup_overhead_time, temps_inactivitat_min)
+        for index in candidats:
+            interval = actuals.pop(index)
+            sense = _minuts_facturats(actuals.values(), startup_overhead_time, temps_inactivitat_min)
+            # Sense la càrrega, una altra pot haver d'arrencar el clúster i ja no tenir temps de fer-ho
+            if ((minuts - sense) * cost_minut > cost_job[index]
+                    and _arrencades_possibles(actuals, inicis_freds, temps_inactivitat_min)):
+                ubicacio[index] = None
+                minuts = sense
+            else:
+                actuals[index] = interval
+        membres.append(actuals)
+
+    # Resultat: només els clústers compartits que han quedat amb alguna càrrega, renumerats
+    resultat_clusters = []
+    numeracio = {}
+    for index_cluster, actuals in enumerate(membres):
+        if not actuals:
+            continue
+        numeracio[index_cluster] = len(resultat_clusters)
+        periodes = []
+        for inici, final in sorted(actuals.values()):
+            if periodes and inici <= periodes[-1][1] + temps_inactivitat_min:
+                periodes[-1][1] = max(periodes[-1][1], final)
+            else:
+                periodes.append([inici, final])
+        minuts = _minuts_facturats(actuals.values(), startup_overhead_time, temps_inactivitat_min)
+        cost = calcular_cost_all_purpose(driver_compartit.cost_per_hour,
+                                         workers_compartit * worker_compartit.cost_per_hour,
+                                         total_DBUs, cost_dbu_all_purpose, minuts)[0]
+        vcpus_minut = sum(necessitats[index][0] * necessitats[index][2] for index in actuals)
+        resultat_clusters.append({
+            'cluster': len(resultat_clusters),
+            'carregues': sorted(actuals),
+            'periodes': [tuple(periode) for periode in periodes],
+            'minuts_facturats': minuts,
+            'cost_total': cost,
+            '_vcpus_minut': vcpus_minut,
+        })
+
+    assignacions = []
+    for i, carrega in enumerate(carregues):
+        vcpus, ram, durada, final_maxim = necessitats[i]
+        if ubicacio[i] is not None and ubicacio[i][0] in numeracio:
+            cluster = resultat_clusters[numeracio[ubicacio[i][0]]]
+            inici = ubicacio[i][1]
+            assignacions.append({
+                'nom': carrega.nom,
+                'tipus': COMPARTIT,
+                'cluster': cluster['cluster'],
+                'driver': driver_compartit.name,
+                'worker': worker_compartit.name,
+                'nombre_workers': workers_compartit,
+                'inici_min': inici,
+                'final_min': inici + durada,
+                'cost_total': cluster['cost_total'] * vcpus * durada / cluster['_vcpus_minut'],
+                'compleix_termini': True,
+            })
+        else:
+            assignacions.append({
+                'nom': carrega.nom,
+                'tipus': TIPUS_JOB,
+                'cluster': None,
+                'driver': instancies[jobs['driver'][i]].name,
+                'worker': instancies[jobs['worker'][i]].name,
+                'nombre_workers': int(jobs['nombre_workers'][i]) if np.isfinite(jobs['nombre_workers'][i]) else None,
+                'inici_min': carrega.arribada_min,
+                'final_min': carrega.arribada_min + float(jobs['temps_total_min'][i]),
+                'cost_total': cost_job[i],
+                'compleix_termini': compleix_job[i],
+            })
+    for cluster in resultat_clusters:
+        del cluster['_vcpus_minut']
+
+    cost_total = (sum(cluster['cost_total'] for cluster in resultat_clusters)
+                  + sum(a['cost_total'] for a in assignacions if a['tipus'] == TIPUS_JOB))
+    cost_tot_job_clusters = float(np.sum(jobs['cost_total']))
+    return {
+        'assignacions': assignacions,
+        'clusters': resultat_clusters,
+        'cost_total': cost_total,
+        'cost_tot_job_clusters': cost_tot_job_clusters,
+        'estalvi': cost_tot_job_clusters - cost_total,
+    }
+
+
+def llegir_cartera(ruta):
+    """
+    Llegeix una cartera de càrregues d'un fitxer CSV o Parquet amb les columnes nombre_tasques,
+    temps_execucio_per_tasca_min i arribada_min, i opcionalment nom, max_parallel_tasks, vCPUs_per_tasca,
+    RAM_GB_per_tasca i termini_min (buit = sense termini).
+    """
+    import pandas as pd
+    if os.path.splitext(ruta)[1].lower() in ('.parquet', '.pq'):
+        taula = pd.read_parquet(ruta)
+    else:
+        taula = pd.read_csv(ruta)
+    absents = [columna for columna in COLUMNES_CARTERA if columna not in taula.columns]
+    if absents:
+        raise ValueError(f"Falten columnes a la cartera: {', '.join(absents)}")
+    noms = taula['nom'].astype(str).tolist() if 'nom' in taula.columns else [f"carrega_{i}" for i in range(len(taula))]
+    opcionals = {columna: taula[columna].tolist() if columna in taula.columns else [valor] * len(taula)
+                 for columna, valor in (('max_parallel_tasks', 1), ('vCPUs_per_tasca', 1), ('RAM_GB_per_tasca', 0.0),
+                                        ('termini_min', None))}
+    return [CarregaTreball(nom, tasques, temps, arribada, paral_lelisme, vcpus, ram,
+                           None if termini is None or termini != termini else termini)
+            for nom, tasques, temps, arribada, paral_lelisme, vcpus, ram, termini in zip(
+                noms, taula['nombre_tasques'].tolist(), taula['temps_execucio_per_tasca_min'].tolist(),
+                taula['arribada_min'].tolist(), opcionals['max_parallel_tasks'], opcionals['vCPUs_per_tasca'],
+                opcionals['RAM_GB_per_tasca'], opcionals['termini_min'])]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reparteix una cartera de càrregues de treball entre "
+                                                 "All-Purpose Clusters compartits i Job Clusters.")
+    parser.add_argument('cartera', help="Fitxer de càrregues de treball (.csv o .parquet)")
+    parser.add_argument('--sortida', help="Fitxer CSV on desar l'assignació de cada càrrega")
+    parser.add_argument('--driver', help="Driver dels clústers compartits (per defecte, el mateix tipus que els workers)")
+    parser.add_argument('--worker', required=True, help="Tipus d'instància dels workers dels clústers compartits")
+    parser.add_argument('--nombre-workers', type=int, required=True, help="Workers de cada clúster compartit")
+    parser.add_argument('--startup-overhead', type=float, default=2.5,
+                        help="Startup overhead de cada clúster, en minuts (per defecte: %(default)s)")
+    parser.add_argument('--inactivitat', type=float, default=10.0,
+                        help="Minuts d'inactivitat abans que s'aturi un clúster compartit (per defecte: %(default)s)")
+    parser.add_argument('--max-clusters', type=int, help="Nombre màxim de clústers compartits")
+    parser.add_argument('--cataleg', help="Full de preus d'instàncies (.json o .csv); per defecte, les instàncies de l'aplicació")
+    parser.add_argument('--regio', help="Regió del catàleg a fer servir")
+    parser.add_argument('--modalitat', default=PREU_ON_DEMAND, help="Modalitat de preu (per defecte: %(default)s)")
+    parser.add_argument('--photon', action='store_true', help="Aplica el multiplicador de DBUs de Photon")
+    args = parser.parse_args(argv)
+
+    try:
+        cataleg = carregar_cataleg(args.cataleg)
+        instancies = cataleg.instancies_per_nom(region=args.regio, pricing=args.modalitat)
+        worker = cataleg.obtenir(args.worker, region=args.regio, pricing=args.modalitat)
+        driver = cataleg.obtenir(args.driver or args.worker, region=args.regio, pricing=args.modalitat)
+        carregues = llegir_cartera(args.cartera)
+        inici = time.perf_counter()
+        resultat = empaquetar_cartera(carregues, instancies, driver, worker, args.nombre_workers,
+                                      args.startup_overhead, args.inactivitat, args.max_clusters,
+                                      cost_dbu_job=cataleg.cost_dbu(True, args.photon),
+                                      cost_dbu_all_purpose=cataleg.cost_dbu(False, args.photon))
+        durada = time.perf_counter() - inici
+    except KeyError as e:
+        print(f"Error: {e.args[0]}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    compartides = sum(a['tipus'] == COMPARTIT for a in resultat['assignacions'])
+    incompliments = sum(not a['compleix_termini'] for a in resultat['assignacions'])
+    print(f"{len(carregues)} càrregues repartides en {durada:.2f} s: {compartides} en "
+          f"{len(resultat['clusters'])} clústers compartits i {len(carregues) - compartides} en Job Clusters")
+    print(f"Cost total: €{resultat['cost_total']:,.2f} (tot en Job Clusters: €{resultat['cost_tot_job_clusters']:,.2f}, "
+          f"estalvi: €{resultat['estalvi']:,.2f})")
+    if incompliments:
+        print(f"{incompliments} càrregues no compleixen el termini en cap tipus de clúster", file=sys.stderr)
+    if args.sortida:
+        import pandas as pd
+        (pd.DataFrame(resultat['assignacions']).astype({'cluster': 'Int64', 'nombre_workers': 'Int64'})
+         .to_csv(args.sortida, index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Simulació d'esdeveniments discrets de l'execució de tasques en un clúster.
+
+El model d'onades (ceil(tasques / paral·lelisme) * temps per tasca) suposa que totes les tasques duren el mateix.
+Aquest mòdul, en canvi, reparteix tasques amb durades diferents entre els slots dels workers amb una cua
+d'esdeveniments (heap), i modela l'autoescalat de workers entre un mínim i un màxim amb un temps d'arrencada per
+node. Es facturen les VM des que es demana cada node fins que s'allibera, i les DBUs des que el node està a punt.
+
+Amb `simular_monte_carlo` es repeteix la simulació amb durades aleatòries en diversos processos per obtenir
+intervals de confiança del cost i del temps.
+"""
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+
+import numpy as np
+
+from cost_model import COST_DBU_JOB
+
+DISTRIBUCIONS = ('constant', 'exponencial', 'lognormal', 'uniforme')
+
+# Tipus d'esdeveniment, ordenats per prioritat quan coincideixen en el temps
+_NODE_LLEST = 0
+_TASCA_ACABADA = 1
+_COMPROVAR_INACTIVITAT = 2
+
+
+def generar_durades(nombre_tasques, temps_mitja_min, distribucio='lognormal', coeficient_variacio=0.5, llavor=None):
+    """
+    Genera les durades (en minuts) de `nombre_tasques` tasques amb la mitjana i el coeficient de variació donats.
+    """
+    rng = np.random.default_rng(llavor)
+    if distribucio == 'constant' or coeficient_variacio == 0:
+        return np.full(nombre_tasques, float(temps_mitja_min))
+    if distribucio == 'exponencial':
+        return rng.exponential(temps_mitja_min, nombre_tasques)
+    if distribucio == 'lognormal':
+        sigma2 = np.log1p(coeficient_variacio ** 2)
+        return rng.lognormal(np.log(temps_mitja_min) - sigma2 / 2, np.sqrt(sigma2), nombre_tasques)
+    if distribucio == 'uniforme':
+        amplada = min(coeficient_variacio * np.sqrt(3), 1.0) * temps_mitja_min
+        return rng.uniform(temps_mitja_min - amplada, temps_mitja_min + amplada, nombre_tasques)
+    raise ValueError(f"Distribució desconeguda: {distribucio}. Opcions: {', '.join(DISTRIBUCIONS)}")
+
+
+def simular_cluster(durades, driver, worker, min_workers=1, max_workers=None, startup_overhead_time=0.0,
+                    cost_dbu=COST_DBU_JOB, tasques_per_worker=None, temps_inactivitat_min=10.0,
+                    max_parallel_tasks=None):
+    """
+    Simula l'execució de totes les tasques (en ordre) en un clúster amb autoescalat i en retorna el cost.
+
+    El driver i els `min_workers` workers inicials es demanen a l'instant 0 i estan a punt després de
+    `startup_overhead_time` minuts. Quan hi ha més tasques pendents que slots disponibles o en camí, es demanen
+    workers nous (fins a `max_workers`), que també triguen `startup_overhead_time` a estar a punt. Un worker sense
+    tasques durant `temps_inactivitat_min` s'allibera si n'hi ha més que el mínim. Cada worker té
+    `tasques_per_worker` slots (per defecte, les seves vCPUs), i el clúster no executa mai més de
+    `max_parallel_tasks` tasques alhora, igual que al model d'onades: les vCPUs només en són el límit superior.
+
+    Retorna un diccionari amb el makespan, els minuts-node, les DBU-hores, els costos i el màxim de workers.
+    """
+    durades = np.asarray(durades, dtype=np.float64)
+    max_workers = min_workers if max_workers is None else max_workers
+    if min_workers < 0 or max_workers < max(min_workers, 1):
+        raise ValueError("Cal 0 <= min_workers <= max_workers i max_workers >= 1")
+    slots_per_worker = worker.vCPUs if tasques_per_worker is None else tasques_per_worker
+    if slots_per_worker < 1:
+        raise ValueError("Cada worker ha de tenir com a mínim un slot")
+    limit_paral_lel = float('inf') if max_parallel_tasks is None else max_parallel_tasks
+    if limit_paral_lel < 1:
+        raise ValueError("El nombre màxim de tasques en paral·lel ha de ser com a mínim 1")
+
+    llista_durades = durades.tolist()
+    total_tasks = len(llista_durades)
+    seguent_tasca = 0
+    en_curs = 0
+    esdeveniments = []
+
+    # Estat dels workers: instant de petició, instant d'alliberament i tasques en curs
+    peticio = []
+    alliberament = []
+    ocupats = []
+    actius = 0
+    en_arrencada = 0
+    slots_lliures = []
+    maxim_workers = 0
+
+    def escalar(ara):
+        # Autoescalat: demanar workers si les tasques que es poden executar alhora no caben en els slots que
+        # arribaran
+        nonlocal actius, en_arrencada, maxim_workers
+        pendents = min(total_tasks - seguent_tasca, limit_paral_lel - en_curs)
+        capacitat_en_cami = en_arrencada * slots_per_worker
+        if actius >= max_workers or pendents <= capacitat_en_cami + len(slots_lliures):
+            return
+        quants = min(max_workers - actius, ceil((pendents - capacitat_en_cami) / slots_per_worker))
+        for _ in range(quants):
+            node = len(peticio)
+            peticio.append(ara)
+            alliberament.append(None)
+            ocupats.append(0)
+            heapq.heappush(esdeveniments, (ara + startup_overhead_time, _NODE_LLEST, node))
+        actius += quants
+        en_arrencada += quants
+        maxim_workers = max(maxim_workers, actius)
+
+    for _ in range(min_workers):
+        peticio.append(0.0)
+        alliberament.append(None)
+        ocupats.append(0)
+        heapq.heappush(esdeveniments, (startup_overhead_time, _NODE_LLEST, len(peticio) - 1))
+    actius = en_arrencada = maxim_workers = min_workers
+    escalar(0.0)
+
+    makespan = startup_overhead_time
+    while esdeveniments and (seguent_tasca < total_tasks or en_curs):
+        ara, tipus, node = heapq.heappop(esdeveniments)
+        if tipus == _TASCA_ACABADA:
+            ocupats[node] -= 1
+            en_curs -= 1
+            slots_lliures.append(node)
+            makespan = ara
+        elif tipus == _NODE_LLEST:
+            en_arrencada -= 1
+            slots_lliures.extend([node] * slots_per_worker)
+        else:
+            if alliberament[node] is None and ocupats[node] == 0 and actius > min_workers:
+                alliberament[node] = ara
+                actius -= 1
+            continue
+
+        # Assignar tasques pendents als slots lliures (els slots de nodes alliberats es descarten)
+        while seguent_tasca < total_tasks and slots_lliures and en_curs < limit_paral_lel:
+            lliure = slots_lliures.pop()
+            if alliberament[lliure] is not None:
+                continue
+            ocupats[lliure] += 1
+            en_curs += 1
+            heapq.heappush(esdeveniments, (ara + llista_durades[seguent_tasca], _TASCA_ACABADA, lliure))
+            seguent_tasca += 1
+
+        if seguent_tasca < total_tasks:
+            escalar(ara)
+        elif ocupats[node] == 0 and actius > min_workers:
+            # Ja no queden tasques per assignar: el node quedarà inactiu fins que s'alliberi o s'aturi el clúster
+            heapq.heappush(esdeveniments, (ara + temps_inactivitat_min, _COMPROVAR_INACTIVITAT, node))
+
+    minuts_workers = 0.0
+    minuts_dbu_workers = 0.0
+    for node, inici in enumerate(peticio):
+        final = alliberament[node] if alliberament[node] is not None else makespan
+        final = max(final, inici)
+        minuts_workers += final - inici
+        minuts_dbu_workers += max(final - (inici + startup_overhead_time), 0.0)
+    minuts_driver = makespan
+    minuts_dbu_driver = max(makespan - startup_overhead_time, 0.0)
+
+    dbu_hores = (minuts_dbu_driver * driver.DBUs + minuts_dbu_workers * worker.DBUs) / 60
+    cost_vm = (minuts_driver * driver.cost_per_hour + minuts_workers * worker.cost_per_hour) / 60
+    cost_dbu_total = dbu_hores * cost_dbu
+    return {
+        'makespan_min': makespan,
+        'minuts_node': minuts_driver + minuts_workers,
+        'dbu_hores': dbu_hores,
+        'cost_vm': cost_vm,
+        'cost_dbu': cost_dbu_total,
+        'cost_total': cost_vm + cost_dbu_total,
+        'maxim_workers': maxim_workers,
+    }
+
+
+def _replica(argument):
+    llavor, parametres_durades, parametres_cluster = argument
+    durades = generar_durades(llavor=llavor, **parametres_durades)
+    return simular_cluster(durades, **parametres_cluster)
+
+
+def simular_monte_carlo(nombre_repliques, nombre_tasques, temps_mitja_min, driver, worker,
+                        distribucio='lognormal', coeficient_variacio=0.5, llavor=None, processos=1,
+                        nivell_confianca=0.95, **parametres_cluster):
+    """
+    Repeteix la simulació amb durades aleatòries independents i en resumeix els resultats.
+
+    Les rèpliques es reparteixen entre `processos` processos (0 = tots els nuclis). Per a cada mètrica es
+    retorna la mitjana, la desviació estàndard i l'interval de confiança percentil al `nivell_confianca` indicat.
+    """
+    llavors = np.random.SeedSequence(llavor).spawn(nombre_repliques)
+    parametres_durades = {'nombre_tasques': nombre_tasques, 'temps_mitja_min': temps_mitja_min,
+                          'distribucio': distribucio, 'coeficient_variacio': coeficient_variacio}
+    parametres_cluster = dict(parametres_cluster, driver=driver, worker=worker)
+    arguments = [(llavor_replica, parametres_durades, parametres_cluster) for llavor_replica in llavors]
+
+    processos = processos if processos > 0 else (os.cpu_count() or 1)
+    if processos == 1:
+        resultats = [_replica(argument) for argument in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            resultats = list(executor.map(_replica, arguments, chunksize=max(1, nombre_repliques // (4 * processos))))
+
+    alfa = (1 - nivell_confianca) / 2
+    resum = {}
+    for metrica in resultats[0]:
+        valors = np.array([resultat[metrica] for resultat in resultats], dtype=np.float64)
+        resum[metrica] = {
+            'mitjana': float(valors.mean()),
+            'desviacio': float(valors.std(ddof=1)) if len(valors) > 1 else 0.0,
+            'interval': (float(np.quantile(valors, alfa)), float(np.quantile(valors, 1 - alfa))),
+        }
+    return resum
@@ -0,0 +1,211 @@
+"""
+Model de costos dels clústers de Databricks (Job Cluster i All-Purpose Cluster).
+
+Aquest mòdul conté només el càlcul, sense dependències de la interfície (Streamlit, Altair),
+perquè es pugui reutilitzar des d'altres eines. NumPy només s'importa quan es fan servir les funcions
+vectoritzades, de manera que importar el mòdul per fer càlculs escalars és pràcticament instantani.
+"""
+from math import ceil
+
+# Costos per DBU-hora segons el tipus de càlcul
+COST_DBU_JOB = 0.288
+COST_DBU_ALL_PURPOSE = 0.528
+
+# Noms dels tipus de clúster als resultats
+TIPUS_JOB = 'Job Cluster'
+TIPUS_ALL_PURPOSE = 'All-Purpose Cluster'
+
+# Define the VMInstance class
+class VMInstance:
+    __slots__ = ('name', 'vCPUs', 'DBUs', 'cost_per_hour', 'RAM_GB')
+
+    def __init__(self, name, vCPUs, DBUs, cost_per_hour, RAM_GB):
+        self.name = name
+        self.vCPUs = vCPUs
+        self.DBUs = DBUs
+        self.cost_per_hour = cost_per_hour
+        self.RAM_GB = RAM_GB  # Memòria RAM en GB
+
+# Instàncies disponibles per defecte
+INSTANCIES = [
+    VMInstance('DS4_V2', 8, 1.5, 0.5219, 32),
+    VMInstance('D4A_V4', 4, 0.75, 0.2207, 16),
+    VMInstance('D8A_V4', 8, 1.5, 0.4414, 32),
+    VMInstance('E4DS_V5', 4, 1.5, 0.3320, 24),
+    VMInstance('D4DS_V5', 4, 1.0, 0.2610, 16)
+]
+
+# Define cost calculation functions
+def calcular_cost_job_cluster(driver_cost_per_hour, worker_cost_per_hour, total_DBUs, cost_dbu_job,
+                                startup_overhead_time, temps_execucio_min, max_parallel_tasks, total_tasks):
+    """
+    Calcula el cost total per tasca en un Job Cluster, considerant una limitació de tasques en paral·lel.
+    """
+    # Nombre d'onades necessàries
+    nombre_onades_job = ceil(total_tasks / max_parallel_tasks)
+    
+    # Temps total actiu incloent el temps de spin-up per onada
+    temps_total_min_job = nombre_onades_job * (startup_overhead_time + temps_execucio_min)
+    
+    # Càlcul del cost de les VM durant el spin-up i l'execució per onada
+    cost_vm_total_job = ((startup_overhead_time + temps_execucio_min) / 60) * (driver_cost_per_hour + worker_cost_per_hour)
+    
+    # Càlcul del cost de les DBUs durant l'execució per onada
+    cost_dbu_execucio_job = (temps_execucio_min / 60) * total_DBUs * cost_dbu_job
+    
+    # Càlcul del cost total per tasca
+    cost_total_per_tasca_job = cost_vm_total_job + cost_dbu_execucio_job
+    
+    return cost_total_per_tasca_job, cost_vm_total_job, cost_dbu_execucio_job, temps_total_min_job, nombre_onades_job
+
+def calcular_cost_all_purpose(driver_cost_per_hour, workers_cost_per_hour, total_DBUs, cost_dbu_all_purpose,
+                              temps_total_actiu_min):
+    """
+    Calcula el cost total en un All-Purpose Cluster.
+    """
+    # Càlcul del cost de les VM per hora
+    cost_vm_all_purpose_per_hour = driver_cost_per_hour + workers_cost_per_hour
+
+    # Càlcul del cost de les DBUs per hora
+    cost_dbu_all_purpose_per_hour = total_DBUs * cost_dbu_all_purpose
+
+    # Càlcul del cost total per hora de l'All-Purpose Cluster
+    cost_total_per_hour_all_purpose = cost_vm_all_purpose_per_hour + cost_dbu_all_purpose_per_hour
+
+    # Càlcul del cost total en funció del temps actiu
+    cost_total_all_purpose = (temps_total_actiu_min / 60) * cost_total_per_hour_all_purpose
+
+    return cost_total_all_purpose, cost_dbu_all_purpose_per_hour, cost_vm_all_purpose_per_hour, cost_total_per_hour_all_purpose
+
+# Versions vectoritzades (NumPy) de les funcions de cost, per avaluar molts escenaris d'una sola passada
+def calcular_cost_job_cluster_lot(driver_cost_per_hour, worker_cost_per_hour, total_DBUs, cost_dbu_job,
+                                  startup_overhead_time, temps_execucio_min, max_parallel_tasks, total_tasks):
+    """
+    Versió vectoritzada de calcular_cost_job_cluster. Accepta escalars o arrays (amb broadcasting)
+    i retorna els mateixos cinc valors com a arrays de NumPy, amb resultats idèntics als de la funció escalar.
+    """
+    import numpy as np
+    driver_cost_per_hour = np.asarray(driver_cost_per_hour, dtype=np.float64)
+    worker_cost_per_hour = np.asarray(worker_cost_per_hour, dtype=np.float64)
+    total_DBUs = np.asarray(total_DBUs, dtype=np.float64)
+    cost_dbu_job = np.asarray(cost_dbu_job, dtype=np.float64)
+    startup_overhead_time = np.asarray(startup_overhead_time, dtype=np.float64)
+    temps_execucio_min = np.asarray(temps_execucio_min, dtype=np.float64)
+    max_parallel_tasks = np.asarray(max_parallel_tasks, dtype=np.float64)
+    total_tasks = np.asarray(total_tasks, dtype=np.float64)
+
+    # Nombre d'onades necessàries
+    nombre_onades_job = np.ceil(total_tasks / max_parallel_tasks)
+
+    # Temps total actiu incloent el temps de spin-up per onada
+    temps_onada = startup_overhead_time + temps_execucio_min
+    temps_total_min_job = nombre_onades_job * temps_onada
+
+    # Càlcul del cost de les VM durant el spin-up i l'execució per onada
+    cost_vm_total_job = (temps_onada / 60) * (driver_cost_per_hour + worker_cost_per_hour)
+
+    # Càlcul del cost de les DBUs durant l'execució per onada
+    cost_dbu_execucio_job = (temps_execucio_min / 60) * total_DBUs * cost_dbu_job
+
+    # Càlcul del cost total per tasca
+    cost_total_per_tasca_job = cost_vm_total_job + cost_dbu_execucio_job
+
+    return (cost_total_per_tasca_job, cost_vm_total_job, cost_dbu_execucio_job, temps_total_min_job,
+            nombre_onades_job.astype(np.int64))
+
+def calcular_cost_all_purpose_lot(driver_cost_per_hour, workers_cost_per_hour, total_DBUs, cost_dbu_all_purpose,
+                                  temps_total_actiu_min):
+    """
+    Versió vectoritzada de calcular_cost_all_purpose. Accepta escalars o arrays (amb broadcasting).
+    """
+    import numpy as np
+    driver_cost_per_hour = np.asarray(driver_cost_per_hour, dtype=np.float64)
+    workers_cost_per_hour = np.asarray(workers_cost_per_hour, dtype=np.float64)
+    total_DBUs = np.asarray(total_DBUs, dtype=np.float64)
+    cost_dbu_all_purpose = np.asarray(cost_dbu_all_purpose, dtype=np.float64)
+    temps_total_actiu_min = np.asarray(temps_total_actiu_min, dtype=np.float64)
+
+    cost_vm_all_purpose_per_hour = driver_cost_per_hour + workers_cost_per_hour
+    cost_dbu_all_purpose_per_hour = total_DBUs * cost_dbu_all_purpose
+    cost_total_per_hour_all_purpose = cost_vm_all_purpose_per_hour + cost_dbu_all_purpose_per_hour
+    cost_total_all_purpose = (temps_total_actiu_min / 60) * cost_total_per_hour_all_purpose
+
+    return cost_total_all_purpose, cost_dbu_all_purpose_per_hour, cost_vm_all_purpose_per_hour, cost_total_per_hour_all_purpose
+
+def _index_instancies(valors, instancies):
+    """
+    Converteix una columna d'instàncies (noms o índexs enters dins d'`instancies`) en un array d'índexs.
+    """
+    import numpy as np
+    valors = np.asarray(valors)
+    if np.issubdtype(valors.dtype, np.integer):
+        if valors.size and (valors.min() < 0 or valors.max() >= len(instancies)):
+            raise ValueError(f"Índex d'instància fora de rang: ha d'estar entre 0 i {len(instancies) - 1}")
+        return valors
+    posicions = {inst.name: i for i, inst in enumerate(instancies)}
+    if len(posicions) < len(instancies):
+        raise ValueError("Hi ha noms d'instància repetits: no es pot saber a quina instància es refereix cada nom")
+    try:
+        index = np.fromiter((posicions[nom] for nom in valors.ravel().tolist()), dtype=np.intp, count=valors.size)
+    except KeyError as e:
+        raise ValueError(f"Instància desconeguda: {e.args[0]}") from None
+    return index.reshape(valors.shape)
+
+def calcular_escenaris(escenaris, instancies, cost_dbu_job=COST_DBU_JOB, cost_dbu_all_purpose=COST_DBU_ALL_PURPOSE):
+    """
+    Calcula en una sola passada vectoritzada els costos de Job Cluster i d'All-Purpose Cluster per a una
+    graella d'escenaris.
+
+    `escenaris` pot ser un DataFrame o un diccionari d'arrays amb les columnes:
+    driver, worker (nom o índex dins d'`instancies`), nombre_workers, max_parallel_tasks,
+    nombre_tasques, temps_execucio_per_tasca_min i startup_overhead_time.
+
+    Retorna un diccionari d'arrays amb totes les columnes de resultat, prefixades amb `job_` i `all_purpose_`.
+    """
+    import numpy as np
+    vcpus = np.array([inst.vCPUs for inst in instancies], dtype=np.float64)
+    dbus = np.array([inst.DBUs for inst in instancies], dtype=np.float64)
+    costos = np.array([inst.cost_per_hour for inst in instancies], dtype=np.float64)
+
+    idx_driver = _index_instancies(escenaris['driver'], instancies)
+    idx_worker = _index_instancies(escenaris['worker'], instancies)
+    nombre_workers = np.asarray(escenaris['nombre_workers'], dtype=np.float64)
+    max_parallel_tasks = np.asarray(escenaris['max_parallel_tasks'], dtype=np.float64)
+    nombre_tasques = np.asarray(escenaris['nombre_tasques'], dtype=np.float64)
+    temps_execucio_min = np.asarray(escenaris['temps_execucio_per_tasca_min'], dtype=np.float64)
+    startup_overhead_time = np.asarray(escenaris['startup_overhead_time'], dtype=np.float64)
+
+    # Un sol driver més `nombre_workers` workers, igual que a main()
+    total_DBUs = dbus[idx_driver] + nombre_workers * dbus[idx_worker]
+    cost_vm_driver = costos[idx_driver]
+    cost_vm_workers = nombre_workers * costos[idx_worker]
+
+    # Job Cluster
+    (cost_per_tasca_job, cost_vm_total_job, cost_dbu_execucio_job,
+     temps_total_min_job, nombre_onades_job) = calcular_cost_job_cluster_lot(
+        cost_vm_driver, cost_vm_workers, total_DBUs, cost_dbu_job,
+        startup_overhead_time, temps_execucio_min, max_parallel_tasks, nombre_tasques)
+
+    # All-Purpose Cluster: un sol spin-up i les onades d'execució a continuació
+    nombre_onades_all_purpose = np.ceil(nombre_tasques / max_parallel_tasks)
+    temps_total_actiu_min_all_purpose = startup_overhead_time + nombre_onades_all_purpose * temps_execucio_min
+    (cost_total_all_purpose, cost_dbu_all_purpose_per_hour,
+     cost_vm_all_purpose_per_hour, cost_total_per_hour_all_purpose) = calcular_cost_all_purpose_lot(
+        cost_vm_driver, cost_vm_workers, total_DBUs, cost_dbu_all_purpose, temps_total_actiu_min_all_purpose)
+
+    return {
+        'total_DBUs': total_DBUs,
+        'total_vCPUs': vcpus[idx_driver] + nombre_workers * vcpus[idx_worker],
+        'job_cost_per_tasca': cost_per_tasca_job,
+        'job_cost_vm_per_tasca': cost_vm_total_job,
+        'job_cost_dbu_per_tasca': cost_dbu_execucio_job,
+        'job_cost_total': nombre_tasques * cost_per_tasca_job,
+        'job_temps_total_min': temps_total_min_job,
+        'job_nombre_onades': nombre_onades_job,
+        'all_purpose_cost_total': cost_total_all_purpose,
+        'all_purpose_cost_vm_per_hora': cost_vm_all_purpose_per_hour,
+        'all_purpose_cost_dbu_per_hora': cost_dbu_all_purpose_per_hour,
+        'all_purpose_cost_total_per_hora': cost_total_per_hour_all_purpose,
+        'all_purpose_temps_total_min': temps_total_actiu_min_all_purpose,
+        'all_purpose_nombre_onades': nombre_onades_all_purpose.astype(np.int64),
+    }
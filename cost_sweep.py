@@ -0,0 +1,143 @@
+"""
+Escombrats de sensibilitat dels costos de Job Cluster i All-Purpose Cluster.
+
+Es varia un o dos paràmetres sobre un rang i es calculen els costos i temps de tots dos clústers amb el model
+vectoritzat. Com que els escombrats poden tenir centenars de milers de punts, també hi ha funcions per reduir-los
+abans d'enviar-los al navegador: en 1D es conserva l'envolupant mínim/màxim de cada sèrie per intervals, i en 2D
+s'agrupen en cel·les. En tots dos casos es conserven exactament els punts on canvia l'opció més econòmica.
+"""
+import numpy as np
+
+from cost_model import COST_DBU_JOB, COST_DBU_ALL_PURPOSE, calcular_escenaris
+
+# Paràmetres que es poden escombrar; els tres primers han de ser enters
+PARAMETRES_ENTERS = ('nombre_workers', 'max_parallel_tasks', 'nombre_tasques')
+PARAMETRES_ESCOMBRAT = PARAMETRES_ENTERS + ('temps_execucio_per_tasca_min', 'startup_overhead_time',
+                                            'multiplicador_dbu')
+
+SERIES = ('job_cost_total', 'all_purpose_cost_total', 'job_temps_total_min', 'all_purpose_temps_total_min')
+
+
+def valors_eix(parametre, minim, maxim, nombre_punts):
+    """
+    Retorna `nombre_punts` valors equiespaiats entre `minim` i `maxim` (sense repeticions si són enters).
+    """
+    if parametre not in PARAMETRES_ESCOMBRAT:
+        raise ValueError(f"Paràmetre desconegut: {parametre}. Opcions: {', '.join(PARAMETRES_ESCOMBRAT)}")
+    valors = np.linspace(minim, maxim, nombre_punts)
+    if parametre in PARAMETRES_ENTERS:
+        valors = np.unique(np.maximum(np.round(valors), 1)).astype(np.int64)
+    return valors
+
+
+def escombrar(config_job, config_all_purpose, instancies, eixos,
+              cost_dbu_job=COST_DBU_JOB, cost_dbu_all_purpose=COST_DBU_ALL_PURPOSE):
+    """
+    Calcula els costos i temps dels dos clústers sobre la graella definida per `eixos`.
+
+    `config_job` i `config_all_purpose` són diccionaris amb les columnes de `calcular_escenaris` (driver, worker,
+    nombre_workers, max_parallel_tasks, nombre_tasques, temps_execucio_per_tasca_min, startup_overhead_time).
+    `eixos` és una llista d'un o dos parells (paràmetre, valors). Retorna un diccionari amb les sèries de `SERIES`,
+    cadascuna amb forma (len(x),) o (len(x), len(y)).
+    """
+    if not 1 <= len(eixos) <= 2:
+        raise ValueError("Cal escombrar un o dos paràmetres")
+    forma = tuple(len(valors) for _, valors in eixos)
+    posicions = {inst.name: i for i, inst in enumerate(instancies)}
+    resultats = {}
+    for prefix, config, cost_dbu, clau in (('job_', config_job, cost_dbu_job, 'cost_dbu_job'),
+                                          ('all_purpose_', config_all_purpose, cost_dbu_all_purpose,
+                                           'cost_dbu_all_purpose')):
+        escenaris = dict(config)
+        # Els noms d'instància es resolen una sola vegada, no per a cada punt de la graella
+        for columna in ('driver', 'worker'):
+            if isinstance(escenaris[columna], str):
+                escenaris[columna] = posicions[escenaris[columna]]
+        opcions = {clau: cost_dbu}
+        for eix, (parametre, valors) in enumerate(eixos):
+            # Cada eix es col·loca en la seva dimensió perquè el broadcasting generi la graella
+            valors = np.asarray(valors).reshape([-1 if i == eix else 1 for i in range(len(eixos))])
+            if parametre == 'multiplicador_dbu':
+                opcions[clau] = cost_dbu * valors
+            else:
+                escenaris[parametre] = valors
+        escenaris = {columna: np.broadcast_to(np.asarray(valor), forma) for columna, valor in escenaris.items()}
+        opcions[clau] = np.broadcast_to(np.asarray(opcions[clau], dtype=np.float64), forma)
+        calcul = calcular_escenaris(escenaris, instancies, **opcions)
+        for serie in SERIES:
+            if serie.startswith(prefix):
+                resultats[serie] = calcul[serie]
+    return resultats
+
+
+def creuaments(a, b):
+    """
+    Índexs i tals que l'opció més econòmica entre `a` i `b` canvia entre els punts i i i + 1 (o a i, si hi ha empat).
+    """
+    signe = np.sign(np.asarray(a) - np.asarray(b))
+    canvis = np.nonzero(signe[:-1] * signe[1:] < 0)[0]
+    empats = np.nonzero(signe == 0)[0]
+    return np.union1d(canvis, empats)
+
+
+def reduir_corba(series, max_punts=2000, max_creuaments=100):
+    """
+    Tria els índexs d'un escombrat 1D que cal enviar al navegador.
+
+    Es conserven sempre els dos punts que delimiten els primers `max_creuaments` canvis de l'opció més econòmica.
+    Amb la resta del pressupost de `max_punts`, es divideix l'eix en intervals i de cada interval es conserven el
+    primer i l'últim punt i el mínim i el màxim de cada sèrie, de manera que la forma de les corbes es manté. Així
+    el resultat té com a màxim `max_punts` + 2 · `max_creuaments` punts. Retorna els índexs ordenats i els índexs
+    de tots els creuaments, detectats amb tots els punts.
+    """
+    n = len(next(iter(series.values())))
+    creua = creuaments(series['job_cost_total'], series['all_purpose_cost_total'])
+    primers = creua[:max_creuaments]
+    obligats = np.union1d(primers, np.minimum(primers + 1, n - 1))
+    if n <= max_punts:
+        return np.arange(n), creua
+
+    punts_per_interval = 2 + 2 * len(series)
+    nombre_intervals = max(1, (max_punts - len(obligats)) // punts_per_interval)
+    inicis = np.linspace(0, n, nombre_intervals + 1).astype(np.int64)[:-1]
+    inicis = np.unique(inicis)
+    finals = np.append(inicis[1:], n) - 1
+    index = [inicis, finals, obligats]
+    segment = np.repeat(np.arange(len(inicis)), np.diff(np.append(inicis, n)))
+    for valors in series.values():
+        valors = np.asarray(valors)
+        for reduccio in (np.minimum, np.maximum):
+            extrems = reduccio.reduceat(valors, inicis)
+            # Primer punt de cada interval on la sèrie assoleix l'extrem
+            coincideix = valors == extrems[segment]
+            posicions = np.nonzero(coincideix)[0]
+            primers = posicions[np.unique(segment[posicions], return_index=True)[1]]
+            index.append(primers)
+    return np.unique(np.concatenate(index)), creua
+
+
+def reduir_graella(series, max_x=60, max_y=60):
+    """
+    Agrupa un escombrat 2D en com a màxim `max_x` × `max_y` cel·les.
+
+    Retorna els índexs d'inici de cada cel·la en x i en y, la mitjana de cada sèrie per cel·la i una màscara de les
+    cel·les on hi ha algun canvi de l'opció més econòmica (calculada amb tots els punts, no amb les mitjanes).
+    """
+    diferencia = np.asarray(series['job_cost_total']) - np.asarray(series['all_purpose_cost_total'])
+    nx, ny = diferencia.shape
+    inicis_x = np.unique(np.linspace(0, nx, min(nx, max_x) + 1).astype(np.int64)[:-1])
+    inicis_y = np.unique(np.linspace(0, ny, min(ny, max_y) + 1).astype(np.int64)[:-1])
+    mida = np.outer(np.diff(np.append(inicis_x, nx)), np.diff(np.append(inicis_y, ny)))
+
+    def agrupar(valors, reduccio=np.add):
+        return reduccio.reduceat(reduccio.reduceat(valors, inicis_x, axis=0), inicis_y, axis=1)
+
+    mitjanes = {nom: agrupar(np.asarray(valors, dtype=np.float64)) / mida for nom, valors in series.items()}
+
+    # Un punt és frontera si el signe canvia respecte del veí següent en alguna direcció
+    signe = np.sign(diferencia)
+    frontera = np.zeros(diferencia.shape, dtype=bool)
+    frontera[:-1, :] |= signe[:-1, :] != signe[1:, :]
+    frontera[:, :-1] |= signe[:, :-1] != signe[:, 1:]
+    frontera |= signe == 0
+    return inicis_x, inicis_y, mitjanes, agrupar(frontera, np.logical_or)
@@ -0,0 +1,301 @@
+"""
+Taules de costos precalculades per respondre consultes sense executar el model.
+
+Un pas de construcció calcula amb `calcular_escenaris` els costos i temps dels dos tipus de clúster sobre una
+graella de startup overhead i temps per tasca per a cada parella (driver, worker) del catàleg, i els desa en un
+fitxer .npy (més un .json amb els eixos i la configuració). Les consultes carreguen el .npy amb memòria mapada,
+sense copiar-lo, i només en llegeixen les cel·les que envolten el punt demanat.
+
+- Valors enters (nombre de workers, paral·lelisme i nombre de tasques): no són eixos de la taula. Amb el temps i
+  l'overhead fixats, cada sortida és afí en el nombre de workers n i en el nombre d'onades W = ceil(tasques /
+  paral·lelisme), i el cost del Job Cluster és el nombre de tasques pel cost per tasca. Per a cada cel·la es desen
+  els coeficients de 1, n, W i n·W, i la consulta els combina amb els valors demanats: és exacta per a
+  qualsevol enter, llevat de l'arrodoniment.
+- Eixos continus (startup overhead i temps per tasca): s'interpolen linealment els coeficients. Com que el model
+  és lineal en tots dos, la interpolació és exacta llevat de l'arrodoniment; la cota d'error hi suma l'error
+  relatiu màxim mesurat en construir la taula (a la graella i als punts mitjans de les cel·les, per a diverses
+  configuracions enteres) i el de l'arrodoniment a float32.
+
+Ús:
+    python cost_tables.py construir taules/costos
+    python cost_tables.py construir taules/costos --cataleg preus.json --regio westeurope --drivers DS4_V2
+    python cost_tables.py consultar taules/costos DS4_V2 D4A_V4 5 35 100 10 2.5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+from cost_model import COST_DBU_JOB, COST_DBU_ALL_PURPOSE, calcular_escenaris
+from instance_catalog import PREU_ON_DEMAND, carregar_cataleg
+
+# Eixos de la taula, en l'ordre de les dimensions (després de la parella d'instàncies)
+EIXOS = ('startup_overhead_time', 'temps_execucio_per_tasca_min')
+SORTIDES = ('job_cost_total', 'job_temps_total_min', 'all_purpose_cost_total', 'all_purpose_temps_total_min')
+# Coeficients desats per a cada cel·la, de 1, n (workers), W (onades) i n·W
+TERMES = ('constant', 'per_worker', 'per_onada', 'per_worker_onada')
+# Sortides desades: el cost del Job Cluster es desa per tasca i es multiplica pel nombre de tasques en consultar
+_DESADES = ('job_cost_per_tasca', 'job_temps_total_min', 'all_purpose_cost_total', 'all_purpose_temps_total_min')
+# Configuracions (workers, paral·lelisme, tasques) on es comprova la descomposició en construir la taula
+_COMPROVACIONS = ((0, 1, 1), (3, 4, 37), (17, 35, 1000), (64, 7, 10_000))
+
+VALORS_PER_DEFECTE = {
+    'startup_overhead_time': (0.0, 2.5, 5.0, 10.0),
+    'temps_execucio_per_tasca_min': (0.1, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+}
+
+# Error relatiu màxim d'arrodonir un float64 a float32
+_ARRODONIMENT_FLOAT32 = 2.0 ** -24
+# Error relatiu de les operacions en float64 de la consulta (interpolació i combinació dels termes)
+_ARRODONIMENT_CONSULTA = 8 * np.finfo(np.float64).eps
+
+
+def _rutes(ruta):
+    base = ruta[:-4] if ruta.endswith('.npy') else ruta
+    return base + '.npy', base + '.json'
+
+
+def _avaluar(instancies, driver, worker, overhead, temps, nombre_workers, max_parallel_tasks, nombre_tasques,
+             cost_dbu_job, cost_dbu_all_purpose):
+    """
+    Sortides desades del model sobre la graella `overhead` × `temps` per a una configuració entera.
+    """
+    overhead, temps = np.meshgrid(overhead, temps, indexing='ij')
+    escenaris = {'driver': np.full(overhead.shape, driver), 'worker': np.full(overhead.shape, worker),
+                 'nombre_workers': np.full(overhead.shape, nombre_workers),
+                 'max_parallel_tasks': np.full(overhead.shape, max_parallel_tasks),
+                 'nombre_tasques': np.full(overhead.shape, nombre_tasques),
+                 'startup_overhead_time': overhead, 'temps_execucio_per_tasca_min': temps}
+    resultats = calcular_escenaris(escenaris, instancies, cost_dbu_job, cost_dbu_all_purpose)
+    return np.stack([resultats[sortida] for sortida in _DESADES], axis=-1)
+
+
+def _coeficients(instancies, driver, worker, overhead, temps, cost_dbu_job, cost_dbu_all_purpose):
+    """
+    Coeficients de `TERMES` a partir del model amb 1 i 2 workers i 1 i 2 onades (una tasca per onada).
+    """
+    f = {(n, w): _avaluar(instancies, driver, worker, overhead, temps, n, 1, w, cost_dbu_job, cost_dbu_all_purpose)
+         for n in (1, 2) for w in (1, 2)}
+    per_worker_onada = f[2, 2] - f[2, 1] - f[1, 2] + f[1, 1]
+    per_worker = f[2, 1] - f[1, 1] - per_worker_onada
+    per_onada = f[1, 2] - f[1, 1] - per_worker_onada
+    constant = f[1, 1] - per_worker - per_onada - per_worker_onada
+    return np.stack([constant, per_worker, per_onada, per_worker_onada], axis=-2)
+
+
+def _combinar(coeficients, nombre_workers, nombre_tasques, onades):
+    """
+    Sortides (`SORTIDES`) i suma dels valors absoluts dels termes, per a la cota d'error, a partir dels
+    coeficients d'una o més cel·les.
+    """
+    base = np.array([1.0, nombre_workers, onades, nombre_workers * onades])[:, None]
+    termes = coeficients * base
+    # Només el cost del Job Cluster (la primera sortida desada) va per tasca
+    per_tasques = np.ones(len(_DESADES))
+    per_tasques[0] = nombre_tasques
+    return termes.sum(axis=-2) * per_tasques, np.abs(termes).sum(axis=-2) * per_tasques
+
+
+def construir_taula(ruta, instancies, drivers=None, workers=None, valors=None, cost_dbu_job=COST_DBU_JOB,
+                    cost_dbu_all_purpose=COST_DBU_ALL_PURPOSE, float32=True):
+    """
+    Calcula la taula de costos per a totes les parelles (driver, worker) i la desa a `ruta`.npy i `ruta`.json.
+
+    `drivers` i `workers` limiten les instàncies de cada rol (per defecte, totes). `valors` pot substituir els
+    valors d'alguns eixos de `VALORS_PER_DEFECTE`. La taula es va escrivint al fitxer parella a parella, de manera
+    que la memòria no depèn del nombre de parelles. Retorna les metadades desades.
+    """
+    valors = dict(VALORS_PER_DEFECTE, **(valors or {}))
+    desconeguts = sorted(set(valors) - set(EIXOS))
+    if desconeguts:
+        raise ValueError(f"Eixos desconeguts: {', '.join(desconeguts)} (els enters no són eixos de la taula)")
+    eixos = {eix: sorted(set(float(v) for v in valors[eix])) for eix in EIXOS}
+    if any(v < 0 for eix in EIXOS for v in eixos[eix]):
+        raise ValueError("Els valors dels eixos no poden ser negatius")
+    posicions = {inst.name: i for i, inst in enumerate(instancies)}
+    noms_drivers = list(drivers) if drivers else list(posicions)
+    noms_workers = list(workers) if workers else list(posicions)
+    for nom in noms_drivers + noms_workers:
+        if nom not in posicions:
+            raise ValueError(f"Instància desconeguda: {nom}")
+    parelles = [(driver, worker) for driver in noms_drivers for worker in noms_workers]
+
+    ruta_dades, ruta_metadades = _rutes(ruta)
+    directori = os.path.dirname(os.path.abspath(ruta_dades))
+    os.makedirs(directori, exist_ok=True)
+    forma = (len(parelles),) + tuple(len(eixos[eix]) for eix in EIXOS) + (len(TERMES), len(_DESADES))
+    dtype = np.float32 if float32 else np.float64
+    dades = np.lib.format.open_memmap(ruta_dades, mode='w+', dtype=dtype, shape=forma)
+
+    # Punts de la graella i punts mitjans de les cel·les, on es mesura l'error de la descomposició
+    graella = [np.array(eixos[eix]) for eix in EIXOS]
+    mitjans = [(eix[:-1] + eix[1:]) / 2 for eix in graella]
+    error_model = np.zeros(len(SORTIDES))
+    for p, (driver, worker) in enumerate(parelles):
+        coeficients = _coeficients(instancies, posicions[driver], posicions[worker], *graella, cost_dbu_job,
+                                   cost_dbu_all_purpose)
+        dades[p] = coeficients
+        # A un punt mitjà, la interpolació bilineal és la mitjana de les quatre cel·les que l'envolten
+        interpolats = (coeficients[:-1, :-1] + coeficients[1:, :-1] + coeficients[:-1, 1:] + coeficients[1:, 1:]) / 4
+        for punts, coeficients_punts in ((graella, coeficients), (mitjans, interpolats)):
+            if not coeficients_punts.size:
+                continue
+            for nombre_workers, max_parallel_tasks, nombre_tasques in _COMPROVACIONS:
+                calculat = _avaluar(instancies, posicions[driver], posicions[worker], *punts, nombre_workers,
+                                    max_parallel_tasks, nombre_tasques, cost_dbu_job, cost_dbu_all_purpose)
+                calculat[..., 0] *= nombre_tasques
+                onades = -(-nombre_tasques // max_parallel_tasks)
+                valors_punts, escala = _combinar(coeficients_punts, nombre_workers, nombre_tasques, onades)
+                error = np.abs(valors_punts - calculat) / np.maximum(escala, np.finfo(np.float64).tiny)
+                error_model = np.maximum(error_model, error.max(axis=(0, 1)))
+    dades.flush()
+    del dades
+
+    metadades = {
+        'eixos': eixos,
+        'termes': list(TERMES),
+        'sortides': list(SORTIDES),
+        'parelles': [list(parella) for parella in parelles],
+        'cost_dbu_job': cost_dbu_job,
+        'cost_dbu_all_purpose': cost_dbu_all_purpose,
+        'float32': bool(float32),
+        'error_model': dict(zip(SORTIDES, error_model.tolist())),
+    }
+    with open(ruta_metadades, 'w', encoding='utf-8') as fitxer:
+        json.dump(metadades, fitxer, indent=2)
+    return metadades
+
+
+class TaulaCostos:
+    """
+    Taula de costos precalculada, carregada amb memòria mapada.
+    """
+    def __init__(self, ruta):
+        ruta_dades, ruta_metadades = _rutes(ruta)
+        with open(ruta_metadades, encoding='utf-8') as fitxer:
+            metadades = json.load(fitxer)
+        if metadades.get('termes') != list(TERMES):
+            raise ValueError(f"{ruta_metadades}: la taula té un format antic; cal tornar-la a construir")
+        self.dades = np.load(ruta_dades, mmap_mode='r')
+        self.eixos = [metadades['eixos'][eix] for eix in EIXOS]
+        self.sortides = tuple(metadades['sortides'])
+        self.cost_dbu_job = metadades['cost_dbu_job']
+        self.cost_dbu_all_purpose = metadades['cost_dbu_all_purpose']
+        self._parelles = {tuple(parella): i for i, parella in enumerate(metadades['parelles'])}
+        self._error_model = np.array([metadades['error_model'][sortida] for sortida in self.sortides])
+        self._arrodoniment = _ARRODONIMENT_FLOAT32 if metadades['float32'] else 0.0
+        forma = self.dades.shape
+        if (forma[1:] != tuple(len(eix) for eix in self.eixos) + (len(TERMES), len(self.sortides))
+                or forma[0] != len(self._parelles)):
+            raise ValueError(f"{ruta_dades}: la forma de la taula no coincideix amb les metadades")
+
+    def parelles(self):
+        return list(self._parelles)
+
+    def consultar(self, driver, worker, nombre_workers, max_parallel_tasks, nombre_tasques,
+                  temps_execucio_per_tasca_min, startup_overhead_time):
+        """
+        Retorna els costos i temps dels dos clústers per a la configuració donada i, a `cota_error`, l'error
+        absolut màxim de cada valor. `exacte` indica si el temps i l'overhead són a la graella (sense
+        interpolació). Fora dels límits de la taula es llança ValueError.
+        """
+        try:
+            parella = self._parelles[(driver, worker)]
+        except KeyError:
+            raise ValueError(f"La taula no conté la parella {driver} / {worker}") from None
+        for nom, valor, minim in (('nombre_workers', nombre_workers, 0), ('max_parallel_tasks', max_parallel_tasks, 1),
+                                  ('nombre_tasques', nombre_tasques, 1)):
+            if valor != int(valor) or valor < minim:
+                raise ValueError(f"{nom} = {valor} ha de ser un enter >= {minim}")
+        talls = [parella]
+        pesos = []
+        for nom, eix, valor in zip(EIXOS, self.eixos, (startup_overhead_time, temps_execucio_per_tasca_min)):
+            i = bisect_left(eix, valor)
+            if i < len(eix) and eix[i] == valor:
+                talls.append(slice(i, i + 1))
+                pesos.append(None)
+            elif i == 0 or i == len(eix):
+                raise ValueError(f"{nom} = {valor} és fora de la taula ({eix[0]:g} - {eix[-1]:g})")
+            else:
+                t = (valor - eix[i - 1]) / (eix[i] - eix[i - 1])
+                talls.append(slice(i - 1, i + 1))
+                pesos.append(np.array([1 - t, t]))
+        bloc = np.array(self.dades[tuple(talls)], dtype=np.float64)
+        for pes in reversed(pesos):
+            bloc = bloc[..., 0, :, :] if pes is None else np.tensordot(bloc, pes, axes=([-3], [0]))
+
+        onades = -(-int(nombre_tasques) // int(max_parallel_tasks))
+        valors, escala = _combinar(bloc, int(nombre_workers), int(nombre_tasques), onades)
+        cotes = (self._error_model + 2 * self._arrodoniment + _ARRODONIMENT_CONSULTA) * escala
+        resultat = dict(zip(self.sortides, valors.tolist()))
+        resultat['cota_error'] = dict(zip(self.sortides, cotes.tolist()))
+        resultat['exacte'] = all(pes is None for pes in pesos)
+        return resultat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construeix o consulta taules de costos precalculades.")
+    subparsers = parser.add_subparsers(dest='ordre', required=True)
+
+    construir = subparsers.add_parser('construir', help="Calcula i desa la taula de costos")
+    construir.add_argument('ruta', help="Ruta de la taula, sense extensió (es creen .npy i .json)")
+    construir.add_argument('--cataleg', help="Full de preus d'instàncies (.json o .csv); per defecte, les instàncies de l'aplicació")
+    construir.add_argument('--regio', help="Regió del catàleg a fer servir")
+    construir.add_argument('--modalitat', default=PREU_ON_DEMAND, help="Modalitat de preu (per defecte: %(default)s)")
+    construir.add_argument('--photon', action='store_true', help="Aplica el multiplicador de DBUs de Photon")
+    construir.add_argument('--drivers', nargs='+', help="Instàncies de driver (per defecte, totes)")
+    construir.add_argument('--workers', nargs='+', help="Instàncies de worker (per defecte, totes)")
+    construir.add_argument('--float64', action='store_true', help="Desa els valors en float64 en lloc de float32")
+    for eix in EIXOS:
+        construir.add_argument(f"--{eix.replace('_', '-')}", type=float, nargs='+', dest=eix,
+                               help=f"Valors de l'eix {eix}")
+
+    consultar = subparsers.add_parser('consultar', help="Consulta una configuració a la taula")
+    consultar.add_argument('ruta', help="Ruta de la taula, sense extensió")
+    consultar.add_argument('driver')
+    consultar.add_argument('worker')
+    consultar.add_argument('nombre_workers', type=int)
+    consultar.add_argument('max_parallel_tasks', type=int)
+    consultar.add_argument('nombre_tasques', type=int)
+    consultar.add_argument('temps_execucio_per_tasca_min', type=float)
+    consultar.add_argument('startup_overhead_time', type=float)
+    args = parser.parse_args(argv)
+
+    if args.ordre == 'construir':
+        try:
+            cataleg = carregar_cataleg(args.cataleg)
+            instancies = cataleg.instancies_per_nom(region=args.regio, pricing=args.modalitat)
+            inici = time.perf_counter()
+            metadades = construir_taula(args.ruta, instancies, args.drivers, args.workers,
+                                        {eix: getattr(args, eix) for eix in EIXOS if getattr(args, eix)},
+                                        cataleg.cost_dbu(True, args.photon), cataleg.cost_dbu(False, args.photon),
+                                        float32=not args.float64)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        ruta_dades = _rutes(args.ruta)[0]
+        print(f"{len(metadades['parelles'])} parelles en {time.perf_counter() - inici:.1f} s: {ruta_dades} "
+              f"({os.path.getsize(ruta_dades) / 1e6:.1f} MB)")
+        return 0
+
+    try:
+        taula = TaulaCostos(args.ruta)
+        inici = time.perf_counter()
+        resultat = taula.consultar(args.driver, args.worker, args.nombre_workers, args.max_parallel_tasks,
+                                   args.nombre_tasques, args.temps_execucio_per_tasca_min, args.startup_overhead_time)
+        durada = time.perf_counter() - inici
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    for sortida in taula.sortides:
+        print(f"{sortida:<32} {resultat[sortida]:14.4f} ± {resultat['cota_error'][sortida]:.4g}")
+    print(f"{'exacte' if resultat['exacte'] else 'interpolat'} en {durada * 1e6:.0f} µs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Catàleg de preus d'instàncies.
+
+Carrega fulls de preus locals (JSON o CSV) amb milers d'SKUs, en diverses regions i modalitats de preu (on-demand
+o spot), i els guarda en arrays columnars amb índexs per nom, regió i família, de manera que les consultes són O(1).
+
+Format CSV: una fila per SKU amb les columnes name, vCPUs, DBUs, cost_per_hour, RAM_GB i, opcionalment, region,
+family i pricing.
+
+Format JSON: o bé una llista d'SKUs amb els mateixos camps, o bé un objecte amb la clau `instances` (la llista) i,
+opcionalment, `dbu_rates` (€/DBU-hora per a `job` i `all_purpose`) i `photon_multiplier` (multiplicador de DBUs
+quan s'activa Photon).
+"""
+import csv
+import json
+import os
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from cost_model import VMInstance, INSTANCIES, COST_DBU_JOB, COST_DBU_ALL_PURPOSE
+
+PREU_ON_DEMAND = 'on_demand'
+PREU_SPOT = 'spot'
+MULTIPLICADOR_PHOTON_PER_DEFECTE = 2.0
+
+_CAMPS_NUMERICS = ('vCPUs', 'DBUs', 'cost_per_hour', 'RAM_GB')
+
+
+def _familia(nom):
+    """
+    Deriva la família d'un nom d'SKU (p. ex. 'D4DS_V5' -> 'DDS_V5') si el full de preus no la indica.
+    """
+    base, _, versio = nom.partition('_')
+    familia = ''.join(caracter for caracter in base if not caracter.isdigit())
+    return f"{familia}_{versio}" if versio else familia
+
+
+class CatalegInstancies:
+    """
+    Catàleg indexat d'instàncies. Les dades es guarden per columnes i els objectes VMInstance es creen només
+    quan es consulten.
+    """
+    def __init__(self, files, cost_dbu_job=COST_DBU_JOB, cost_dbu_all_purpose=COST_DBU_ALL_PURPOSE,
+                 photon_multiplier=MULTIPLICADOR_PHOTON_PER_DEFECTE):
+        self.noms = [str(fila['name']) for fila in files]
+        self.regions = [str(fila.get('region') or '') for fila in files]
+        self.families = [str(fila.get('family') or _familia(nom)) for fila, nom in zip(files, self.noms)]
+        self.modalitats = [str(fila.get('pricing') or PREU_ON_DEMAND) for fila in files]
+        self.vCPUs = np.array([int(float(fila['vCPUs'])) for fila in files], dtype=np.int32)
+        self.DBUs = np.array([float(fila['DBUs']) for fila in files], dtype=np.float64)
+        self.cost_per_hour = np.array([float(fila['cost_per_hour']) for fila in files], dtype=np.float64)
+        self.RAM_GB = np.array([float(fila['RAM_GB']) for fila in files], dtype=np.float64)
+        self.cost_dbu_job = cost_dbu_job
+        self.cost_dbu_all_purpose = cost_dbu_all_purpose
+        self.photon_multiplier = photon_multiplier
+
+        self._per_clau = {}
+        self._per_nom = {}
+        self._per_regio = {}
+        self._per_familia = {}
+        for i, clau in enumerate(zip(self.noms, self.regions, self.modalitats)):
+            if clau in self._per_clau:
+                raise ValueError(f"SKU duplicat al catàleg: {clau}")
+            self._per_clau[clau] = i
+            self._per_nom.setdefault(clau[0], []).append(i)
+            self._per_regio.setdefault(clau[1], []).append(i)
+            self._per_familia.setdefault(self.families[i], []).append(i)
+
+    def __len__(self):
+        return len(self.noms)
+
+    def _instancia(self, i):
+        return VMInstance(self.noms[i], int(self.vCPUs[i]), float(self.DBUs[i]), float(self.cost_per_hour[i]),
+                          int(self.RAM_GB[i]) if self.RAM_GB[i].is_integer() else float(self.RAM_GB[i]))
+
+    def obtenir(self, nom, region=None, pricing=PREU_ON_DEMAND):
+        """
+        Retorna la instància amb aquest nom. Si no s'indica la regió, el nom ha de ser únic per a la modalitat.
+        """
+        if region is not None:
+            try:
+                return self._instancia(self._per_clau[(nom, region, pricing)])
+            except KeyError:
+                raise KeyError(f"Instància desconeguda: {nom} ({region}, {pricing})") from None
+        candidats = [i for i in self._per_nom.get(nom, ()) if self.modalitats[i] == pricing]
+        if not candidats:
+            raise KeyError(f"Instància desconeguda: {nom} ({pricing})")
+        if len(candidats) > 1:
+            raise KeyError(f"La instància {nom} existeix en diverses regions; cal indicar-ne la regió")
+        return self._instancia(candidats[0])
+
+    def instancies(self, region=None, family=None, pricing=PREU_ON_DEMAND):
+        """
+        Retorna les instàncies que compleixen els filtres indicats, en l'ordre del full de preus.
+        """
+        if region is not None:
+            files = self._per_regio.get(region, [])
+        elif family is not None:
+            files = self._per_familia.get(family, [])
+        else:
+            files = range(len(self))
+        return [self._instancia(i) for i in files
+                if (region is None or self.regions[i] == region)
+                and (family is None or self.families[i] == family)
+                and (pricing is None or self.modalitats[i] == pricing)]
+
+    def instancies_per_nom(self, region=None, pricing=PREU_ON_DEMAND):
+        """
+        Com `instancies`, però comprova que cada nom sigui únic: els càlculs identifiquen les instàncies pel nom i,
+        sense regió, un full de preus amb diverses regions repeteix els noms amb preus diferents.
+        """
+        instancies = self.instancies(region=region, pricing=pricing)
+        repetits = sorted(nom for nom, vegades in Counter(inst.name for inst in instancies).items() if vegades > 1)
+        if repetits:
+            mostra = ', '.join(repetits[:5]) + (', ...' if len(repetits) > 5 else '')
+            raise ValueError(f"Les instàncies {mostra} tenen preus en diverses regions del catàleg; "
+                             f"cal indicar-ne la regió (--regio)")
+        return instancies
+
+    def regions_disponibles(self):
+        return sorted(self._per_regio)
+
+    def families_disponibles(self):
+        return sorted(self._per_familia)
+
+    def modalitats_disponibles(self):
+        return sorted(set(self.modalitats))
+
+    def cost_dbu(self, job=True, photon=False):
+        """
+        Retorna el cost per DBU-hora del tipus de càlcul, aplicant el multiplicador de Photon si cal.
+        """
+        cost = self.cost_dbu_job if job else self.cost_dbu_all_purpose
+        return cost * self.photon_multiplier if photon else cost
+
+
+def _llegir_files(ruta):
+    if os.path.splitext(ruta)[1].lower() == '.json':
+        with open(ruta, encoding='utf-8') as fitxer:
+            dades = json.load(fitxer)
+        if isinstance(dades, list):
+            return dades, {}
+        opcions = {}
+        tarifes = dades.get('dbu_rates', {})
+        if 'job' in tarifes:
+            opcions['cost_dbu_job'] = float(tarifes['job'])
+        if 'all_purpose' in tarifes:
+            opcions['cost_dbu_all_purpose'] = float(tarifes['all_purpose'])
+        if 'photon_multiplier' in dades:
+            opcions['photon_multiplier'] = float(dades['photon_multiplier'])
+        return dades['instances'], opcions
+    with open(ruta, newline='', encoding='utf-8') as fitxer:
+        return list(csv.DictReader(fitxer)), {}
+
+
+@lru_cache(maxsize=8)
+def _carregar(ruta, _mtime, _mida):
+    files, opcions = _llegir_files(ruta)
+    for fila in files:
+        absents = [camp for camp in ('name',) + _CAMPS_NUMERICS if fila.get(camp) in (None, '')]
+        if absents:
+            raise ValueError(f"{ruta}: falten camps {', '.join(absents)} a l'SKU {fila.get('name', '?')}")
+    return CatalegInstancies(files, **opcions)
+
+
+def carregar_cataleg(ruta=None):
+    """
+    Carrega un catàleg des d'un full de preus JSON o CSV. Sense ruta, retorna el catàleg per defecte.
+
+    El resultat es guarda en memòria i es reutilitza mentre el fitxer no canviï.
+    """
+    if ruta is None:
+        return cataleg_per_defecte()
+    ruta = os.path.abspath(ruta)
+    estat = os.stat(ruta)
+    return _carregar(ruta, estat.st_mtime_ns, estat.st_size)
+
+
+@lru_cache(maxsize=1)
+def cataleg_per_defecte():
+    """
+    Catàleg amb les instàncies per defecte de l'aplicació.
+    """
+    return CatalegInstancies([
+        {'name': inst.name, 'vCPUs': inst.vCPUs, 'DBUs': inst.DBUs, 'cost_per_hour': inst.cost_per_hour,
+         'RAM_GB': inst.RAM_GB}
+        for inst in INSTANCIES
+    ])
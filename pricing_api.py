@@ -0,0 +1,354 @@
+"""
+API HTTP de preus (ASGI) per consultar el model de costos des d'altres eines.
+
+És una aplicació ASGI sense framework, perquè cada petició passi pel mínim de codi possible. Exposa:
+
+    GET  /instancies      catàleg d'instàncies i preus per DBU-hora
+    POST /preus           costos de Job Cluster i All-Purpose Cluster per a un lot d'escenaris
+    GET  /estadistiques   encerts i fallades de la cache de resultats
+    GET  /salut           comprovació de vida
+
+El cos de POST /preus és {"escenaris": [...]} i, opcionalment, "cost_dbu_job" i "cost_dbu_all_purpose". Cada
+escenari té les columnes de `calcular_escenaris`: driver, worker, nombre_workers, max_parallel_tasks,
+nombre_tasques, temps_execucio_per_tasca_min i startup_overhead_time. Els resultats dels escenaris es guarden en una
+cache LRU amb els valors normalitzats com a clau (noms d'instància en majúscules, enters i decimals), de manera
+que els escenaris repetits no es tornen a calcular. Els escenaris nous d'un lot es calculen tots d'una vegada amb el
+model vectoritzat, o amb les funcions escalars si són pocs.
+
+Ús:
+    python pricing_api.py --port 8000 --workers 4
+    CLUSTER_COST_CATALOG=preus.json uvicorn --factory pricing_api:crear_app
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+from collections import OrderedDict
+from math import ceil, isfinite
+
+from cost_model import (
+    TIPUS_JOB, TIPUS_ALL_PURPOSE, calcular_cost_job_cluster, calcular_cost_all_purpose, calcular_escenaris,
+)
+from instance_catalog import PREU_ON_DEMAND, carregar_cataleg
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MIDA_CACHE_PER_DEFECTE = 100_000
+MAX_ESCENARIS = 100_000
+MAX_MIDA_COS = 32 * 1024 * 1024
+# Per sota d'aquest nombre d'escenaris nous, les funcions escalars són més ràpides que el model vectoritzat
+LLINDAR_LOT = 32
+# Enter més gran que es representa exactament com a float64 (el model vectoritzat calcula en float64 i int64)
+MAX_ENTER = 2 ** 53
+
+CAMPS_ESCENARI = ('driver', 'worker', 'nombre_workers', 'max_parallel_tasks', 'nombre_tasques',
+                  'temps_execucio_per_tasca_min', 'startup_overhead_time')
+RESULTATS = ('total_DBUs', 'total_vCPUs', 'job_cost_per_tasca', 'job_cost_vm_per_tasca', 'job_cost_dbu_per_tasca',
+             'job_cost_total', 'job_temps_total_min', 'job_nombre_onades', 'all_purpose_cost_total',
+             'all_purpose_cost_vm_per_hora', 'all_purpose_cost_dbu_per_hora', 'all_purpose_cost_total_per_hora',
+             'all_purpose_temps_total_min', 'all_purpose_nombre_onades')
+
+
+def _a_json(dades):
+    if orjson is not None:
+        return orjson.dumps(dades)
+    return json.dumps(dades, separators=(',', ':')).encode()
+
+
+def _de_json(cos):
+    if orjson is not None:
+        return orjson.loads(cos)
+    return json.loads(cos)
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estat, missatge):
+        super().__init__(missatge)
+        self.estat = estat
+        self.missatge = missatge
+
+
+class CacheLRU:
+    """
+    Cache de mida limitada que descarta l'entrada utilitzada fa més temps.
+    """
+    def __init__(self, mida_maxima=MIDA_CACHE_PER_DEFECTE):
+        self.mida_maxima = mida_maxima
+        self.encerts = 0
+        self.fallades = 0
+        self._entrades = OrderedDict()
+
+    def __len__(self):
+        return len(self._entrades)
+
+    def obtenir(self, clau):
+        valor = self._entrades.get(clau)
+        if valor is None:
+            self.fallades += 1
+            return None
+        self._entrades.move_to_end(clau)
+        self.encerts += 1
+        return valor
+
+    def desar(self, clau, valor):
+        self._entrades[clau] = valor
+        self._entrades.move_to_end(clau)
+        if len(self._entrades) > self.mida_maxima:
+            self._entrades.popitem(last=False)
+
+
+def _es_nombre(valor):
+    return (isinstance(valor, int) and not isinstance(valor, bool)) or (isinstance(valor, float) and isfinite(valor))
+
+
+def _enter(escenari, camp, minim):
+    valor = escenari[camp]
+    if not _es_nombre(valor) or not minim <= valor <= MAX_ENTER or valor != int(valor):
+        raise ErrorHTTP(400, f"'{camp}' ha de ser un enter entre {minim} i {MAX_ENTER}")
+    return int(valor)
+
+
+def _decimal(escenari, camp):
+    valor = escenari[camp]
+    if not _es_nombre(valor) or valor < 0:
+        raise ErrorHTTP(400, f"'{camp}' ha de ser un nombre >= 0")
+    try:
+        return float(valor)
+    except OverflowError:
+        # Enters de JSON massa grans per a un float
+        raise ErrorHTTP(400, f"'{camp}' és massa gran") from None
+
+
+class AppPreus:
+    """
+    Aplicació ASGI de l'API de preus per a un conjunt d'instàncies i uns preus per DBU-hora.
+    """
+    def __init__(self, instancies, cost_dbu_job, cost_dbu_all_purpose, mida_cache=MIDA_CACHE_PER_DEFECTE):
+        self.instancies = list(instancies)
+        self.cost_dbu_job = cost_dbu_job
+        self.cost_dbu_all_purpose = cost_dbu_all_purpose
+        self.cache = CacheLRU(mida_cache)
+        self._index = {inst.name.strip().upper(): i for i, inst in enumerate(self.instancies)}
+        self._cataleg_json = _a_json({
+            'instancies': [{'name': inst.name, 'vCPUs': inst.vCPUs, 'DBUs': inst.DBUs,
+                            'cost_per_hour': inst.cost_per_hour, 'RAM_GB': inst.RAM_GB} for inst in self.instancies],
+            'cost_dbu_job': cost_dbu_job,
+            'cost_dbu_all_purpose': cost_dbu_all_purpose,
+        })
+
+    def _instancia(self, escenari, camp):
+        nom = escenari[camp]
+        try:
+            return self._index[str(nom).strip().upper()]
+        except KeyError:
+            raise ErrorHTTP(400, f"Instància desconeguda: {nom}") from None
+
+    def _clau(self, escenari, cost_dbu_job, cost_dbu_all_purpose):
+        """
+        Clau normalitzada d'un escenari: dos escenaris amb la mateixa clau tenen exactament el mateix resultat.
+        """
+        if not isinstance(escenari, dict):
+            raise ErrorHTTP(400, "Cada escenari ha de ser un objecte")
+        absents = [camp for camp in CAMPS_ESCENARI if camp not in escenari]
+        if absents:
+            raise ErrorHTTP(400, f"Falten camps a l'escenari: {', '.join(absents)}")
+        return (self._instancia(escenari, 'driver'), self._instancia(escenari, 'worker'),
+                _enter(escenari, 'nombre_workers', 0), _enter(escenari, 'max_parallel_tasks', 1),
+                _enter(escenari, 'nombre_tasques', 0), _decimal(escenari, 'temps_execucio_per_tasca_min'),
+                _decimal(escenari, 'startup_overhead_time'), cost_dbu_job, cost_dbu_all_purpose)
+
+    def _calcular_escalar(self, clau):
+        # Mateixos càlculs que calcular_escenaris, amb les funcions escalars
+        driver, worker, nombre_workers, max_parallel_tasks, nombre_tasques, temps, overhead, cost_job, cost_ap = clau
+        driver, worker = self.instancies[driver], self.instancies[worker]
+        total_DBUs = driver.DBUs + nombre_workers * worker.DBUs
+        cost_vm_workers = nombre_workers * worker.cost_per_hour
+        job = calcular_cost_job_cluster(driver.cost_per_hour, cost_vm_workers, total_DBUs, cost_job, overhead, temps,
+                                        max_parallel_tasks, nombre_tasques)
+        onades_all_purpose = ceil(nombre_tasques / max_parallel_tasks)
+        temps_all_purpose = overhead + onades_all_purpose * temps
+        all_purpose = calcular_cost_all_purpose(driver.cost_per_hour, cost_vm_workers, total_DBUs, cost_ap,
+                                                temps_all_purpose)
+        return (total_DBUs, float(driver.vCPUs + nombre_workers * worker.vCPUs), job[0], job[1], job[2],
+                nombre_tasques * job[0], job[3], job[4], all_purpose[0], all_purpose[2], all_purpose[1],
+                all_purpose[3], temps_all_purpose, onades_all_purpose)
+
+    def _calcular_lot(self, claus):
+        columnes = list(zip(*claus))
+        resultats = calcular_escenaris(dict(zip(CAMPS_ESCENARI, columnes[:7])), self.instancies,
+                                       cost_dbu_job=columnes[7], cost_dbu_all_purpose=columnes[8])
+        return zip(*(resultats[nom].tolist() for nom in RESULTATS))
+
+    def preus(self, peticio):
+        """
+        Calcula els resultats d'un lot d'escenaris, reutilitzant els que ja són a la cache.
+        """
+        if not isinstance(peticio, dict) or not isinstance(peticio.get('escenaris'), list):
+            raise ErrorHTTP(400, "El cos ha de ser un objecte amb una llista 'escenaris'")
+        escenaris = peticio['escenaris']
+        if len(escenaris) > MAX_ESCENARIS:
+            raise ErrorHTTP(413, f"Com a màxim {MAX_ESCENARIS} escenaris per petició")
+        cost_dbu_job = _decimal(peticio, 'cost_dbu_job') if 'cost_dbu_job' in peticio else self.cost_dbu_job
+        cost_dbu_all_purpose = (_decimal(peticio, 'cost_dbu_all_purpose') if 'cost_dbu_all_purpose' in peticio
+                                else self.cost_dbu_all_purpose)
+
+        claus = [self._clau(escenari, cost_dbu_job, cost_dbu_all_purpose) for escenari in escenaris]
+        resultats = [self.cache.obtenir(clau) for clau in claus]
+        # Escenaris nous (sense repetits dins del mateix lot)
+        nous = list(dict.fromkeys(clau for clau, resultat in zip(claus, resultats) if resultat is None))
+        if nous:
+            calculats = (self._calcular_lot(nous) if len(nous) >= LLINDAR_LOT
+                         else map(self._calcular_escalar, nous))
+            per_clau = {}
+            for clau, valors in zip(nous, calculats):
+                resultat = dict(zip(RESULTATS, valors))
+                resultat['opcio_mes_economica'] = (TIPUS_JOB if resultat['job_cost_total'] < resultat['all_purpose_cost_total']
+                                                   else TIPUS_ALL_PURPOSE)
+                self.cache.desar(clau, resultat)
+                per_clau[clau] = resultat
+            resultats = [resultat if resultat is not None else per_clau[clau]
+                         for clau, resultat in zip(claus, resultats)]
+        return {'resultats': resultats}
+
+    def estadistiques(self):
+        return {'encerts': self.cache.encerts, 'fallades': self.cache.fallades, 'entrades': len(self.cache),
+                'mida_maxima': self.cache.mida_maxima}
+
+    async def _llegir_cos(self, receive):
+        parts = []
+        mida = 0
+        while True:
+            missatge = await receive()
+            part = missatge.get('body', b'')
+            mida += len(part)
+            if mida > MAX_MIDA_COS:
+                raise ErrorHTTP(413, f"El cos no pot superar {MAX_MIDA_COS} bytes")
+            parts.append(part)
+            if not missatge.get('more_body', False):
+                return b''.join(parts)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                missatge = await receive()
+                if missatge['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif missatge['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+
+        metode, ruta = scope['method'], scope['path']
+        estat = 200
+        try:
+            if ruta == '/preus':
+                if metode != 'POST':
+                    raise ErrorHTTP(405, "Cal fer servir POST")
+                try:
+                    peticio = _de_json(await self._llegir_cos(receive))
+                except ValueError:
+                    raise ErrorHTTP(400, "El cos no és JSON vàlid") from None
+                cos = _a_json(self.preus(peticio))
+            elif ruta in ('/instancies', '/estadistiques', '/salut'):
+                if metode != 'GET':
+                    raise ErrorHTTP(405, "Cal fer servir GET")
+                if ruta == '/instancies':
+                    cos = self._cataleg_json
+                elif ruta == '/estadistiques':
+                    cos = _a_json(self.estadistiques())
+                else:
+                    cos = b'{"estat":"ok"}'
+            else:
+                raise ErrorHTTP(404, f"Ruta desconeguda: {ruta}")
+        except ErrorHTTP as e:
+            estat, cos = e.estat, _a_json({'error': e.missatge})
+
+        await send({'type': 'http.response.start', 'status': estat,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(cos)).encode())]})
+        await send({'type': 'http.response.body', 'body': cos})
+
+
+def crear_app():
+    """
+    Crea l'aplicació amb el catàleg indicat per les variables d'entorn CLUSTER_COST_CATALOG, CLUSTER_COST_REGIO,
+    CLUSTER_COST_MODALITAT i CLUSTER_COST_PHOTON (o el catàleg per defecte).
+    """
+    cataleg = carregar_cataleg(os.environ.get('CLUSTER_COST_CATALOG') or None)
+    photon = os.environ.get('CLUSTER_COST_PHOTON', '') not in ('', '0')
+    mida_cache = int(os.environ.get('CLUSTER_COST_MIDA_CACHE', MIDA_CACHE_PER_DEFECTE))
+    instancies = cataleg.instancies_per_nom(region=os.environ.get('CLUSTER_COST_REGIO') or None,
+                                            pricing=os.environ.get('CLUSTER_COST_MODALITAT') or PREU_ON_DEMAND)
+    return AppPreus(instancies, cataleg.cost_dbu(True, photon), cataleg.cost_dbu(False, photon), mida_cache)
+
+
+def _servir(sock):
+    import uvicorn
+    config = uvicorn.Config(crear_app, factory=True, access_log=False, log_level='warning')
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveix l'API HTTP de preus del model de costos.")
+    parser.add_argument('--host', default='127.0.0.1', help="Adreça on escoltar (per defecte: %(default)s)")
+    parser.add_argument('--port', type=int, default=8000, help="Port on escoltar (per defecte: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1, help="Nombre de processos servidors (0 = tots els nuclis)")
+    parser.add_argument('--cataleg', help="Full de preus d'instàncies (.json o .csv); per defecte, les instàncies de l'aplicació")
+    parser.add_argument('--regio', help="Regió del catàleg a fer servir")
+    parser.add_argument('--modalitat', default=PREU_ON_DEMAND, help="Modalitat de preu (per defecte: %(default)s)")
+    parser.add_argument('--photon', action='store_true', help="Aplica el multiplicador de DBUs de Photon")
+    parser.add_argument('--mida-cache', type=int, default=MIDA_CACHE_PER_DEFECTE,
+                        help="Escenaris guardats a la cache de cada procés (per defecte: %(default)s)")
+    args = parser.parse_args(argv)
+    if importlib.util.find_spec('uvicorn') is None:
+        print("Error: cal instal·lar uvicorn per servir l'API", file=sys.stderr)
+        return 1
+
+    # Cada procés servidor crea la seva aplicació, així que la configuració es passa per l'entorn
+    os.environ.update({
+        'CLUSTER_COST_CATALOG': os.path.abspath(args.cataleg) if args.cataleg else '',
+        'CLUSTER_COST_REGIO': args.regio or '',
+        'CLUSTER_COST_MODALITAT': args.modalitat,
+        'CLUSTER_COST_PHOTON': '1' if args.photon else '',
+        'CLUSTER_COST_MIDA_CACHE': str(args.mida_cache),
+    })
+    try:
+        crear_app()
+        sock = socket.create_server((args.host, args.port))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    # Les connexions acceptades hereten TCP_NODELAY del socket d'escolta; sense, el cos de cada resposta
+    # s'endarrereix fins a l'ACK retardat del client (~40 ms)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    if workers == 1:
+        _servir(sock)
+        return 0
+
+    # Diversos processos servidors que accepten connexions del mateix socket
+    processos = [multiprocessing.Process(target=_servir, args=(sock,)) for _ in range(workers)]
+    for proces in processos:
+        proces.start()
+
+    def aturar(_senyal, _marc):
+        for proces in processos:
+            proces.terminate()
+
+    signal.signal(signal.SIGTERM, aturar)
+    signal.signal(signal.SIGINT, aturar)
+    for proces in processos:
+        proces.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""
+Etapes de càlcul en cache per a l'aplicació Streamlit.
+
+Cada etapa és una funció pura decorada amb `etapa_en_cache`, que la guarda amb `st.cache_data` (resultats que
+es poden serialitzar) o `st.cache_resource` (objectes compartits que no es modifiquen, com els gràfics), amb
+una mida màxima i un temps de vida per limitar la memòria. A més, es comptabilitzen els encerts i les fallades
+de la cache i el temps de cada etapa, tant per a l'execució actual com acumulats per a totes les sessions.
+
+Els comptadors viuen en aquest mòdul perquè, a diferència del script principal, no es torna a executar a cada
+rerun de Streamlit. Streamlit només s'importa la primera vegada que s'executa una etapa, perquè es puguin
+importar les funcions decorades sense carregar la interfície.
+
+A més de les etapes, qualsevol part del script es pot marcar com a secció amb `seccio` (com a context o com a
+decorador) per mesurar-ne el temps de paret i, opcionalment, la memòria assignada amb tracemalloc, i es compten
+els reruns de cada sessió. Aquesta instrumentació està desactivada per defecte (cada secció només comprova un
+indicador) i s'activa amb la variable d'entorn CLUSTER_COST_INSTRUMENTACIO. Les estadístiques es poden exportar
+en el format de text de Prometheus.
+
+tracemalloc mesura la memòria de tot el procés, no la d'un fil. En el mode de memòria, les seccions de sessions
+diferents s'executen una darrere l'altra (un bloqueig reentrant cobreix cada secció exterior), de manera que una
+secció no compta la memòria de les seccions d'altres sessions. El que altres fils assignen fora de les seccions sí
+que hi compta: el mode de memòria està pensat per perfilar amb una sola sessió. Per no bloquejar-se amb les
+caches de Streamlit, no s'han de marcar seccions dins de les funcions de les etapes en cache.
+"""
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+# Mida i temps de vida per defecte de les caches de cada etapa
+MAX_ENTRADES_PER_DEFECTE = 256
+TTL_PER_DEFECTE = 3600
+
+# Modes d'instrumentació de seccions: desactivada, només temps, o temps i memoria (tracemalloc)
+MODES_INSTRUMENTACIO = ('', 'temps', 'memoria')
+# Sessions de les quals es guarden els reruns; quan se supera, s'oblida la que fa més temps que no s'executa
+MAX_SESSIONS_REGISTRADES = 1000
+
+_bloqueig = threading.Lock()
+# Serialitza les seccions mesurades amb tracemalloc de fils diferents
+_bloqueig_memoria = threading.RLock()
+_estadistiques = {}
+_local = threading.local()
+_mode = ''
+_seccions = {}
+_reruns = OrderedDict()
+# Reruns de les sessions oblidades, perquè el total no baixi mai
+_reruns_oblidats = 0
+
+
+def _estadistica(nom):
+    return _estadistiques.setdefault(nom, {'encerts': 0, 'fallades': 0, 'temps_encerts': 0.0, 'temps_fallades': 0.0})
+
+
+def etapa_en_cache(nom, max_entries=MAX_ENTRADES_PER_DEFECTE, ttl=TTL_PER_DEFECTE, recurs=False):
+    """
+    Decorador que guarda una etapa en cache i en registra els encerts, les fallades i el temps.
+
+    Amb `recurs=True` es fa servir `st.cache_resource`, que retorna el mateix objecte sense serialitzar-lo;
+    només s'ha de fer servir per a resultats que no es modifiquen després.
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def calcul(*args, **kwargs):
+            # Només s'executa quan la cache no té el resultat
+            _local.fallada = True
+            return func(*args, **kwargs)
+
+        calcul_en_cache = None
+
+        def crear_cache():
+            nonlocal calcul_en_cache
+            if calcul_en_cache is None:
+                import streamlit as st
+                cache = st.cache_resource if recurs else st.cache_data
+                calcul_en_cache = cache(max_entries=max_entries, ttl=ttl, show_spinner=False)(calcul)
+            return calcul_en_cache
+
+        @functools.wraps(func)
+        def etapa(*args, **kwargs):
+            cache = crear_cache()
+            _local.fallada = False
+            inici = time.perf_counter()
+            resultat = cache(*args, **kwargs)
+            durada = time.perf_counter() - inici
+            fallada = _local.fallada
+            with _bloqueig:
+                estadistica = _estadistica(nom)
+                if fallada:
+                    estadistica['fallades'] += 1
+                    estadistica['temps_fallades'] += durada
+                else:
+                    estadistica['encerts'] += 1
+                    estadistica['temps_encerts'] += durada
+            execucio = getattr(_local, 'execucio', None)
+            if execucio is not None:
+                execucio.append((nom, not fallada, durada))
+            return resultat
+
+        etapa.clear = lambda: crear_cache().clear()
+        return etapa
+    return decorador
+
+
+def iniciar_execucio(sessio=None):
+    """
+    Comença a registrar les etapes d'una nova execució del script en el fil actual. Amb la instrumentació
+    activada, també en registra les seccions i compta un rerun més de `sessio`.
+    """
+    global _reruns_oblidats
+    _local.execucio = []
+    _local.inici_execucio = time.perf_counter()
+    _local.seccions = []
+    _local.pila = []
+    if _mode and sessio is not None:
+        with _bloqueig:
+            _reruns[sessio] = _reruns.get(sessio, 0) + 1
+            _reruns.move_to_end(sessio)
+            if len(_reruns) > MAX_SESSIONS_REGISTRADES:
+                _reruns_oblidats += _reruns.popitem(last=False)[1]
+
+
+def execucio_actual():
+    """
+    Retorna les etapes de l'execució actual com a (nom, encert, durada en segons) i el temps total transcorregut.
+    """
+    execucio = list(getattr(_local, 'execucio', []))
+    inici = getattr(_local, 'inici_execucio', None)
+    total = time.perf_counter() - inici if inici is not None else 0.0
+    return execucio, total
+
+
+def estadistiques():
+    """
+    Retorna una còpia de les estadístiques acumulades de totes les sessions, per etapa.
+    """
+    with _bloqueig:
+        return {nom: dict(valors) for nom, valors in _estadistiques.items()}
+
+
+def reiniciar_estadistiques():
+    global _reruns_oblidats
+    with _bloqueig:
+        _estadistiques.clear()
+        _seccions.clear()
+        _reruns.clear()
+        _reruns_oblidats = 0
+
+
+def configurar_instrumentacio(mode=None):
+    """
+    Activa o desactiva la instrumentació de seccions. Sense `mode`, es llegeix de CLUSTER_COST_INSTRUMENTACIO:
+    buida o '0' la desactiva, 'temps' (o '1') registra el temps de cada secció i els reruns, i 'memoria' hi afegeix
+    la memòria assignada, amb tracemalloc (que alenteix força tot el procés).
+    """
+    global _mode
+    if mode is None:
+        mode = os.environ.get('CLUSTER_COST_INSTRUMENTACIO', '').strip().lower()
+        mode = {'0': '', '1': 'temps'}.get(mode, mode)
+    if mode not in MODES_INSTRUMENTACIO:
+        raise ValueError(f"Mode d'instrumentació desconegut: {mode}. Opcions: temps, memoria")
+    if mode == 'memoria' and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif mode != 'memoria' and _mode == 'memoria' and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _mode = mode
+
+
+def instrumentacio_activa():
+    return bool(_mode)
+
+
+class _Seccio:
+    """
+    Secció instrumentada, que es pot fer servir com a context (`with seccio(nom):`) o com a decorador. L'estat de
+    cada secció en curs es guarda a la pila del fil, de manera que el mateix objecte es pot reutilitzar.
+    """
+    __slots__ = ('nom',)
+
+    def __init__(self, nom):
+        self.nom = nom
+
+    def __enter__(self):
+        if not _mode:
+            return self
+        pila = getattr(_local, 'pila', None)
+        if pila is None:
+            pila = _local.pila = []
+        memoria = pic = None
+        bloquejat = False
+        if tracemalloc.is_tracing():
+            # Una secció d'un altre fil reiniciaria el pic i en sumaria les assignacions
+            _bloqueig_memoria.acquire()
+            bloquejat = True
+            memoria, pic = tracemalloc.get_traced_memory()
+            # El pic de la secció pare s'ha de conservar abans de reiniciar-lo per a aquesta secció
+            if pila and pila[-1][3] is not None:
+                pila[-1][3] = max(pila[-1][3], pic)
+            tracemalloc.reset_peak()
+            pic = memoria
+        pila.append([self, time.perf_counter(), memoria, pic, bloquejat])
+        return self
+
+    def __exit__(self, *_excepcio):
+        pila = getattr(_local, 'pila', None)
+        if not pila or pila[-1][0] is not self:
+            return False
+        _, inici, memoria_inici, pic, bloquejat = pila.pop()
+        try:
+            if _mode:
+                self._registrar(pila, inici, memoria_inici, pic)
+        finally:
+            if bloquejat:
+                _bloqueig_memoria.release()
+        return False
+
+    def _registrar(self, pila, inici, memoria_inici, pic):
+        durada = time.perf_counter() - inici
+        memoria_neta = pic_seccio = None
+        if memoria_inici is not None and tracemalloc.is_tracing():
+            memoria, pic_actual = tracemalloc.get_traced_memory()
+            pic = max(pic, pic_actual)
+            memoria_neta = memoria - memoria_inici
+            pic_seccio = pic - memoria_inici
+            if pila and pila[-1][3] is not None:
+                pila[-1][3] = max(pila[-1][3], pic)
+        seccions = getattr(_local, 'seccions', None)
+        if seccions is not None:
+            seccions.append((self.nom, len(pila), durada, memoria_neta, pic_seccio))
+        with _bloqueig:
+            estadistica = _seccions.setdefault(self.nom, {'execucions': 0, 'temps_total': 0.0, 'temps_maxim': 0.0,
+                                                          'memoria_neta_total': 0, 'pic_memoria_maxim': 0})
+            estadistica['execucions'] += 1
+            estadistica['temps_total'] += durada
+            estadistica['temps_maxim'] = max(estadistica['temps_maxim'], durada)
+            if memoria_neta is not None:
+                estadistica['memoria_neta_total'] += memoria_neta
+                estadistica['pic_memoria_maxim'] = max(estadistica['pic_memoria_maxim'], pic_seccio)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def seccio_instrumentada(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return seccio_instrumentada
+
+
+def seccio(nom):
+    """
+    Marca una secció del script per instrumentar-la. Amb la instrumentació desactivada no registra res.
+    """
+    return _Seccio(nom)
+
+
+def seccions_actuals():
+    """
+    Retorna les seccions acabades de l'execució actual com a (nom, nivell d'imbricació, durada en segons,
+    memòria neta assignada i pic de memòria en bytes). La memòria és None si no es fa servir tracemalloc.
+    """
+    return list(getattr(_local, 'seccions', []))
+
+
+def estadistiques_seccions():
+    """
+    Retorna una còpia de les estadístiques acumulades de totes les sessions, per secció.
+    """
+    with _bloqueig:
+        return {nom: dict(valors) for nom, valors in _seccions.items()}
+
+
+def reruns(sessio=None):
+    """
+    Retorna els reruns registrats d'una sessió o, sense sessió, el total de reruns i el nombre de sessions. Només
+    es guarden les `MAX_SESSIONS_REGISTRADES` sessions executades més recentment; el total inclou les oblidades.
+    """
+    with _bloqueig:
+        if sessio is not None:
+            return _reruns.get(sessio, 0)
+        return _reruns_oblidats + sum(_reruns.values()), len(_reruns)
+
+
+def _etiqueta(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def metriques_prometheus():
+    """
+    Retorna les estadístiques d'etapes, seccions i reruns en el format de text de Prometheus.
+    """
+    etapes = estadistiques()
+    seccions = estadistiques_seccions()
+    total_reruns, sessions = reruns()
+    linies = []
+
+    def metrica(nom, tipus, ajuda, mostres):
+        linies.append(f"# HELP {nom} {ajuda}")
+        linies.append(f"# TYPE {nom} {tipus}")
+        for etiquetes, valor in mostres:
+            text = ','.join(f'{clau}="{_etiqueta(v)}"' for clau, v in etiquetes.items())
+            linies.append(f"{nom}{{{text}}} {valor!r}" if text else f"{nom} {valor!r}")
+
+    resultats = (('encert', 'encerts'), ('fallada', 'fallades'))
+    metrica('cluster_cost_etapa_crides_total', 'counter', "Crides a cada etapa en cache, per resultat",
+            [({'etapa': nom, 'resultat': resultat}, valors[clau])
+             for nom, valors in etapes.items() for resultat, clau in resultats])
+    metrica('cluster_cost_etapa_segons_total', 'counter', "Temps acumulat de cada etapa en cache, per resultat",
+            [({'etapa': nom, 'resultat': resultat}, valors['temps_' + clau])
+             for nom, valors in etapes.items() for resultat, clau in resultats])
+    metrica('cluster_cost_seccio_execucions_total', 'counter', "Execucions de cada secció",
+            [({'seccio': nom}, valors['execucions']) for nom, valors in seccions.items()])
+    metrica('cluster_cost_seccio_segons_total', 'counter', "Temps de paret acumulat de cada secció",
+            [({'seccio': nom}, valors['temps_total']) for nom, valors in seccions.items()])
+    metrica('cluster_cost_seccio_segons_maxim', 'gauge', "Temps de paret màxim d'una execució de cada secció",
+            [({'seccio': nom}, valors['temps_maxim']) for nom, valors in seccions.items()])
+    if _mode == 'memoria':
+        metrica('cluster_cost_seccio_memoria_neta_bytes_total', 'counter',
+                "Memòria neta assignada acumulada de cada secció (tracemalloc)",
+                [({'seccio': nom}, valors['memoria_neta_total']) for nom, valors in seccions.items()])
+        metrica('cluster_cost_seccio_pic_memoria_bytes', 'gauge',
+                "Pic de memòria màxim d'una execució de cada secció (tracemalloc)",
+                [({'seccio': nom}, valors['pic_memoria_maxim']) for nom, valors in seccions.items()])
+    metrica('cluster_cost_reruns_total', 'counter', "Execucions del script registrades", [({}, total_reruns)])
+    metrica('cluster_cost_sessions', 'gauge', "Sessions recents amb alguna execució registrada", [({}, sessions)])
+    return '\n'.join(linies) + '\n'
+
+
+def escriure_metriques(ruta):
+    """
+    Escriu les mètriques a `ruta` en el format de text de Prometheus (per exemple, per al textfile collector del
+    node exporter). El fitxer se substitueix de manera atòmica perquè no es llegeixi mai a mitges.
+    """
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as fitxer:
+        fitxer.write(metriques_prometheus())
+    os.replace(temporal, ruta)
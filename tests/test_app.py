@@ -0,0 +1,100 @@
+"""
+Execució completa del script de Streamlit amb AppTest.
+"""
+import json
+import os
+
+import pytest
+
+AppTest = pytest.importorskip('streamlit.testing.v1').AppTest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cluster_cost_calculator.py')
+
+
+def executar(**valors):
+    at = AppTest.from_file(SCRIPT, default_timeout=120)
+    at.run()
+    for etiqueta, valor in valors.items():
+        next(widget for widget in at.sidebar.number_input if etiqueta in widget.label).set_value(valor)
+    if valors:
+        at.run()
+    assert not at.exception, at.exception
+    return at
+
+
+def test_resultats_per_defecte():
+    at = executar()
+    assert [metric.value for metric in at.metric] == ['€0.2627', '€26.2708', '37.5 minuts', '€23.1302', '202.5 minuts']
+    assert 'All-Purpose Cluster' in at.success[0].value
+
+
+def test_una_sola_onada():
+    # Amb tantes tasques com paral·lelisme, el Job Cluster fa una sola onada de 2.5 + 10 minuts
+    at = executar(**{'Nombre de tasques': 35})
+    assert at.metric[2].value == '12.5 minuts'
+    assert at.metric[4].value == '72.5 minuts'
+
+
+def test_seccions_opcionals():
+    at = AppTest.from_file(SCRIPT, default_timeout=120)
+    at.run()
+    for checkbox in at.sidebar.checkbox:
+        if checkbox.label.startswith(('🧭', '🎲', '🔬')):
+            checkbox.check()
+    at.run()
+    assert not at.exception, at.exception
+    capcaleres = [header.value for header in at.header]
+    for seccio in ('Optimitzador', 'Simulació', 'Explorador'):
+        assert any(seccio in capcalera for capcalera in capcaleres)
+
+
+def test_escombrat_amb_molts_canvis():
+    # Amb 4 tasques en paral·lel a l'All-Purpose, l'opció més econòmica alterna a cada onada: centenars de canvis
+    pyarrow = pytest.importorskip('pyarrow')
+    at = executar(**{'Nombre de workers (Job Cluster)': 3, 'Nombre de workers (All-Purpose)': 8,
+                     'Nombre de tasques': 5000})
+    next(widget for widget in at.sidebar.number_input if 'paral·lel (All-Purpose)' in widget.label).set_value(4)
+    next(checkbox for checkbox in at.sidebar.checkbox if checkbox.label.startswith('🔬')).check()
+    at.run()
+    assert not at.exception, at.exception
+    assert any(caption.value == "Es mostren els primers 100 canvis de 777." for caption in at.caption)
+    assert any(subheader.value == "Punts de canvi de l'opció més econòmica (777)" for subheader in at.subheader)
+    assert len(at.dataframe[0].value) == 100
+    regles = []
+    for grafic in at.get('vega_lite_chart'):
+        capes = json.loads(grafic.proto.spec).get('layer', [])
+        dades = {conjunt.name: conjunt.data.data for conjunt in grafic.proto.datasets}
+        regles += [pyarrow.ipc.open_stream(dades[capa['data']['name']]).read_all().num_rows
+                   for capa in capes if capa['mark']['type'] == 'rule']
+    assert regles == [100]
+
+
+def test_instrumentacio(monkeypatch, tmp_path):
+    from stage_cache import configurar_instrumentacio
+    ruta = tmp_path / 'metriques.prom'
+    monkeypatch.setenv('CLUSTER_COST_INSTRUMENTACIO', 'memoria')
+    monkeypatch.setenv('CLUSTER_COST_METRIQUES', str(ruta))
+    try:
+        at = AppTest.from_file(SCRIPT, default_timeout=120)
+        at.run()
+        at.run()
+        assert not at.exception, at.exception
+        assert any("Reruns d'aquesta sessió:** 2" in markdown.value for markdown in at.sidebar.markdown)
+        metriques = ruta.read_text(encoding='utf-8')
+        for seccio in ("Capçalera i logo", "Gràfics de comparació", "Punts d'equilibri"):
+            assert f'cluster_cost_seccio_segons_total{{seccio="{seccio}"}}' in metriques
+        assert 'cluster_cost_seccio_pic_memoria_bytes' in metriques
+    finally:
+        configurar_instrumentacio('')
+
+
+def test_cataleg_amb_poques_instancies(monkeypatch, tmp_path):
+    # Un catàleg de dues instàncies: els selectors no poden demanar la tercera o la quarta per defecte
+    ruta = tmp_path / 'preus.csv'
+    ruta.write_text("name,vCPUs,DBUs,cost_per_hour,RAM_GB\nD4A_V4,4,0.75,0.2207,16\nD8A_V4,8,1.5,0.4414,32\n",
+                    encoding='utf-8')
+    monkeypatch.setenv('CLUSTER_COST_CATALOG', str(ruta))
+    at = AppTest.from_file(SCRIPT, default_timeout=120)
+    at.run()
+    assert not at.exception, at.exception
+    assert [selector.value for selector in at.sidebar.selectbox][:4] == ['D4A_V4', 'D8A_V4', 'D8A_V4', 'D8A_V4']
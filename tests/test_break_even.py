@@ -0,0 +1,125 @@
+"""
+Punts d'equilibri: les regions han de coincidir amb l'avaluació directa dels costos a cada punt.
+"""
+import random
+
+import numpy as np
+import pytest
+
+import break_even
+from break_even import ConfiguracioComparacio, llindars_lot, punts_equilibri, regions_equilibri
+from cost_model import INSTANCIES, TIPUS_JOB, TIPUS_ALL_PURPOSE, calcular_escenaris
+
+INSTANCIA = {inst.name: inst for inst in INSTANCIES}
+
+
+def configuracio(**canvis):
+    valors = dict(driver_job=INSTANCIA['DS4_V2'], worker_job=INSTANCIA['D4A_V4'], nombre_workers_job=1,
+                  driver_all_purpose=INSTANCIA['D8A_V4'], worker_all_purpose=INSTANCIA['E4DS_V5'],
+                  nombre_workers_all_purpose=5, max_parallel_tasks_all_purpose=35, nombre_tasques=100,
+                  temps_execucio_per_tasca_min=10.0, startup_overhead_time=2.5)
+    valors.update(canvis)
+    return ConfiguracioComparacio(**valors)
+
+
+def configuracio_aleatoria(rng):
+    return configuracio(
+        worker_job=rng.choice(INSTANCIES), nombre_workers_job=rng.randint(1, 6),
+        worker_all_purpose=rng.choice(INSTANCIES), nombre_workers_all_purpose=rng.randint(1, 6),
+        max_parallel_tasks_all_purpose=rng.randint(1, 60), nombre_tasques=rng.randint(1, 400),
+        temps_execucio_per_tasca_min=rng.uniform(0.5, 30), startup_overhead_time=rng.uniform(0, 10))
+
+
+def opcio_directa(config, parametre, valor):
+    return TIPUS_JOB if config.diferencia(parametre, valor) < 0 else TIPUS_ALL_PURPOSE
+
+
+def comprovar_enters(config, parametre, minim, maxim):
+    regions = regions_equilibri(config, parametre, minim, maxim)
+    assert regions[0]['des_de'] == minim and regions[-1]['fins_a'] == maxim
+    for anterior, seguent in zip(regions, regions[1:]):
+        assert seguent['des_de'] == anterior['fins_a'] + 1 and seguent['opcio'] != anterior['opcio']
+    for regio in regions:
+        for valor in range(regio['des_de'], regio['fins_a'] + 1):
+            assert opcio_directa(config, parametre, valor) == regio['opcio'], (parametre, valor)
+    return regions
+
+
+@pytest.mark.parametrize('llavor', range(20))
+def test_regions_enteres_com_l_avaluacio_directa(llavor):
+    config = configuracio_aleatoria(random.Random(llavor))
+    comprovar_enters(config, 'nombre_tasques', 1, 3000)
+    comprovar_enters(config, 'max_parallel_tasks_all_purpose', 1, 200)
+    comprovar_enters(config, 'nombre_workers_all_purpose', 1, 60)
+    comprovar_enters(config, 'nombre_workers_job', 1, 60)
+
+
+def configuracio_equilibrada(llavor):
+    # Paral·lelisme proper al que iguala el pendent dels dos costos: l'opció canvia dins de molts blocs seguits
+    config = configuracio_aleatoria(random.Random(llavor))
+    cost_per_tasca = config.amb('nombre_tasques', 1).costos()[0]
+    paral_lelisme = max(1, round(config.temps_execucio_per_tasca_min * config.cost_per_hora_all_purpose()
+                                 / (60 * cost_per_tasca)))
+    return config.amb('max_parallel_tasks_all_purpose', paral_lelisme)
+
+
+@pytest.mark.parametrize('llavor', [5, 18, 47, 73, 141, 180, 242, 272])
+def test_molts_blocs_amb_canvis(llavor):
+    regions = comprovar_enters(configuracio_equilibrada(llavor), 'nombre_tasques', 1, 3000)
+    assert len(regions) > 40
+
+
+@pytest.mark.parametrize('llavor', range(20))
+def test_punts_d_equilibri_continus(llavor):
+    config = configuracio_aleatoria(random.Random(llavor))
+    for parametre, maxim in (('temps_execucio_per_tasca_min', 200.0), ('startup_overhead_time', 200.0),
+                             ('multiplicador_dbu', 20.0)):
+        regions = regions_equilibri(config, parametre, 0.0, maxim)
+        for regio in regions:
+            centre = (regio['des_de'] + regio['fins_a']) / 2
+            assert opcio_directa(config, parametre, centre) == regio['opcio']
+        for punt in punts_equilibri(config, parametre, 0.0, maxim):
+            costos = config.amb(parametre, punt).costos()
+            assert costos[0] == pytest.approx(costos[1], rel=1e-9)
+
+
+def test_rang_de_tasques_molt_gran():
+    # Mil milions de tasques amb paral·lelisme 1: només dues regions, sense recórrer els blocs
+    config = configuracio(max_parallel_tasks_all_purpose=1)
+    regions = regions_equilibri(config, 'nombre_tasques', 1, 10 ** 9)
+    assert len(regions) <= 2
+    for regio in regions:
+        for valor in (regio['des_de'], regio['fins_a'], (regio['des_de'] + regio['fins_a']) // 2):
+            assert opcio_directa(config, 'nombre_tasques', valor) == regio['opcio']
+
+    # Amb blocs amb canvis a dins, només es calculen els blocs propers als punts d'equilibri
+    config = configuracio_equilibrada(47)
+    regions = regions_equilibri(config, 'nombre_tasques', 1, 10 ** 12)
+    petit = regions_equilibri(config, 'nombre_tasques', 1, 3000)
+    assert len(regions) == len(petit) == 430
+    assert regions[:-1] == petit[:-1] and regions[-1]['des_de'] == petit[-1]['des_de']
+    assert opcio_directa(config, 'nombre_tasques', 10 ** 12) == regions[-1]['opcio']
+
+
+def test_massa_blocs_amb_canvis(monkeypatch):
+    monkeypatch.setattr(break_even, 'MAX_BLOCS_TASQUES', 100)
+    with pytest.raises(ValueError, match='reduir el rang'):
+        regions_equilibri(configuracio_equilibrada(47), 'nombre_tasques', 1, 10 ** 6)
+    with pytest.raises(ValueError, match='desconegut'):
+        regions_equilibri(configuracio(), 'preu', 1, 10)
+
+
+def test_llindars_lot():
+    escenaris = {'driver': ['DS4_V2', 'D8A_V4'], 'worker': ['D4A_V4', 'E4DS_V5'], 'nombre_workers': [2, 5],
+                 'max_parallel_tasks': [35, 8], 'nombre_tasques': [100, 40],
+                 'temps_execucio_per_tasca_min': [10.0, 3.0], 'startup_overhead_time': [2.5, 5.0]}
+    llindar, job_per_sobre = llindars_lot(escenaris, 'temps_execucio_per_tasca_min', INSTANCIES)
+    for i in range(2):
+        en_llindar = {columna: [valors[i]] for columna, valors in escenaris.items()}
+        en_llindar['temps_execucio_per_tasca_min'] = [llindar[i]]
+        resultat = calcular_escenaris(en_llindar, INSTANCIES)
+        assert resultat['job_cost_total'][0] == pytest.approx(resultat['all_purpose_cost_total'][0], rel=1e-9)
+        en_llindar['temps_execucio_per_tasca_min'] = [llindar[i] + 1]
+        resultat = calcular_escenaris(en_llindar, INSTANCIES)
+        assert (resultat['job_cost_total'][0] < resultat['all_purpose_cost_total'][0]) == job_per_sobre[i]
+    assert np.isfinite(llindar).all()
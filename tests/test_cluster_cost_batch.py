@@ -0,0 +1,102 @@
+"""
+Càlcul per lots: anada i tornada CSV/Parquet per blocs amb els mateixos resultats que el model vectoritzat.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from cluster_cost_batch import COLUMNES_ENTRADA, calcular_bloc, main, processar_fitxer
+from cost_model import INSTANCIES, calcular_escenaris
+
+NOMS = [inst.name for inst in INSTANCIES]
+
+
+def execucions(files, llavor=0):
+    rng = np.random.default_rng(llavor)
+    return pd.DataFrame({
+        'driver': rng.choice(NOMS, files),
+        'worker': rng.choice(NOMS, files),
+        'nombre_workers': rng.integers(1, 9, files),
+        'max_parallel_tasks': rng.integers(1, 40, files),
+        'nombre_tasques': rng.integers(1, 500, files),
+        'temps_execucio_per_tasca_min': rng.integers(1, 60, files),
+        'startup_overhead_time': rng.integers(0, 10, files),
+    })
+
+
+def comprovar(resultat, entrada):
+    esperat = calcular_escenaris(entrada, INSTANCIES)
+    assert len(resultat) == len(entrada)
+    assert resultat['driver'].tolist() == entrada['driver'].tolist()
+    for columna, valors in esperat.items():
+        np.testing.assert_allclose(resultat[columna].to_numpy(dtype=np.float64), valors, rtol=1e-12)
+
+
+def test_csv_per_blocs(tmp_path):
+    entrada = execucions(250)
+    entrada.to_csv(tmp_path / 'entrada.csv', index=False)
+    assert main([str(tmp_path / 'entrada.csv'), str(tmp_path / 'sortida.csv'), '--chunk-size', '64']) == 0
+    comprovar(pd.read_csv(tmp_path / 'sortida.csv'), entrada)
+
+
+def test_parquet_amb_tipus_diferents_entre_blocs(tmp_path):
+    # El primer bloc té enters i una columna addicional buida; el segon, decimals i text
+    entrada = execucions(200)
+    entrada['etiqueta'] = [None] * 100 + ['b'] * 100
+    entrada['temps_execucio_per_tasca_min'] = entrada['temps_execucio_per_tasca_min'].astype(np.float64)
+    entrada.loc[100:, 'temps_execucio_per_tasca_min'] += 0.5
+    with open(tmp_path / 'entrada.csv', 'w') as fitxer:
+        fitxer.write(entrada.head(100).to_csv(index=False).replace('.0,', ','))
+        fitxer.write(entrada.tail(100).to_csv(index=False, header=False))
+
+    files = processar_fitxer(str(tmp_path / 'entrada.csv'), str(tmp_path / 'sortida.parquet'), mida_bloc=100)
+    assert files == 200
+    resultat = pd.read_parquet(tmp_path / 'sortida.parquet')
+    comprovar(resultat, entrada)
+    assert resultat['etiqueta'].isna().sum() == 100
+    assert resultat['job_nombre_onades'].dtype == np.int64
+
+    # I de Parquet a CSV, en paral·lel
+    resultat[list(entrada.columns)].to_parquet(tmp_path / 'entrada.parquet', index=False)
+    files = processar_fitxer(str(tmp_path / 'entrada.parquet'), str(tmp_path / 'tornada.csv'), mida_bloc=30,
+                             processos=2)
+    assert files == 200
+    comprovar(pd.read_csv(tmp_path / 'tornada.csv'), entrada)
+
+
+def test_index_d_instancia_fora_de_rang(tmp_path):
+    bloc = execucions(3)
+    bloc['worker'] = [0, len(INSTANCIES) - 1, -1]
+    with pytest.raises(ValueError, match='fora de rang'):
+        calcular_bloc(bloc)
+    bloc['worker'] = [0, 1, len(INSTANCIES)]
+    with pytest.raises(ValueError, match='fora de rang'):
+        calcular_bloc(bloc)
+
+    bloc.drop(columns=COLUMNES_ENTRADA[-1]).to_csv(tmp_path / 'entrada.csv', index=False)
+    assert main([str(tmp_path / 'entrada.csv'), str(tmp_path / 'sortida.csv')]) == 1
+
+
+@pytest.mark.parametrize('columna, valor, error', [
+    ('max_parallel_tasks', 0, 'max_parallel_tasks té valors inferiors a 1 a les files 4'),
+    ('nombre_workers', -3, 'nombre_workers té valors inferiors a 0 a les files 4'),
+    ('nombre_tasques', -1, 'nombre_tasques té valors inferiors a 0 a les files 4'),
+    ('temps_execucio_per_tasca_min', -0.5, 'temps_execucio_per_tasca_min té valors inferiors a 0 a les files 4'),
+    ('startup_overhead_time', np.nan, 'startup_overhead_time té valors buits'),
+    ('temps_execucio_per_tasca_min', np.inf, 'temps_execucio_per_tasca_min té valors buits, no numèrics o infinits'),
+    ('nombre_workers', 'tres', 'nombre_workers té valors buits, no numèrics o infinits a les files 4'),
+])
+def test_files_no_valides(tmp_path, capsys, columna, valor, error):
+    # La quarta fila és al segon bloc: el número de fila és el del fitxer
+    entrada = execucions(5).astype({columna: object})
+    entrada.loc[3, columna] = valor
+    for extensio in ('csv', 'parquet'):
+        ruta = tmp_path / f'entrada.{extensio}'
+        if extensio == 'csv':
+            entrada.to_csv(ruta, index=False)
+        else:
+            entrada.astype({columna: str if valor == 'tres' else np.float64}).to_parquet(ruta, index=False)
+        assert main([str(ruta), str(tmp_path / 'sortida.csv'), '--chunk-size', '2']) == 1
+        assert error in capsys.readouterr().err
+    with pytest.raises(ValueError, match='files 4$'):
+        calcular_bloc(entrada)
@@ -0,0 +1,82 @@
+"""
+Optimitzador de configuracions: mínim i front de Pareto comparats amb una cerca exhaustiva.
+"""
+from math import ceil
+
+import pytest
+
+from cluster_optimizer import optimitzar_clusters, _onades_possibles
+from cost_model import (
+    INSTANCIES, COST_DBU_JOB, COST_DBU_ALL_PURPOSE, TIPUS_JOB, TIPUS_ALL_PURPOSE,
+    calcular_cost_job_cluster, calcular_cost_all_purpose,
+)
+
+TEMPS, OVERHEAD, MAX_WORKERS = 7.0, 3.0, 4
+
+
+def forca_bruta(tasques, termini_min=None, tasques_per_vcpu=1):
+    """
+    Avalua totes les combinacions de driver, worker, nombre de workers i paral·lelisme.
+    """
+    candidats = []
+    for driver in INSTANCIES:
+        for worker in INSTANCIES:
+            for n in range(1, MAX_WORKERS + 1):
+                total_DBUs = driver.DBUs + n * worker.DBUs
+                for p in range(1, min(tasques, n * worker.vCPUs * tasques_per_vcpu) + 1):
+                    cost_tasca, _, _, temps_job, _ = calcular_cost_job_cluster(
+                        driver.cost_per_hour, n * worker.cost_per_hour, total_DBUs, COST_DBU_JOB,
+                        OVERHEAD, TEMPS, p, tasques)
+                    candidats.append((TIPUS_JOB, temps_job, tasques * cost_tasca))
+                    temps_ap = OVERHEAD + ceil(tasques / p) * TEMPS
+                    cost_ap = calcular_cost_all_purpose(driver.cost_per_hour, n * worker.cost_per_hour, total_DBUs,
+                                                        COST_DBU_ALL_PURPOSE, temps_ap)[0]
+                    candidats.append((TIPUS_ALL_PURPOSE, temps_ap, cost_ap))
+    if termini_min is not None:
+        candidats = [c for c in candidats if c[1] <= termini_min]
+    return candidats
+
+
+def front(candidats):
+    punts, millor_cost = [], float('inf')
+    for _tipus, temps, cost in sorted(candidats, key=lambda c: (c[1], c[2])):
+        if cost < millor_cost - 1e-9:
+            punts.append((temps, cost))
+            millor_cost = cost
+    return punts
+
+
+@pytest.mark.parametrize('tasques', [1, 5, 12, 17])
+def test_minim_i_front_com_la_forca_bruta(tasques):
+    resultat = optimitzar_clusters(tasques, TEMPS, OVERHEAD, INSTANCIES, max_workers=MAX_WORKERS)
+    candidats = forca_bruta(tasques)
+    minim = min(candidats, key=lambda c: c[2])
+    assert resultat[0]['cost_total'] == pytest.approx(minim[2], rel=1e-12)
+    assert resultat[0]['tipus'] == minim[0]
+
+    obtingut = sorted((c['temps_total_min'], c['cost_total']) for c in resultat)
+    esperat = front(candidats)
+    assert len(obtingut) == len(esperat)
+    for (temps, cost), (temps_esperat, cost_esperat) in zip(obtingut, esperat):
+        assert temps == pytest.approx(temps_esperat) and cost == pytest.approx(cost_esperat, rel=1e-12)
+
+
+def test_termini_pressupost_i_tasques_per_vcpu():
+    resultat = optimitzar_clusters(17, TEMPS, OVERHEAD, INSTANCIES, termini_min=20.0, max_workers=MAX_WORKERS,
+                                   tasques_per_vcpu=2)
+    minim = min(forca_bruta(17, termini_min=20.0, tasques_per_vcpu=2), key=lambda c: c[2])
+    assert all(c['temps_total_min'] <= 20.0 for c in resultat)
+    assert resultat[0]['cost_total'] == pytest.approx(minim[2], rel=1e-12)
+
+    pressupost = resultat[0]['cost_total'] * 1.0001
+    assert [c['cost_total'] for c in optimitzar_clusters(17, TEMPS, OVERHEAD, INSTANCIES, termini_min=20.0,
+                                                         pressupost=pressupost, max_workers=MAX_WORKERS,
+                                                         tasques_per_vcpu=2)] == [resultat[0]['cost_total']]
+    assert optimitzar_clusters(17, TEMPS, OVERHEAD, INSTANCIES, termini_min=1.0) == []
+
+
+def test_onades_possibles():
+    for tasques in (1, 2, 10, 99, 1000):
+        assert _onades_possibles(tasques).tolist() == sorted({ceil(tasques / p) for p in range(1, tasques + 1)})
+    with pytest.raises(ValueError):
+        optimitzar_clusters(0, TEMPS, OVERHEAD, INSTANCIES)
@@ -0,0 +1,165 @@
+"""
+Empaquetament de carteres de càrregues en All-Purpose Clusters compartits i Job Clusters.
+"""
+import random
+
+import pytest
+
+from cluster_packing import (
+    COMPARTIT, CarregaTreball, empaquetar_cartera, opcions_job_cluster, _minuts_exclusius,
+)
+from cost_model import (
+    INSTANCIES, COST_DBU_JOB, COST_DBU_ALL_PURPOSE, TIPUS_JOB, calcular_cost_job_cluster, calcular_cost_all_purpose,
+)
+
+INSTANCIA = {inst.name: inst for inst in INSTANCIES}
+# Clúster compartit de 2 workers D8A_V4: 16 vCPUs i 64 GB
+D8A = INSTANCIA['D8A_V4']
+OVERHEAD, INACTIVITAT = 2.5, 10.0
+
+
+def cost_compartit(minuts, workers=2):
+    return calcular_cost_all_purpose(D8A.cost_per_hour, workers * D8A.cost_per_hour, D8A.DBUs + workers * D8A.DBUs,
+                                     COST_DBU_ALL_PURPOSE, minuts)[0]
+
+
+def test_opcions_job_cluster_coincideixen_amb_el_model():
+    # 4 tasques en paral·lel de 2 vCPUs: 2 workers de 4 vCPUs o 1 de 8 vCPUs
+    carrega = CarregaTreball('a', 10, 5.0, max_parallel_tasks=4, vCPUs_per_tasca=2)
+    opcions = opcions_job_cluster([carrega], INSTANCIES, OVERHEAD)
+    driver = INSTANCIES[opcions['driver'][0]]
+    worker = INSTANCIES[opcions['worker'][0]]
+    n = int(opcions['nombre_workers'][0])
+    assert n * (worker.vCPUs // 2) >= 4 and (n - 1) * (worker.vCPUs // 2) < 4
+
+    millor = min(
+        10 * calcular_cost_job_cluster(d.cost_per_hour, -(-4 // (w.vCPUs // 2)) * w.cost_per_hour,
+                                       d.DBUs + -(-4 // (w.vCPUs // 2)) * w.DBUs, COST_DBU_JOB, OVERHEAD, 5.0, 4, 10)[0]
+        for d in INSTANCIES for w in INSTANCIES)
+    esperat = 10 * calcular_cost_job_cluster(driver.cost_per_hour, n * worker.cost_per_hour,
+                                             driver.DBUs + n * worker.DBUs, COST_DBU_JOB, OVERHEAD, 5.0, 4, 10)[0]
+    assert opcions['cost_total'][0] == pytest.approx(esperat, rel=1e-12)
+    assert opcions['cost_total'][0] == pytest.approx(millor, rel=1e-12)
+    assert opcions['temps_total_min'][0] == 3 * (OVERHEAD + 5.0)
+
+
+def test_termini_i_tasques_massa_grans_per_a_job_cluster():
+    carregues = [
+        CarregaTreball('curta', 8, 10.0, max_parallel_tasks=8, termini_min=20.0),
+        CarregaTreball('llarga', 8, 10.0, max_parallel_tasks=8, termini_min=10.0),
+        CarregaTreball('enorme', 1, 10.0, vCPUs_per_tasca=64),
+    ]
+    opcions = opcions_job_cluster(carregues, INSTANCIES, OVERHEAD)
+    assert opcions['compleix_termini'].tolist() == [True, False, False]
+    assert opcions['cost_total'][2] == float('inf')
+
+
+def test_dues_carregues_comparteixen_un_cluster():
+    # 8 + 8 vCPUs en un clúster de 16 i a la mateixa hora: un sol període de 30 minuts després d'arrencar
+    carregues = [CarregaTreball('a', 16, 15.0, 0.0, 8), CarregaTreball('b', 8, 30.0, 0.0, 8)]
+    resultat = empaquetar_cartera(carregues, INSTANCIES, D8A, D8A, 2, OVERHEAD, INACTIVITAT)
+    assert [a['tipus'] for a in resultat['assignacions']] == [COMPARTIT, COMPARTIT]
+    assert len(resultat['clusters']) == 1
+    cluster = resultat['clusters'][0]
+    assert cluster['periodes'] == [(OVERHEAD, OVERHEAD + 30.0)]
+    assert cluster['minuts_facturats'] == 30.0 + OVERHEAD + INACTIVITAT
+    assert cluster['cost_total'] == pytest.approx(cost_compartit(cluster['minuts_facturats']))
+    assert resultat['cost_total'] == pytest.approx(sum(a['cost_total'] for a in resultat['assignacions']))
+    assert resultat['estalvi'] == pytest.approx(resultat['cost_tot_job_clusters'] - resultat['cost_total'])
+
+
+def test_retard_dins_del_termini():
+    # La segona càrrega no hi cap fins que acaba la primera, i el termini permet esperar-la
+    carregues = [CarregaTreball('a', 16, 20.0, 0.0, 16),
+                 CarregaTreball('b', 8, 10.0, 5.0, 8, termini_min=30.0)]
+    resultat = empaquetar_cartera(carregues, INSTANCIES, D8A, D8A, 2, OVERHEAD, INACTIVITAT)
+    b = resultat['assignacions'][1]
+    assert b['tipus'] == COMPARTIT and b['cluster'] == resultat['assignacions'][0]['cluster']
+    assert b['inici_min'] == OVERHEAD + 20.0 and b['final_min'] == OVERHEAD + 30.0
+    assert b['final_min'] - 5.0 <= 30.0
+
+
+def test_arrencada_en_fred_dins_del_termini():
+    # Un clúster nou no pot començar la càrrega fins que ha arrencat: amb 11 minuts de termini no hi arriba
+    carrega = CarregaTreball('a', 8, 10.0, 0.0, 8, termini_min=11.0)
+    resultat = empaquetar_cartera([carrega], INSTANCIES, D8A, D8A, 2, OVERHEAD, INACTIVITAT)
+    assert resultat['clusters'] == []
+    assert resultat['assignacions'][0]['tipus'] == TIPUS_JOB
+    assert not resultat['assignacions'][0]['compleix_termini']
+
+    # Amb el clúster ja engegat per una altra càrrega, sí que hi arriba
+    carregues = [CarregaTreball('b', 8, 30.0, 0.0, 8), CarregaTreball('a', 8, 10.0, 5.0, 8, termini_min=11.0)]
+    resultat = empaquetar_cartera(carregues, INSTANCIES, D8A, D8A, 2, OVERHEAD, INACTIVITAT)
+    a = resultat['assignacions'][1]
+    assert a['tipus'] == COMPARTIT and (a['inici_min'], a['final_min']) == (5.0, 15.0)
+
+    # Si arriba abans que el clúster estigui engegat, espera que acabi d'arrencar i no fa pas un segon spin-up
+    carregues = [CarregaTreball('b', 8, 30.0, 2.0, 8), CarregaTreball('a', 8, 10.0, 0.0, 8, termini_min=15.0)]
+    resultat = empaquetar_cartera(carregues, INSTANCIES, D8A, D8A, 2, OVERHEAD, INACTIVITAT)
+    b, a = resultat['assignacions']
+    assert a['tipus'] == b['tipus'] == COMPARTIT and (a['inici_min'], b['inici_min']) == (OVERHEAD, 2.0 + OVERHEAD)
+    assert resultat['clusters'][0]['periodes'] == [(OVERHEAD, 32.0 + OVERHEAD)]
+    assert resultat['clusters'][0]['minuts_facturats'] == 32.0 + OVERHEAD + INACTIVITAT
+
+
+def test_clusters_separats_si_no_hi_caben():
+    # Sense termini no es pot esperar: la segona càrrega va a un altre clúster compartit
+    carregues = [CarregaTreball('a', 16, 20.0, 0.0, 16), CarregaTreball('b', 8, 10.0, 5.0, 8)]
+    resultat = empaquetar_cartera(carregues, INSTANCIES, D8A, D8A, 2, OVERHEAD, INACTIVITAT)
+    assert [a['tipus'] for a in resultat['assignacions']] == [COMPARTIT, COMPARTIT]
+    assert len(resultat['clusters']) == 2
+    # Amb un sol clúster compartit permès, va a un Job Cluster
+    resultat = empaquetar_cartera(carregues, INSTANCIES, D8A, D8A, 2, OVERHEAD, INACTIVITAT,
+                                  max_clusters_compartits=1)
+    assert [a['tipus'] for a in resultat['assignacions']] == [COMPARTIT, TIPUS_JOB]
+
+
+def test_job_cluster_si_compartir_no_surt_a_compte():
+    # Amb DBUs d'All-Purpose molt cares, cap càrrega no es queda en un clúster compartit
+    carregues = [CarregaTreball('a', 4, 10.0, 0.0, 4), CarregaTreball('b', 4, 10.0, 600.0, 4)]
+    resultat = empaquetar_cartera(carregues, INSTANCIES, D8A, D8A, 2, OVERHEAD, INACTIVITAT,
+                                  cost_dbu_all_purpose=100.0)
+    assert [a['tipus'] for a in resultat['assignacions']] == [TIPUS_JOB, TIPUS_JOB]
+    assert resultat['clusters'] == []
+    assert resultat['cost_total'] == pytest.approx(resultat['cost_tot_job_clusters'])
+
+
+def test_minuts_exclusius():
+    exclusius = _minuts_exclusius([(0, 0.0, 10.0), (1, 5.0, 20.0), (2, 30.0, 35.0)])
+    assert exclusius == {0: 5.0, 1: 10.0, 2: 5.0}
+
+
+def test_cartera_aleatoria_respecta_capacitat_i_terminis():
+    rng = random.Random(3)
+    carregues = [CarregaTreball(f'c{i}', rng.randint(1, 60), rng.uniform(1, 20), rng.uniform(0, 600),
+                                rng.randint(1, 8), rng.choice([1, 2]), rng.choice([0.0, 4.0, 8.0]),
+                                rng.choice([None, 90.0, 200.0]))
+                 for i in range(300)]
+    resultat = empaquetar_cartera(carregues, INSTANCIES, D8A, D8A, 2, OVERHEAD, INACTIVITAT)
+    assert resultat['cost_total'] <= resultat['cost_tot_job_clusters']
+
+    for cluster in resultat['clusters']:
+        # Cada període engegat comença amb una càrrega que ha esperat l'arrencada del clúster
+        for inici_periode, _final in cluster['periodes']:
+            assert any(resultat['assignacions'][index]['inici_min'] == inici_periode
+                       and inici_periode >= carregues[index].arribada_min + OVERHEAD - 1e-9
+                       for index in cluster['carregues'])
+        esdeveniments = []
+        for index in cluster['carregues']:
+            carrega, assignacio = carregues[index], resultat['assignacions'][index]
+            assert assignacio['tipus'] == COMPARTIT and assignacio['cluster'] == cluster['cluster']
+            assert assignacio['inici_min'] >= carrega.arribada_min
+            if carrega.termini_min is not None:
+                assert assignacio['final_min'] <= carrega.arribada_min + carrega.termini_min + 1e-9
+            paral_lelisme = min(carrega.max_parallel_tasks, carrega.nombre_tasques)
+            vcpus, ram = paral_lelisme * carrega.vCPUs_per_tasca, paral_lelisme * carrega.RAM_GB_per_tasca
+            esdeveniments.append((assignacio['inici_min'], 1, vcpus, ram))
+            esdeveniments.append((assignacio['final_min'], 0, -vcpus, -ram))
+        us_vcpus = us_ram = 0.0
+        for _instant, _tipus, vcpus, ram in sorted(esdeveniments):
+            us_vcpus += vcpus
+            us_ram += ram
+            assert us_vcpus <= 16 + 1e-9 and us_ram <= 64 + 1e-9
+
+    compartides = [a for a in resultat['assignacions'] if a['tipus'] == COMPARTIT]
+    assert compartides and all(a['compleix_termini'] for a in compartides)
@@ -0,0 +1,70 @@
+"""
+Simulació d'esdeveniments discrets: amb durades constants ha de coincidir amb el model d'onades.
+"""
+from math import ceil
+
+import numpy as np
+import pytest
+
+from cluster_simulation import generar_durades, simular_cluster, simular_monte_carlo
+from cost_model import INSTANCIES
+
+INSTANCIA = {inst.name: inst for inst in INSTANCIES}
+DRIVER, WORKER = INSTANCIA['DS4_V2'], INSTANCIA['D8A_V4']
+OVERHEAD, TEMPS = 2.5, 10.0
+
+
+@pytest.mark.parametrize('tasques, workers, paral_lel', [
+    (1, 1, 1), (35, 1, 8), (36, 5, 35), (100, 5, 35), (100, 5, 40), (7, 2, 3), (64, 4, 32),
+])
+def test_durades_constants_com_el_model_d_onades(tasques, workers, paral_lel):
+    resultat = simular_cluster(np.full(tasques, TEMPS), DRIVER, WORKER, min_workers=workers,
+                               startup_overhead_time=OVERHEAD, max_parallel_tasks=paral_lel)
+    # Un sol spin-up i ceil(tasques / paral·lelisme) onades, com a l'All-Purpose Cluster del model
+    makespan = OVERHEAD + ceil(tasques / paral_lel) * TEMPS
+    assert resultat['makespan_min'] == pytest.approx(makespan)
+    assert resultat['minuts_node'] == pytest.approx((1 + workers) * makespan)
+    assert resultat['cost_vm'] == pytest.approx(makespan * (DRIVER.cost_per_hour + workers * WORKER.cost_per_hour) / 60)
+    assert resultat['maxim_workers'] == workers
+
+
+def test_les_vcpus_limiten_el_paral_lelisme():
+    # 35 tasques en paral·lel configurades, però un sol worker de 8 vCPUs
+    resultat = simular_cluster(np.full(35, TEMPS), DRIVER, WORKER, startup_overhead_time=OVERHEAD,
+                               max_parallel_tasks=35)
+    assert resultat['makespan_min'] == pytest.approx(OVERHEAD + ceil(35 / 8) * TEMPS)
+
+
+def test_l_autoescalat_respecta_el_paral_lelisme():
+    durades = np.full(64, TEMPS)
+    resultat = simular_cluster(durades, DRIVER, WORKER, min_workers=1, max_workers=8,
+                               startup_overhead_time=OVERHEAD, max_parallel_tasks=32)
+    assert resultat['maxim_workers'] == 4
+    # Els workers nous arrenquen alhora que el primer: dues onades de 32 tasques
+    assert resultat['makespan_min'] == pytest.approx(OVERHEAD + 2 * TEMPS)
+
+    resultat = simular_cluster(durades, DRIVER, WORKER, min_workers=1, max_workers=8,
+                               startup_overhead_time=OVERHEAD, max_parallel_tasks=8)
+    assert resultat['maxim_workers'] == 1
+    with pytest.raises(ValueError):
+        simular_cluster(durades, DRIVER, WORKER, max_parallel_tasks=0)
+
+
+def test_monte_carlo_en_paral_lel_dona_el_mateix_resultat():
+    parametres = dict(nombre_repliques=6, nombre_tasques=50, temps_mitja_min=TEMPS, driver=DRIVER, worker=WORKER,
+                      coeficient_variacio=0.5, llavor=7, min_workers=2, max_workers=4, max_parallel_tasks=20,
+                      startup_overhead_time=OVERHEAD)
+    seqüencial = simular_monte_carlo(processos=1, **parametres)
+    assert simular_monte_carlo(processos=2, **parametres) == seqüencial
+    inferior, superior = seqüencial['cost_total']['interval']
+    assert inferior <= seqüencial['cost_total']['mitjana'] <= superior
+    assert seqüencial['maxim_workers']['interval'][1] <= 4
+
+
+@pytest.mark.parametrize('distribucio', ['exponencial', 'lognormal', 'uniforme'])
+def test_generar_durades(distribucio):
+    durades = generar_durades(20_000, TEMPS, distribucio, coeficient_variacio=0.5, llavor=1)
+    assert durades.mean() == pytest.approx(TEMPS, rel=0.03)
+    assert (durades >= 0).all()
+    with pytest.raises(ValueError, match='desconeguda'):
+        generar_durades(10, TEMPS, 'normal')
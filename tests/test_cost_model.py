@@ -0,0 +1,110 @@
+"""
+Valors de referència del model de costos, sobretot dels casos límit del nombre d'onades (ceil).
+"""
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from cost_model import (
+    INSTANCIES, COST_DBU_JOB, COST_DBU_ALL_PURPOSE,
+    calcular_cost_job_cluster, calcular_cost_all_purpose,
+    calcular_cost_job_cluster_lot, calcular_cost_all_purpose_lot, calcular_escenaris,
+)
+
+# Valors rodons per poder comprovar els resultats a mà: 3 €/h de VM, 10 DBUs a 0.5 €, onades de 5 + 55 minuts
+DRIVER, WORKERS, DBUS, COST_DBU, OVERHEAD, TEMPS = 1.0, 2.0, 10.0, 0.5, 5.0, 55.0
+
+
+@pytest.mark.parametrize('tasques, paral_lel, onades', [
+    (0, 4, 0),
+    (1, 4, 1),
+    (3, 4, 1),
+    (4, 4, 1),
+    (5, 4, 2),
+    (8, 4, 2),
+    (9, 4, 3),
+    (3, 10, 1),
+    (1, 1, 1),
+    (7, 1, 7),
+    (10_000_000, 3, 3_333_334),
+    (2 ** 40, 2 ** 20, 2 ** 20),
+    (2 ** 40 + 1, 2 ** 20, 2 ** 20 + 1),
+])
+def test_onades_job_cluster(tasques, paral_lel, onades):
+    resultat = calcular_cost_job_cluster(DRIVER, WORKERS, DBUS, COST_DBU, OVERHEAD, TEMPS, paral_lel, tasques)
+    assert resultat[4] == onades
+    assert resultat[3] == onades * (OVERHEAD + TEMPS)
+
+    lot = calcular_cost_job_cluster_lot(DRIVER, WORKERS, DBUS, COST_DBU, OVERHEAD, TEMPS, paral_lel, tasques)
+    assert int(lot[4]) == onades
+    assert float(lot[3]) == resultat[3]
+
+
+def test_costos_per_tasca_job_cluster():
+    cost_tasca, cost_vm, cost_dbu, temps_total, onades = calcular_cost_job_cluster(
+        DRIVER, WORKERS, DBUS, COST_DBU, OVERHEAD, TEMPS, 4, 5)
+    assert cost_vm == pytest.approx(3.0)
+    assert cost_dbu == pytest.approx(55 / 60 * 5)
+    assert cost_tasca == pytest.approx(3.0 + 55 / 60 * 5)
+    assert (temps_total, onades) == (120.0, 2)
+
+
+def test_costos_all_purpose():
+    # Un sol spin-up i dues onades: 5 + 2 * 55 minuts
+    cost_total, cost_dbu_hora, cost_vm_hora, cost_hora = calcular_cost_all_purpose(DRIVER, WORKERS, DBUS, COST_DBU,
+                                                                                   115.0)
+    assert (cost_dbu_hora, cost_vm_hora, cost_hora) == (5.0, 3.0, 8.0)
+    assert cost_total == pytest.approx(115 / 60 * 8)
+    assert calcular_cost_all_purpose(DRIVER, WORKERS, DBUS, COST_DBU, 0.0)[0] == 0.0
+
+
+def test_lot_identic_a_escalar():
+    rng = np.random.default_rng(0)
+    n = 2000
+    arguments = [rng.uniform(0.1, 5, n), rng.uniform(0.1, 20, n), rng.uniform(0.5, 50, n), rng.uniform(0.1, 1, n),
+                 rng.uniform(0, 10, n), rng.uniform(0.1, 120, n), rng.integers(1, 64, n), rng.integers(0, 5000, n)]
+    # Múltiples exactes del paral·lelisme, on ceil() no ha d'arrodonir cap amunt
+    arguments[7][::3] = arguments[6][::3] * rng.integers(0, 100, len(arguments[7][::3]))
+    lot_job = calcular_cost_job_cluster_lot(*arguments)
+    lot_all_purpose = calcular_cost_all_purpose_lot(*arguments[:4], arguments[5])
+    for i in range(n):
+        fila = [float(valors[i]) if valors.dtype.kind == 'f' else int(valors[i]) for valors in arguments]
+        assert tuple(float(valors[i]) for valors in lot_job) == calcular_cost_job_cluster(*fila)
+        assert tuple(float(valors[i]) for valors in lot_all_purpose) == calcular_cost_all_purpose(*fila[:4], fila[5])
+
+
+def test_escenaris_configuracio_per_defecte():
+    # Configuració per defecte de l'aplicació: 100 tasques de 10 minuts amb 2.5 minuts de spin-up
+    escenaris = {
+        'driver': ['DS4_V2', 'D8A_V4'], 'worker': ['D4A_V4', 'E4DS_V5'], 'nombre_workers': [1, 5],
+        'max_parallel_tasks': [35, 5], 'nombre_tasques': [100, 100], 'temps_execucio_per_tasca_min': [10.0, 10.0],
+        'startup_overhead_time': [2.5, 2.5],
+    }
+    resultats = calcular_escenaris(escenaris, INSTANCIES)
+    assert resultats['job_cost_per_tasca'][0] == pytest.approx(0.262708333)
+    assert resultats['job_cost_total'][0] == pytest.approx(26.2708333)
+    assert resultats['job_temps_total_min'][0] == 37.5
+    assert resultats['job_nombre_onades'][0] == 3
+    assert resultats['all_purpose_cost_total'][1] == pytest.approx(23.130225)
+    assert resultats['all_purpose_temps_total_min'][1] == 202.5
+    assert resultats['all_purpose_nombre_onades'][1] == 20
+    assert list(resultats['total_DBUs']) == [2.25, 9.0]
+    assert COST_DBU_JOB < COST_DBU_ALL_PURPOSE
+
+
+def test_escenaris_instancia_desconeguda():
+    with pytest.raises(ValueError, match='Instància desconeguda: XYZ'):
+        calcular_escenaris({'driver': ['XYZ'], 'worker': ['D4A_V4'], 'nombre_workers': [1], 'max_parallel_tasks': [1],
+                            'nombre_tasques': [1], 'temps_execucio_per_tasca_min': [1.0],
+                            'startup_overhead_time': [1.0]}, INSTANCIES)
+
+
+def test_importacio_sense_dependencies_pesades():
+    codi = ("import sys, cost_model, cluster_cost_calculator; "
+            "print(','.join(nom for nom in ('numpy', 'pandas', 'streamlit', 'altair') if nom in sys.modules))")
+    sortida = subprocess.run([sys.executable, '-c', codi], capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert sortida.stdout.strip() == ''
@@ -0,0 +1,82 @@
+"""
+Escombrats de sensibilitat: graella del model vectoritzat i reducció de punts que conserva els creuaments.
+"""
+import numpy as np
+import pytest
+
+from cost_model import INSTANCIES, calcular_escenaris
+from cost_sweep import creuaments, escombrar, reduir_corba, reduir_graella, valors_eix
+
+CONFIG_JOB = {'driver': 'DS4_V2', 'worker': 'D4A_V4', 'nombre_workers': 1, 'max_parallel_tasks': 35,
+              'nombre_tasques': 100, 'temps_execucio_per_tasca_min': 10.0, 'startup_overhead_time': 2.5}
+CONFIG_ALL_PURPOSE = dict(CONFIG_JOB, driver='D8A_V4', worker='E4DS_V5', nombre_workers=5)
+
+
+def test_escombrat_2d_com_el_model():
+    eixos = [('nombre_tasques', valors_eix('nombre_tasques', 1, 500, 40)),
+             ('multiplicador_dbu', valors_eix('multiplicador_dbu', 0.5, 2.0, 7))]
+    series = escombrar(CONFIG_JOB, CONFIG_ALL_PURPOSE, INSTANCIES, eixos)
+    assert series['job_cost_total'].shape == (40, 7)
+    i, j = 17, 5
+    tasques, multiplicador = eixos[0][1][i], eixos[1][1][j]
+    job = calcular_escenaris({c: [v] for c, v in dict(CONFIG_JOB, nombre_tasques=tasques).items()}, INSTANCIES,
+                             cost_dbu_job=0.288 * multiplicador)
+    all_purpose = calcular_escenaris({c: [v] for c, v in dict(CONFIG_ALL_PURPOSE, nombre_tasques=tasques).items()},
+                                     INSTANCIES, cost_dbu_all_purpose=0.528 * multiplicador)
+    assert series['job_cost_total'][i, j] == pytest.approx(job['job_cost_total'][0], rel=1e-12)
+    assert series['all_purpose_temps_total_min'][i, j] == all_purpose['all_purpose_temps_total_min'][0]
+
+
+def test_valors_eix():
+    assert valors_eix('nombre_workers', 1, 5, 100).tolist() == [1, 2, 3, 4, 5]
+    with pytest.raises(ValueError, match='desconegut'):
+        valors_eix('preu', 1, 5, 10)
+
+
+def test_reduir_corba_conserva_tots_els_creuaments():
+    # Moltes més alternances de l'opció més econòmica que una quarta part del pressupost
+    x = np.arange(100_000)
+    series = {'job_cost_total': np.sin(x / 150.0) + x * 1e-6, 'all_purpose_cost_total': np.zeros(len(x)),
+              'job_temps_total_min': x / 10.0, 'all_purpose_temps_total_min': np.cos(x / 500.0)}
+    index, creua = reduir_corba(series, max_punts=300, max_creuaments=1000)
+    esperats = creuaments(series['job_cost_total'], series['all_purpose_cost_total'])
+    assert len(esperats) > 300 // 4
+    assert creua.tolist() == esperats.tolist()
+    assert np.isin(esperats, index).all() and np.isin(esperats + 1, index).all()
+    # L'envolupant de cada sèrie es manté
+    for valors in series.values():
+        assert valors[index].min() == valors.min() and valors[index].max() == valors.max()
+    assert index[0] == 0 and index[-1] == len(x) - 1 and (np.diff(index) > 0).all()
+
+
+def test_reduir_corba_limita_els_creuaments_conservats():
+    # Amb milers d'alternances només es conserven les primeres, però es compten totes
+    x = np.arange(100_000)
+    series = {'job_cost_total': np.sin(x / 5.0), 'all_purpose_cost_total': np.zeros(len(x)),
+              'job_temps_total_min': x / 10.0, 'all_purpose_temps_total_min': x / 20.0}
+    index, creua = reduir_corba(series, max_punts=300, max_creuaments=50)
+    esperats = creuaments(series['job_cost_total'], series['all_purpose_cost_total'])
+    assert len(esperats) > 5_000 and creua.tolist() == esperats.tolist()
+    assert len(index) <= 300 + 2 * 50
+    assert np.isin(esperats[:50], index).all() and np.isin(esperats[:50] + 1, index).all()
+
+
+def test_reduir_corba_amb_el_model():
+    eixos = [('nombre_tasques', valors_eix('nombre_tasques', 1, 20_000, 20_000))]
+    series = escombrar(CONFIG_JOB, dict(CONFIG_ALL_PURPOSE, nombre_workers=1), INSTANCIES, eixos)
+    index, creua = reduir_corba(series, max_punts=500)
+    esperats = creuaments(series['job_cost_total'], series['all_purpose_cost_total'])
+    assert len(esperats) and len(index) < 20_000
+    assert creua.tolist() == esperats.tolist() and np.isin(esperats + 1, index).all()
+    assert reduir_corba(series, max_punts=30_000)[0].tolist() == list(range(20_000))
+
+
+def test_reduir_graella_marca_les_fronteres():
+    diferencia = np.ones((100, 80))
+    diferencia[:, 37:] = -1
+    series = {'job_cost_total': diferencia, 'all_purpose_cost_total': np.zeros_like(diferencia)}
+    inicis_x, inicis_y, mitjanes, frontera = reduir_graella(series, max_x=10, max_y=8)
+    assert len(inicis_x) == 10 and len(inicis_y) == 8 and frontera.shape == (10, 8)
+    # Només la columna de cel·les que conté el canvi entre y = 36 i y = 37
+    assert frontera[:, 3].all() and frontera.sum() == 10
+    assert mitjanes['job_cost_total'][0, 0] == 1.0 and mitjanes['job_cost_total'][0, -1] == -1.0
@@ -0,0 +1,95 @@
+"""
+Taules de costos precalculades: consultes exactes per a qualsevol enter i cotes d'error de la interpolació.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from cost_model import INSTANCIES, calcular_escenaris
+from cost_tables import SORTIDES, TERMES, TaulaCostos, construir_taula
+
+VALORS = {
+    'startup_overhead_time': (0.0, 2.5, 10.0),
+    'temps_execucio_per_tasca_min': (0.5, 10.0, 60.0),
+}
+DRIVERS = ['DS4_V2', 'D8A_V4']
+WORKERS = ['D4A_V4', 'E4DS_V5']
+
+
+@pytest.fixture(scope='module', params=[True, False], ids=['float32', 'float64'])
+def taula(request, tmp_path_factory):
+    ruta = str(tmp_path_factory.mktemp('taules') / 'costos')
+    construir_taula(ruta, INSTANCIES, DRIVERS, WORKERS, VALORS, float32=request.param)
+    return TaulaCostos(ruta)
+
+
+def model(driver, worker, nombre_workers, max_parallel_tasks, nombre_tasques, temps, overhead):
+    resultats = calcular_escenaris({
+        'driver': [driver], 'worker': [worker], 'nombre_workers': [nombre_workers],
+        'max_parallel_tasks': [max_parallel_tasks], 'nombre_tasques': [nombre_tasques],
+        'temps_execucio_per_tasca_min': [temps], 'startup_overhead_time': [overhead],
+    }, INSTANCIES)
+    return {sortida: float(resultats[sortida][0]) for sortida in SORTIDES}
+
+
+def test_la_taula_es_carrega_amb_memoria_mapada(taula):
+    assert isinstance(taula.dades, np.memmap)
+    assert taula.dades.shape == (4, 3, 3, len(TERMES), len(SORTIDES))
+    assert taula.parelles() == [(d, w) for d in DRIVERS for w in WORKERS]
+
+
+def test_consultes_a_la_graella(taula):
+    # Punts de la graella i punts continus entre valors de la graella: la interpolació lineal és exacta
+    for temps, overhead in ((10.0, 2.5), (25.0, 7.0), (0.5, 0.0)):
+        resultat = taula.consultar('DS4_V2', 'D4A_V4', 4, 35, 100, temps, overhead)
+        esperat = model('DS4_V2', 'D4A_V4', 4, 35, 100, temps, overhead)
+        assert resultat['exacte'] == (temps in VALORS['temps_execucio_per_tasca_min'])
+        for sortida in SORTIDES:
+            assert resultat[sortida] == pytest.approx(esperat[sortida], rel=1e-6)
+            assert abs(resultat[sortida] - esperat[sortida]) <= resultat['cota_error'][sortida]
+            assert resultat['cota_error'][sortida] <= 1e-6 * abs(esperat[sortida]) + 1e-12
+
+
+@pytest.mark.parametrize('enters', [(7, 35, 150), (5, 30, 300), (13, 3, 9_999), (0, 1, 1), (100, 256, 123_457)])
+def test_enters_fora_de_qualsevol_graella_exactes(taula, enters):
+    # Els valors enters no s'interpolen: només hi ha l'arrodoniment dels coeficients desats
+    rtol = 1e-6 if taula.dades.dtype == np.float32 else 1e-12
+    for temps, overhead in ((10.0, 2.5), (60.0, 0.0)):
+        resultat = taula.consultar('D8A_V4', 'E4DS_V5', *enters, temps, overhead)
+        esperat = model('D8A_V4', 'E4DS_V5', *enters, temps, overhead)
+        assert resultat['exacte']
+        for sortida in SORTIDES:
+            assert resultat[sortida] == pytest.approx(esperat[sortida], rel=rtol)
+            assert resultat['cota_error'][sortida] <= rtol * abs(esperat[sortida]) + 1e-12
+
+
+def test_la_cota_d_error_conte_el_valor_real(taula):
+    rng = random.Random(0)
+    for _ in range(300):
+        consulta = (rng.choice(DRIVERS), rng.choice(WORKERS), rng.randint(0, 100), rng.randint(1, 300),
+                    rng.randint(1, 20_000), rng.uniform(0.5, 60.0), rng.uniform(0.0, 10.0))
+        resultat = taula.consultar(*consulta)
+        esperat = model(*consulta)
+        for sortida in SORTIDES:
+            assert abs(resultat[sortida] - esperat[sortida]) <= resultat['cota_error'][sortida] * (1 + 1e-9) + 1e-12
+
+
+def test_consultes_fora_de_la_taula(taula):
+    with pytest.raises(ValueError, match='max_parallel_tasks'):
+        taula.consultar('DS4_V2', 'D4A_V4', 9, 0, 10, 10.0, 2.5)
+    with pytest.raises(ValueError, match='nombre_workers'):
+        taula.consultar('DS4_V2', 'D4A_V4', 1.5, 4, 10, 10.0, 2.5)
+    with pytest.raises(ValueError, match='temps_execucio_per_tasca_min'):
+        taula.consultar('DS4_V2', 'D4A_V4', 2, 4, 10, 0.1, 2.5)
+    with pytest.raises(ValueError, match='parella'):
+        taula.consultar('D4A_V4', 'DS4_V2', 2, 4, 10, 10.0, 2.5)
+
+
+def test_eixos_no_valids(tmp_path):
+    with pytest.raises(ValueError, match='enters no són eixos'):
+        construir_taula(str(tmp_path / 'costos'), INSTANCIES, valors={'nombre_workers': (1, 2)})
+    with pytest.raises(ValueError, match='negatius'):
+        construir_taula(str(tmp_path / 'costos'), INSTANCIES, valors={'startup_overhead_time': (-1.0, 2.0)})
+    with pytest.raises(ValueError, match='desconeguda'):
+        construir_taula(str(tmp_path / 'costos'), INSTANCIES, drivers=['XX'])
@@ -0,0 +1,98 @@
+"""
+Catàleg de preus: consultes pels índexs, SKUs duplicats i noms repetits entre regions.
+"""
+import json
+import os
+
+import pytest
+
+from cluster_cost_batch import main as main_lots
+from cost_model import INSTANCIES
+from instance_catalog import PREU_SPOT, CatalegInstancies, carregar_cataleg, cataleg_per_defecte, _familia
+
+
+def sku(nom, region, cost, pricing='on_demand', vcpus=4):
+    return {'name': nom, 'vCPUs': vcpus, 'DBUs': 0.75, 'cost_per_hour': cost, 'RAM_GB': 16, 'region': region,
+            'pricing': pricing}
+
+
+@pytest.fixture
+def full_preus(tmp_path):
+    ruta = tmp_path / 'preus.json'
+    ruta.write_text(json.dumps({
+        'dbu_rates': {'job': 0.3, 'all_purpose': 0.55},
+        'photon_multiplier': 2.5,
+        'instances': [
+            sku('D4A_V4', 'westeurope', 0.22), sku('D8A_V4', 'westeurope', 0.44, vcpus=8),
+            sku('D4A_V4', 'northeurope', 0.20), sku('D4A_V4', 'westeurope', 0.05, PREU_SPOT),
+            sku('E4DS_V5', 'northeurope', 0.33),
+        ],
+    }), encoding='utf-8')
+    return str(ruta)
+
+
+def test_consultes_pels_indexs(full_preus):
+    cataleg = carregar_cataleg(full_preus)
+    assert len(cataleg) == 5
+    assert cataleg.regions_disponibles() == ['northeurope', 'westeurope']
+    assert cataleg.modalitats_disponibles() == ['on_demand', 'spot']
+    assert cataleg.families_disponibles() == ['DA_V4', 'EDS_V5']
+
+    assert cataleg.obtenir('D4A_V4', region='northeurope').cost_per_hour == 0.20
+    assert cataleg.obtenir('D4A_V4', region='westeurope', pricing=PREU_SPOT).cost_per_hour == 0.05
+    assert cataleg.obtenir('E4DS_V5').cost_per_hour == 0.33
+    with pytest.raises(KeyError, match='diverses regions'):
+        cataleg.obtenir('D4A_V4')
+    with pytest.raises(KeyError, match='desconeguda'):
+        cataleg.obtenir('D4A_V4', region='eastus')
+
+    assert [inst.name for inst in cataleg.instancies(region='westeurope')] == ['D4A_V4', 'D8A_V4']
+    assert [inst.cost_per_hour for inst in cataleg.instancies(family='DA_V4')] == [0.22, 0.44, 0.20]
+    assert [inst.cost_per_hour for inst in cataleg.instancies(family='DA_V4', pricing=None)] == [0.22, 0.44, 0.20, 0.05]
+    assert cataleg.cost_dbu(job=True) == 0.3 and cataleg.cost_dbu(job=False, photon=True) == 0.55 * 2.5
+
+
+def test_noms_repetits_entre_regions(full_preus, tmp_path, capsys):
+    cataleg = carregar_cataleg(full_preus)
+    with pytest.raises(ValueError, match='--regio'):
+        cataleg.instancies_per_nom()
+    assert [inst.name for inst in cataleg.instancies_per_nom(region='northeurope')] == ['D4A_V4', 'E4DS_V5']
+
+    entrada = tmp_path / 'execucions.csv'
+    entrada.write_text("driver,worker,nombre_workers,max_parallel_tasks,nombre_tasques,temps_execucio_per_tasca_min,"
+                       "startup_overhead_time\nD4A_V4,D4A_V4,2,8,100,10,2.5\n", encoding='utf-8')
+    sortida = str(tmp_path / 'resultats.csv')
+    assert main_lots([str(entrada), sortida, '--cataleg', full_preus]) == 1
+    assert '--regio' in capsys.readouterr().err
+    assert main_lots([str(entrada), sortida, '--cataleg', full_preus, '--regio', 'northeurope']) == 0
+
+
+def test_sku_duplicat_i_camps_absents(tmp_path):
+    with pytest.raises(ValueError, match='duplicat'):
+        CatalegInstancies([sku('D4A_V4', 'westeurope', 0.22), sku('D4A_V4', 'westeurope', 0.25)])
+    # El mateix nom en una altra modalitat no és un duplicat
+    assert len(CatalegInstancies([sku('D4A_V4', 'westeurope', 0.22), sku('D4A_V4', 'westeurope', 0.1, PREU_SPOT)])) == 2
+
+    ruta = tmp_path / 'preus.csv'
+    ruta.write_text("name,vCPUs,DBUs,cost_per_hour,RAM_GB\nD4A_V4,4,0.75,,16\n", encoding='utf-8')
+    with pytest.raises(ValueError, match='cost_per_hour'):
+        carregar_cataleg(str(ruta))
+
+
+def test_el_cataleg_es_recarrega_si_el_fitxer_canvia(tmp_path):
+    ruta = tmp_path / 'preus.csv'
+    ruta.write_text("name,vCPUs,DBUs,cost_per_hour,RAM_GB\nD4A_V4,4,0.75,0.22,16\n", encoding='utf-8')
+    primer = carregar_cataleg(str(ruta))
+    assert carregar_cataleg(str(ruta)) is primer
+    ruta.write_text("name,vCPUs,DBUs,cost_per_hour,RAM_GB\nD4A_V4,4,0.75,0.25,16\nD8A_V4,8,1.5,0.44,32\n",
+                    encoding='utf-8')
+    os.utime(ruta, ns=(0, os.stat(ruta).st_mtime_ns + 1_000_000))
+    segon = carregar_cataleg(str(ruta))
+    assert segon is not primer and segon.obtenir('D4A_V4').cost_per_hour == 0.25
+
+
+def test_cataleg_per_defecte():
+    cataleg = cataleg_per_defecte()
+    assert [(i.name, i.vCPUs, i.DBUs, i.cost_per_hour, i.RAM_GB) for i in cataleg.instancies_per_nom()] == [
+        (i.name, i.vCPUs, i.DBUs, i.cost_per_hour, i.RAM_GB) for i in INSTANCIES]
+    assert _familia('D4DS_V5') == 'DDS_V5' and _familia('DS4_V2') == 'DS_V2'
@@ -0,0 +1,138 @@
+"""
+API HTTP de preus, cridada directament com a aplicació ASGI.
+"""
+import asyncio
+import json
+import random
+
+import pytest
+
+from cost_model import INSTANCIES, COST_DBU_JOB, COST_DBU_ALL_PURPOSE, calcular_cost_job_cluster, calcular_cost_all_purpose
+from pricing_api import AppPreus, ErrorHTTP, LLINDAR_LOT
+
+ESCENARI = {'driver': 'DS4_V2', 'worker': 'D4A_V4', 'nombre_workers': 1, 'max_parallel_tasks': 35,
+            'nombre_tasques': 100, 'temps_execucio_per_tasca_min': 10.0, 'startup_overhead_time': 2.5}
+
+
+@pytest.fixture
+def app():
+    return AppPreus(INSTANCIES, COST_DBU_JOB, COST_DBU_ALL_PURPOSE)
+
+
+def cridar(app, metode, ruta, cos=b''):
+    async def executar():
+        missatges = []
+        entrada = [{'type': 'http.request', 'body': cos, 'more_body': False}]
+
+        async def receive():
+            return entrada.pop(0)
+
+        async def send(missatge):
+            missatges.append(missatge)
+
+        await app({'type': 'http', 'method': metode, 'path': ruta}, receive, send)
+        return missatges
+
+    inici, cos_resposta = asyncio.run(executar())
+    return inici['status'], cos_resposta['body']
+
+
+def preus(app, escenaris, **opcions):
+    estat, cos = cridar(app, 'POST', '/preus', json.dumps(dict(opcions, escenaris=escenaris)).encode())
+    assert estat == 200, cos
+    return json.loads(cos)['resultats']
+
+
+def test_instancies(app):
+    estat, cos = cridar(app, 'GET', '/instancies')
+    dades = json.loads(cos)
+    assert estat == 200
+    assert [inst['name'] for inst in dades['instancies']] == [inst.name for inst in INSTANCIES]
+    assert dades['cost_dbu_job'] == COST_DBU_JOB
+
+
+def test_preu_igual_al_model(app):
+    resultat, = preus(app, [ESCENARI])
+    driver, worker = INSTANCIES[0], INSTANCIES[1]
+    dbus = driver.DBUs + worker.DBUs
+    cost_tasca, _, _, temps_job, onades = calcular_cost_job_cluster(driver.cost_per_hour, worker.cost_per_hour, dbus,
+                                                                    COST_DBU_JOB, 2.5, 10.0, 35, 100)
+    cost_all_purpose = calcular_cost_all_purpose(driver.cost_per_hour, worker.cost_per_hour, dbus,
+                                                 COST_DBU_ALL_PURPOSE, 2.5 + 3 * 10.0)[0]
+    assert resultat['job_cost_total'] == 100 * cost_tasca
+    assert (resultat['job_temps_total_min'], resultat['job_nombre_onades']) == (temps_job, onades)
+    assert resultat['all_purpose_cost_total'] == cost_all_purpose
+    assert resultat['opcio_mes_economica'] == 'All-Purpose Cluster'
+
+    barat, = preus(app, [ESCENARI], cost_dbu_all_purpose=100.0)
+    assert barat['opcio_mes_economica'] == 'Job Cluster'
+
+
+def test_lot_igual_que_escalar():
+    # Els escenaris nous d'un lot gran es calculen amb el model vectoritzat; la resposta ha de ser idèntica
+    rng = random.Random(0)
+    escenaris = [dict(ESCENARI, driver=rng.choice(INSTANCIES).name, worker=rng.choice(INSTANCIES).name,
+                      nombre_workers=rng.randint(0, 40), max_parallel_tasks=rng.randint(1, 50),
+                      nombre_tasques=rng.randint(0, 1000), temps_execucio_per_tasca_min=rng.uniform(0, 60))
+                 for _ in range(4 * LLINDAR_LOT)]
+    lot = AppPreus(INSTANCIES, COST_DBU_JOB, COST_DBU_ALL_PURPOSE)
+    sols = AppPreus(INSTANCIES, COST_DBU_JOB, COST_DBU_ALL_PURPOSE)
+    estat, cos_lot = cridar(lot, 'POST', '/preus', json.dumps({'escenaris': escenaris}).encode())
+    assert estat == 200
+    assert json.loads(cos_lot)['resultats'] == [preus(sols, [escenari])[0] for escenari in escenaris]
+    assert cos_lot == cridar(sols, 'POST', '/preus', json.dumps({'escenaris': escenaris}).encode())[1]
+
+
+def test_cache_amb_entrades_normalitzades(app):
+    preus(app, [ESCENARI])
+    equivalent = dict(ESCENARI, driver=' ds4_v2', nombre_workers=1.0, temps_execucio_per_tasca_min=10)
+    preus(app, [equivalent, ESCENARI])
+    estadistiques = json.loads(cridar(app, 'GET', '/estadistiques')[1])
+    assert (estadistiques['encerts'], estadistiques['fallades'], estadistiques['entrades']) == (2, 1, 1)
+
+
+def test_cache_limitada():
+    app = AppPreus(INSTANCIES, COST_DBU_JOB, COST_DBU_ALL_PURPOSE, mida_cache=2)
+    escenaris = [dict(ESCENARI, nombre_tasques=n) for n in (1, 2, 3)]
+    assert [r['job_nombre_onades'] for r in preus(app, escenaris)] == [1, 1, 1]
+    assert len(app.cache) == 2
+    preus(app, [escenaris[0]])
+    assert app.cache.fallades == 4
+
+
+@pytest.mark.parametrize('cos, error', [
+    ({'escenaris': [dict(ESCENARI, driver='XYZ')]}, 'Instància desconeguda: XYZ'),
+    ({'escenaris': [{'driver': 'DS4_V2'}]}, 'Falten camps'),
+    ({'escenaris': [dict(ESCENARI, nombre_workers=1.5)]}, "'nombre_workers' ha de ser un enter"),
+    ({'escenaris': [dict(ESCENARI, max_parallel_tasks=0)]}, "'max_parallel_tasks' ha de ser un enter entre 1"),
+    ({'escenaris': [dict(ESCENARI, nombre_workers=2 ** 53 + 1)]}, "'nombre_workers' ha de ser un enter entre 0"),
+    ({'escenaris': [dict(ESCENARI, max_parallel_tasks=1e300)]}, "'max_parallel_tasks' ha de ser un enter entre 1"),
+    ({'escenaris': [dict(ESCENARI, startup_overhead_time='2')]}, "'startup_overhead_time' ha de ser un nombre"),
+    ({'escenari': []}, "llista 'escenaris'"),
+])
+def test_errors_de_validacio(app, cos, error):
+    estat, resposta = cridar(app, 'POST', '/preus', json.dumps(cos).encode())
+    assert estat == 400
+    assert error in json.loads(resposta)['error']
+
+
+@pytest.mark.parametrize('cos, error', [
+    ({'escenaris': [dict(ESCENARI, nombre_tasques=10 ** 400)]}, "'nombre_tasques' ha de ser un enter entre 0"),
+    ({'escenaris': [dict(ESCENARI, temps_execucio_per_tasca_min=10 ** 400)]},
+     "'temps_execucio_per_tasca_min' és massa gran"),
+    ({'escenaris': [ESCENARI], 'cost_dbu_job': 10 ** 400}, "'cost_dbu_job' és massa gran"),
+])
+def test_enters_massa_grans(app, cos, error):
+    # El mòdul json els llegeix com a enters de Python; orjson ja els rebutja com a JSON no vàlid
+    with pytest.raises(ErrorHTTP, match=error) as excepcio:
+        app.preus(json.loads(json.dumps(cos)))
+    assert excepcio.value.estat == 400
+    assert cridar(app, 'POST', '/preus', json.dumps(cos).encode())[0] == 400
+
+
+def test_errors_http(app):
+    assert cridar(app, 'POST', '/preus', b'{no json')[0] == 400
+    assert cridar(app, 'GET', '/preus')[0] == 405
+    assert cridar(app, 'POST', '/instancies')[0] == 405
+    assert cridar(app, 'GET', '/desconeguda')[0] == 404
+    assert cridar(app, 'GET', '/salut') == (200, b'{"estat":"ok"}')
@@ -0,0 +1,147 @@
+"""
+Instrumentació de seccions: temps, memòria, reruns i exportació en format Prometheus.
+"""
+import threading
+import time
+
+import pytest
+
+import stage_cache
+from stage_cache import (
+    configurar_instrumentacio, escriure_metriques, estadistiques_seccions, iniciar_execucio, metriques_prometheus,
+    reiniciar_estadistiques, reruns, seccio, seccions_actuals,
+)
+
+
+@pytest.fixture(autouse=True)
+def estat_net():
+    reiniciar_estadistiques()
+    yield
+    configurar_instrumentacio('')
+    reiniciar_estadistiques()
+
+
+def test_desactivada_no_registra_res():
+    configurar_instrumentacio('')
+    iniciar_execucio('sessio')
+
+    @seccio("decorada")
+    def funcio():
+        return 42
+
+    with seccio("context"):
+        assert funcio() == 42
+    assert seccions_actuals() == []
+    assert estadistiques_seccions() == {}
+    assert reruns() == (0, 0)
+
+
+def test_seccions_imbricades_i_reruns():
+    configurar_instrumentacio('temps')
+    iniciar_execucio('a')
+    iniciar_execucio('a')
+    iniciar_execucio('b')
+
+    decorada = seccio("interior")
+
+    @decorada
+    def funcio():
+        return 'ok'
+
+    with seccio("exterior"):
+        assert funcio() == 'ok'
+        assert funcio() == 'ok'
+    seccions = seccions_actuals()
+    assert [(nom, nivell) for nom, nivell, _, _, _ in seccions] == [('interior', 1), ('interior', 1), ('exterior', 0)]
+    assert all(durada >= 0 and memoria is None for _, _, durada, memoria, _ in seccions)
+    acumulat = estadistiques_seccions()
+    assert acumulat['interior']['execucions'] == 2
+    assert acumulat['exterior']['temps_total'] >= acumulat['interior']['temps_maxim']
+    assert reruns('a') == 2 and reruns() == (3, 2)
+
+
+def test_memoria_amb_tracemalloc():
+    configurar_instrumentacio('memoria')
+    iniciar_execucio()
+    with seccio("exterior"):
+        with seccio("temporal"):
+            temporal = bytearray(4_000_000)
+            del temporal
+        conservat = bytearray(1_000_000)
+    seccions = {nom: (neta, pic) for nom, _, _, neta, pic in seccions_actuals()}
+    assert seccions['temporal'][0] < 100_000 <= 4_000_000 <= seccions['temporal'][1]
+    # El pic de la secció exterior inclou el de la interior
+    assert seccions['exterior'][0] >= 1_000_000 and seccions['exterior'][1] >= 4_000_000
+    del conservat
+
+
+def test_seccions_de_memoria_de_fils_diferents_no_se_solapen():
+    configurar_instrumentacio('memoria')
+    resultats = {}
+    dins_a = threading.Event()
+
+    def sessio_a():
+        iniciar_execucio('a')
+        with seccio("a"):
+            dins_a.set()
+            time.sleep(0.2)
+            temporal = bytearray(4_000_000)
+            del temporal
+        resultats['a'] = seccions_actuals()
+
+    def sessio_b():
+        iniciar_execucio('b')
+        dins_a.wait()
+        with seccio("b"):
+            # Sense serialitzar, el pic d'aquesta secció inclouria els 4 MB de la secció de l'altre fil
+            time.sleep(0.4)
+        resultats['b'] = seccions_actuals()
+
+    fils = [threading.Thread(target=sessio_a), threading.Thread(target=sessio_b)]
+    for fil in fils:
+        fil.start()
+    for fil in fils:
+        fil.join()
+    (_, _, _, _, pic_a), = resultats['a']
+    (_, _, _, _, pic_b), = resultats['b']
+    assert pic_a >= 4_000_000 and pic_b < 1_000_000
+    assert stage_cache._bloqueig_memoria.acquire(blocking=False)
+    stage_cache._bloqueig_memoria.release()
+
+
+def test_reruns_amb_sessions_limitades(monkeypatch):
+    monkeypatch.setattr(stage_cache, 'MAX_SESSIONS_REGISTRADES', 3)
+    configurar_instrumentacio('temps')
+    for sessio in ('a', 'b', 'c', 'a', 'd'):
+        iniciar_execucio(sessio)
+    # 'b' és la que fa més temps que no s'executa
+    assert [reruns(sessio) for sessio in 'abcd'] == [2, 0, 1, 1]
+    assert reruns() == (5, 3)
+
+
+def test_mode_desconegut(monkeypatch):
+    with pytest.raises(ValueError, match='desconegut'):
+        configurar_instrumentacio('tot')
+    monkeypatch.setenv('CLUSTER_COST_INSTRUMENTACIO', '1')
+    configurar_instrumentacio()
+    assert stage_cache.instrumentacio_activa()
+
+
+def test_metriques_prometheus(tmp_path):
+    configurar_instrumentacio('temps')
+    iniciar_execucio('a')
+    with seccio('Gràfics "Altair"'):
+        pass
+    text = metriques_prometheus()
+    assert '# TYPE cluster_cost_seccio_segons_total counter' in text
+    assert 'cluster_cost_seccio_execucions_total{seccio="Gràfics \\"Altair\\""} 1' in text
+    assert 'cluster_cost_reruns_total 1' in text
+    assert 'cluster_cost_sessions 1' in text
+    assert 'memoria' not in text
+    for linia in text.splitlines():
+        assert linia.startswith('#') or len(linia.rsplit(' ', 1)) == 2
+
+    ruta = tmp_path / 'metriques.prom'
+    escriure_metriques(str(ruta))
+    assert ruta.read_text(encoding='utf-8') == text
+    assert [fitxer.name for fitxer in tmp_path.iterdir()] == ['metriques.prom']
@@ -0,0 +1,207 @@
+"""
+Conciliació d'exportacions de system.billing.usage amb el model de costos.
+"""
+import pandas as pd
+import pytest
+
+import usage_ingestion
+from cost_model import INSTANCIES, COST_DBU_JOB, COST_DBU_ALL_PURPOSE, calcular_cost_job_cluster, calcular_cost_all_purpose
+from usage_ingestion import (
+    conciliar_fitxer, llegir_configuracio_clusters, main, normalitzar_node_type, tipus_sku, resoldre_columnes,
+)
+
+INSTANCIA = {inst.name: inst for inst in INSTANCIES}
+
+REGISTRES = [
+    # Job Cluster amb 2 workers D4A_V4 i driver DS4_V2: una hora i mitja hora, una amb import facturat
+    {'usage_metadata.cluster_id': 'c1', 'usage_metadata.job_id': 'j1', 'sku_name': 'PREMIUM_JOBS_COMPUTE',
+     'usage_start_time': '2026-01-01T10:00:00Z', 'usage_end_time': '2026-01-01T11:00:00Z', 'usage_unit': 'DBU',
+     'usage_quantity': 3.0, 'node_type': 'Standard_D4a_v4', 'driver_node_type': 'Standard_DS4_v2',
+     'num_workers': 2, 'cost': 1.0},
+    {'usage_metadata.cluster_id': 'c1', 'usage_metadata.job_id': 'j1', 'sku_name': 'PREMIUM_JOBS_COMPUTE',
+     'usage_start_time': '2026-01-01T11:00:00Z', 'usage_end_time': '2026-01-01T11:30:00Z', 'usage_unit': 'DBU',
+     'usage_quantity': 1.5, 'node_type': 'Standard_D4a_v4', 'driver_node_type': 'Standard_DS4_v2',
+     'num_workers': 2, 'cost': None},
+    # All-Purpose sense nombre de workers (és a la configuració dels clústers): 2 hores amb 3 workers E4DS_V5
+    {'usage_metadata.cluster_id': 'c2', 'usage_metadata.job_id': None, 'sku_name': 'PREMIUM_ALL_PURPOSE_COMPUTE',
+     'usage_start_time': '2026-01-02T08:00:00Z', 'usage_end_time': '2026-01-02T10:00:00Z', 'usage_unit': 'DBU',
+     'usage_quantity': 12.0, 'node_type': 'Standard_E4ds_v5', 'driver_node_type': None, 'num_workers': None,
+     'cost': None},
+    # Registres que no es modelen: SQL, tipus de node desconegut i sense clúster
+    {'usage_metadata.cluster_id': None, 'usage_metadata.job_id': None, 'sku_name': 'PREMIUM_SQL_COMPUTE',
+     'usage_start_time': '2026-01-02T08:00:00Z', 'usage_end_time': '2026-01-02T09:00:00Z', 'usage_unit': 'DBU',
+     'usage_quantity': 5.0, 'node_type': None, 'driver_node_type': None, 'num_workers': None, 'cost': None},
+    {'usage_metadata.cluster_id': 'c3', 'usage_metadata.job_id': 'j2', 'sku_name': 'PREMIUM_JOBS_COMPUTE',
+     'usage_start_time': '2026-01-02T08:00:00Z', 'usage_end_time': '2026-01-02T09:00:00Z', 'usage_unit': 'DBU',
+     'usage_quantity': 5.0, 'node_type': 'Standard_F8s', 'driver_node_type': None, 'num_workers': 1, 'cost': None},
+    {'usage_metadata.cluster_id': None, 'usage_metadata.job_id': None, 'sku_name': 'PREMIUM_JOBS_COMPUTE',
+     'usage_start_time': '2026-01-02T08:00:00Z', 'usage_end_time': '2026-01-02T09:00:00Z', 'usage_unit': 'DBU',
+     'usage_quantity': 5.0, 'node_type': 'Standard_D4a_v4', 'driver_node_type': None, 'num_workers': 1,
+     'cost': None},
+]
+
+
+@pytest.fixture
+def exportacio(tmp_path):
+    ruta = tmp_path / 'usage.csv'
+    pd.DataFrame(REGISTRES).to_csv(ruta, index=False)
+    return str(ruta)
+
+
+def test_normalitzar_i_tipus_sku():
+    assert normalitzar_node_type('Standard_D4a_v4') == 'D4A_V4'
+    assert normalitzar_node_type(' e4ds_v5 ') == 'E4DS_V5'
+    assert tipus_sku('PREMIUM_JOBS_COMPUTE_(PHOTON)') == 'Job Cluster'
+    assert tipus_sku('STANDARD_ALL_PURPOSE_COMPUTE') == 'All-Purpose Cluster'
+    assert tipus_sku('PREMIUM_JOBS_SERVERLESS_COMPUTE_EU_WEST') is None
+    assert tipus_sku('PREMIUM_SQL_PRO_COMPUTE') is None
+
+
+def test_columnes_obligatories():
+    with pytest.raises(ValueError, match='usage_quantity'):
+        resoldre_columnes(['cluster_id', 'sku_name', 'usage_start_time', 'usage_end_time', 'node_type'])
+
+
+def test_valors_del_model(exportacio):
+    clusters, jobs, resum = conciliar_fitxer(exportacio, INSTANCIES)
+    assert resum['registres_llegits'] == 6
+    assert resum['registres_modelats'] == 2
+    assert resum['registres_sense_workers'] == 1
+    assert resum['registres_altres_sku'] == 1
+    assert resum['registres_sense_cluster'] == 1
+    assert resum['registres_sense_instancia'] == 1
+    assert resum['node_types_desconeguts'] == ['Standard_F8s']
+
+    clusters = clusters.set_index('cluster_id')
+    driver, worker = INSTANCIA['DS4_V2'], INSTANCIA['D4A_V4']
+    dbus = driver.DBUs + 2 * worker.DBUs
+    cost_vm, cost_dbu = 0.0, 0.0
+    for minuts in (60, 30):
+        _, vm, dbu, _, _ = calcular_cost_job_cluster(driver.cost_per_hour, 2 * worker.cost_per_hour, dbus,
+                                                     COST_DBU_JOB, 0, minuts, 1, 1)
+        cost_vm += vm
+        cost_dbu += dbu
+    job = clusters.loc['c1']
+    assert job['tipus'] == 'Job Cluster'
+    assert job['registres'] == 2
+    assert job['minuts'] == 90
+    assert job['dbus_model'] == pytest.approx(dbus * 1.5)
+    assert job['cost_vm_model'] == pytest.approx(cost_vm)
+    assert job['cost_dbu_model'] == pytest.approx(cost_dbu)
+    assert job['cost_facturat'] == pytest.approx(1.0 + 1.5 * COST_DBU_JOB)
+    assert job['variacio_cost'] == pytest.approx(cost_dbu - job['cost_facturat'])
+
+    # Sense configuració, la mida del clúster c2 no es coneix: ni model ni variació
+    all_purpose = clusters.loc['c2']
+    assert all_purpose['registres_sense_workers'] == 1 and all_purpose['dbus_facturades'] == 12
+    assert all_purpose[['dbus_model', 'cost_total_model', 'variacio_dbus', 'variacio_cost']].isna().all()
+
+    assert list(jobs['job_id']) == ['j1']
+    assert jobs.loc[0, 'execucions'] == 1
+    assert jobs.loc[0, 'cost_dbu_model'] == pytest.approx(cost_dbu)
+
+
+def test_configuracio_dels_clusters(exportacio, tmp_path):
+    # Com a system.compute.clusters: una fila per canvi, i la darrera és la que val
+    ruta = tmp_path / 'clusters.csv'
+    pd.DataFrame({'cluster_id': ['c2', 'c2', 'c1'], 'worker_count': [3, 5, 9],
+                  'change_time': ['2026-01-01T00:00:00Z', '2025-12-01T00:00:00Z', '2026-01-01T00:00:00Z'],
+                  'driver_node_type': [None, None, 'Standard_D8a_v4']}).to_csv(ruta, index=False)
+    configuracio = llegir_configuracio_clusters(str(ruta))
+    assert configuracio.loc['c2', 'num_workers'] == 3
+
+    clusters, _, resum = conciliar_fitxer(exportacio, INSTANCIES, configuracio=configuracio)
+    assert resum['registres_modelats'] == 3 and resum['registres_sense_workers'] == 0
+    clusters = clusters.set_index('cluster_id')
+    # Les dades de l'exportació d'ús tenen prioritat sobre la configuració
+    assert clusters.loc['c1', 'nombre_workers'] == 2 and clusters.loc['c1', 'driver'] == 'DS4_V2'
+
+    worker = INSTANCIA['E4DS_V5']
+    all_purpose = clusters.loc['c2']
+    assert all_purpose['nombre_workers'] == 3
+    cost_total, cost_dbu_hora, cost_vm_hora, _ = calcular_cost_all_purpose(
+        worker.cost_per_hour, 3 * worker.cost_per_hour, 4 * worker.DBUs, COST_DBU_ALL_PURPOSE, 120)
+    assert all_purpose['cost_total_model'] == pytest.approx(cost_total)
+    assert all_purpose['cost_dbu_model'] == pytest.approx(2 * cost_dbu_hora)
+    assert all_purpose['variacio_dbus'] == pytest.approx(0)
+
+    sortida = tmp_path / 'variacio.csv'
+    assert main([exportacio, str(sortida), '--clusters', str(ruta)]) == 0
+    assert pd.read_csv(sortida)['variacio_dbus'].notna().all()
+    pd.DataFrame({'cluster_id': ['c2']}).to_csv(ruta, index=False)
+    with pytest.raises(ValueError, match='num_workers'):
+        llegir_configuracio_clusters(str(ruta))
+
+
+def test_blocs_i_processos_equivalents(exportacio, monkeypatch):
+    esperat, _, _ = conciliar_fitxer(exportacio, INSTANCIES)
+    monkeypatch.setattr(usage_ingestion, 'MAX_FILES_PARCIALS', 1)
+    clusters, _, resum = conciliar_fitxer(exportacio, INSTANCIES, mida_bloc=1, processos=2)
+    assert resum['registres_modelats'] == 2
+    pd.testing.assert_frame_equal(clusters.set_index('cluster_id').sort_index(),
+                                  esperat.set_index('cluster_id').sort_index(), check_like=True)
+
+
+def test_parquet_niat(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+    registre = REGISTRES[0]
+    taula = pa.table({
+        'usage_metadata': pa.array([{'cluster_id': 'c1', 'job_id': 'j1', 'node_type': registre['node_type']}]),
+        'sku_name': [registre['sku_name']],
+        'usage_start_time': pa.array([pd.Timestamp(registre['usage_start_time'])]),
+        'usage_end_time': pa.array([pd.Timestamp(registre['usage_end_time'])]),
+        'usage_quantity': [registre['usage_quantity']],
+        'driver_node_type': [registre['driver_node_type']],
+        'num_workers': [2],
+    })
+    ruta = str(tmp_path / 'usage.parquet')
+    pq.write_table(taula, ruta)
+    clusters, jobs, _ = conciliar_fitxer(ruta, INSTANCIES)
+    assert list(clusters['cluster_id']) == ['c1']
+    assert list(jobs['job_id']) == ['j1']
+    assert clusters.loc[0, 'minuts'] == 60
+
+
+def test_cluster_compartit_entre_jobs(tmp_path, monkeypatch):
+    # Tres jobs al mateix All-Purpose i un d'ells també en un Job Cluster propi
+    base = dict(REGISTRES[0], sku_name='PREMIUM_ALL_PURPOSE_COMPUTE', cost=None)
+    registres = [dict(base, **{'usage_metadata.cluster_id': 'ap1', 'usage_metadata.job_id': job})
+                 for job in ('ja', 'jb', 'jc', 'ja')]
+    registres.append(dict(REGISTRES[0], **{'usage_metadata.job_id': 'jb', 'cost': None}))
+    ruta = tmp_path / 'usage.csv'
+    pd.DataFrame(registres).to_csv(ruta, index=False)
+
+    monkeypatch.setattr(usage_ingestion, 'MAX_FILES_PARCIALS', 1)
+    for mida_bloc in (1, 100):
+        clusters, jobs, resum = conciliar_fitxer(str(ruta), INSTANCIES, mida_bloc=mida_bloc)
+        assert resum['registres_modelats'] == 5
+        clusters, jobs = clusters.set_index('cluster_id'), jobs.set_index('job_id')
+        assert sorted(jobs.index) == ['ja', 'jb', 'jc']
+        assert clusters.loc['ap1', 'registres'] == 4 and clusters.loc['ap1', 'nombre_jobs'] == 3
+        assert jobs.loc['ja', 'registres'] == 2 and jobs.loc['ja', 'minuts'] == 120
+        assert jobs.loc['jb', 'execucions'] == 2 and jobs.loc['jc', 'execucions'] == 1
+        assert jobs['cost_total_model'].sum() == pytest.approx(clusters['cost_total_model'].sum())
+
+
+def test_finestra_compartida_es_reparteix(tmp_path, monkeypatch):
+    # Dos jobs a la mateixa finestra d'un All-Purpose: el clúster es modela un sol cop i es reparteix segons les DBUs
+    base = dict(REGISTRES[0], sku_name='PREMIUM_ALL_PURPOSE_COMPUTE', cost=None)
+    registres = [dict(base, **{'usage_metadata.cluster_id': 'ap1', 'usage_metadata.job_id': job, 'usage_quantity': q})
+                 for job, q in (('ja', 1.0), ('jb', 3.0))]
+    ruta = tmp_path / 'usage.csv'
+    pd.DataFrame(registres).to_csv(ruta, index=False)
+    driver, worker = INSTANCIA['DS4_V2'], INSTANCIA['D4A_V4']
+    # En una hora, el cost per hora de les DBUs i de les VM és el de la finestra
+    cost_total, cost_dbu, cost_vm, _ = calcular_cost_all_purpose(
+        driver.cost_per_hour, 2 * worker.cost_per_hour, driver.DBUs + 2 * worker.DBUs, COST_DBU_ALL_PURPOSE, 60)
+
+    monkeypatch.setattr(usage_ingestion, 'MAX_FILES_PARCIALS', 1)
+    for mida_bloc in (1, 100):
+        clusters, jobs, _ = conciliar_fitxer(str(ruta), INSTANCIES, mida_bloc=mida_bloc)
+        clusters, jobs = clusters.set_index('cluster_id'), jobs.set_index('job_id')
+        assert clusters.loc['ap1', 'cost_total_model'] == pytest.approx(cost_total)
+        assert clusters.loc['ap1', 'cost_dbu_model'] == pytest.approx(cost_dbu)
+        assert clusters.loc['ap1', 'dbus_model'] == pytest.approx(driver.DBUs + 2 * worker.DBUs)
+        assert jobs.loc['ja', 'cost_total_model'] == pytest.approx(cost_total / 4)
+        assert jobs.loc['jb', 'cost_vm_model'] == pytest.approx(3 * cost_vm / 4)
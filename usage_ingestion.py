@@ -0,0 +1,537 @@
+"""
+Conciliació del model de costos amb l'ús real facturat per Databricks.
+
+Llegeix exportacions locals de la taula `system.billing.usage` (CSV o Parquet, de qualsevol mida) per blocs i només
+amb les columnes necessàries, assigna el tipus de node de cada registre a una instància del catàleg i hi recalcula
+el cost del model amb les versions vectoritzades de `calcular_cost_job_cluster` i `calcular_cost_all_purpose`.
+Cada bloc es redueix a sumes parcials per clúster i job (en diversos processos si cal) i les sumes es combinen a
+mesura que arriben, de manera que la memòria depèn del nombre de clústers i jobs (i de finestres facturades dels
+All-Purpose, que es reparteixen entre els jobs que les comparteixen) i no de la mida de l'exportació.
+
+El resultat és la variació entre el cost modelat i el facturat per clúster i per job. Databricks només factura
+les DBUs: la comparació es fa amb el cost de les DBUs, i el cost de les VM modelat es mostra a part.
+
+Ús:
+    python usage_ingestion.py usage.parquet variacio_clusters.csv --jobs variacio_jobs.csv
+    python usage_ingestion.py usage.csv variacio_clusters.parquet --clusters clusters.parquet --processos 4
+    python usage_ingestion.py usage.csv variacio_clusters.csv --cataleg preus.json --regio westeurope
+
+Columnes d'entrada (s'accepten els noms aplanats de `usage_metadata` i `product_features`):
+cluster_id, sku_name, usage_start_time, usage_end_time, usage_quantity i node_type són obligatòries; job_id,
+driver_node_type, num_workers, usage_unit, cost (import facturat de les DBUs) i is_photon són opcionals.
+
+La mida del clúster no es dedueix mai de les DBUs facturades (la variació seria zero per construcció): quan
+l'exportació no porta num_workers, es pren d'una exportació de la configuració dels clústers (`--clusters`, p. ex.
+`system.compute.clusters`, amb cluster_id, worker_count o num_workers i, opcionalment, els tipus de node). Els
+registres que continuen sense nombre de workers no es modelen i els clústers i jobs que en tenen queden sense
+variació.
+"""
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cost_model import (
+    COST_DBU_JOB, COST_DBU_ALL_PURPOSE, TIPUS_JOB, TIPUS_ALL_PURPOSE,
+    calcular_cost_job_cluster_lot, calcular_cost_all_purpose_lot,
+)
+from instance_catalog import PREU_ON_DEMAND, MULTIPLICADOR_PHOTON_PER_DEFECTE, carregar_cataleg
+
+# Noms possibles de cada columna a l'exportació, per ordre de preferència
+ALIES_COLUMNES = {
+    'cluster_id': ('cluster_id', 'usage_metadata.cluster_id'),
+    'job_id': ('job_id', 'usage_metadata.job_id'),
+    'sku_name': ('sku_name',),
+    'usage_start_time': ('usage_start_time',),
+    'usage_end_time': ('usage_end_time',),
+    'usage_quantity': ('usage_quantity',),
+    'usage_unit': ('usage_unit',),
+    'node_type': ('node_type', 'worker_node_type', 'usage_metadata.node_type'),
+    'driver_node_type': ('driver_node_type', 'usage_metadata.driver_node_type'),
+    'num_workers': ('num_workers',),
+    'cost': ('cost', 'billed_cost', 'list_cost'),
+    'is_photon': ('is_photon', 'product_features.is_photon'),
+}
+COLUMNES_OBLIGATORIES = ('cluster_id', 'sku_name', 'usage_start_time', 'usage_end_time', 'usage_quantity',
+                         'node_type')
+_COLUMNES_TEXT = ('cluster_id', 'job_id', 'sku_name', 'usage_unit', 'node_type', 'driver_node_type')
+# Noms possibles de cada columna a l'exportació de la configuració dels clústers
+ALIES_CONFIGURACIO = {
+    'cluster_id': ('cluster_id',),
+    'num_workers': ('num_workers', 'worker_count'),
+    'node_type': ('node_type', 'worker_node_type'),
+    'driver_node_type': ('driver_node_type',),
+}
+
+MIDA_BLOC_PER_DEFECTE = 500_000
+# Quan les sumes parcials pendents superen aquestes files, es combinen en una sola taula
+MAX_FILES_PARCIALS = 1_000_000
+
+_SUMES = ('minuts', 'dbus_facturades', 'cost_facturat', 'dbus_model', 'cost_dbu_model', 'cost_vm_model',
+          'cost_total_model')
+_CLAUS = ['cluster_id', 'job_id']
+_MODEL = ('dbus_model', 'cost_dbu_model', 'cost_vm_model', 'cost_total_model')
+_AGREGACIO = dict(
+    {'tipus': 'first', 'driver': 'first', 'worker': 'first', 'nombre_workers': 'max',
+     'registres': 'sum', 'registres_sense_workers': 'sum', 'inici': 'min', 'final': 'max'},
+    **{columna: 'sum' for columna in _SUMES})
+# Finestres facturades dels All-Purpose: el model de cada finestra es reparteix entre els seus registres
+_CLAUS_FINESTRA = ['cluster_id', 'job_id', 'inici', 'final']
+_AGREGACIO_FINESTRA = dict({'dbus_facturades': 'sum'}, **{columna: 'max' for columna in _MODEL})
+_RESUM_BUIT = {'registres_llegits': 0, 'registres_modelats': 0, 'registres_altres_sku': 0,
+               'registres_sense_cluster': 0, 'registres_sense_instancia': 0, 'registres_sense_workers': 0}
+
+
+def normalitzar_node_type(node_type):
+    """
+    Converteix un tipus de node de Databricks en un nom del catàleg (p. ex. 'Standard_D4a_v4' -> 'D4A_V4').
+    """
+    nom = str(node_type).strip()
+    if nom.lower().startswith('standard_'):
+        nom = nom[len('standard_'):]
+    return nom.upper()
+
+
+def tipus_sku(sku_name):
+    """
+    Tipus de clúster d'un SKU de facturació, o None si no és un SKU de càlcul de clústers (SQL, DLT, serverless...).
+    """
+    sku = str(sku_name).upper()
+    if 'SERVERLESS' in sku:
+        return None
+    if 'ALL_PURPOSE' in sku:
+        return TIPUS_ALL_PURPOSE
+    if 'JOBS' in sku:
+        return TIPUS_JOB
+    return None
+
+
+def resoldre_columnes(disponibles):
+    """
+    Retorna {columna canònica: nom a l'exportació} per a les columnes presents. Falla si en falta cap d'obligatòria.
+    """
+    disponibles = set(disponibles)
+    columnes = {}
+    for canonica, alies in ALIES_COLUMNES.items():
+        for nom in alies:
+            if nom in disponibles:
+                columnes[canonica] = nom
+                break
+    absents = [columna for columna in COLUMNES_OBLIGATORIES if columna not in columnes]
+    if absents:
+        raise ValueError(f"Falten columnes a l'exportació d'ús: {', '.join(absents)}")
+    return columnes
+
+
+def _noms_aplanats(esquema, prefix=''):
+    import pyarrow as pa
+    noms = []
+    for camp in esquema:
+        if pa.types.is_struct(camp.type):
+            noms.extend(_noms_aplanats(camp.type, f"{prefix}{camp.name}."))
+        else:
+            noms.append(prefix + camp.name)
+    return noms
+
+
+def llegir_blocs(ruta, mida_bloc=MIDA_BLOC_PER_DEFECTE):
+    """
+    Llegeix una exportació d'ús per blocs, només amb les columnes necessàries i amb els noms canònics.
+
+    Els fitxers Parquet es llegeixen amb memory-mapping i per columnes; les columnes niades (p. ex.
+    `usage_metadata.cluster_id`) s'aplanen.
+    """
+    if os.path.splitext(ruta)[1].lower() in ('.parquet', '.pq'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        fitxer = pq.ParquetFile(ruta, memory_map=True)
+        columnes = resoldre_columnes(_noms_aplanats(fitxer.schema_arrow))
+        arrels = list(dict.fromkeys(nom.split('.')[0] for nom in columnes.values()))
+        for lot in fitxer.iter_batches(batch_size=mida_bloc, columns=arrels):
+            taula = pa.Table.from_batches([lot])
+            while any(pa.types.is_struct(camp.type) for camp in taula.schema):
+                taula = taula.flatten()
+            bloc = taula.select(list(columnes.values())).to_pandas()
+            yield bloc.rename(columns={nom: canonica for canonica, nom in columnes.items()})
+    else:
+        columnes = resoldre_columnes(pd.read_csv(ruta, nrows=0).columns)
+        tipus = {nom: str for canonica, nom in columnes.items() if canonica in _COLUMNES_TEXT}
+        for bloc in pd.read_csv(ruta, usecols=list(columnes.values()), dtype=tipus, chunksize=mida_bloc):
+            yield bloc.rename(columns={nom: canonica for canonica, nom in columnes.items()})
+
+
+def llegir_configuracio_clusters(ruta):
+    """
+    Llegeix una exportació de la configuració dels clústers (CSV o Parquet) i retorna una taula indexada per
+    cluster_id amb num_workers i, si hi són, node_type i driver_node_type.
+
+    Si un clúster hi apareix més d'una vegada (com a `system.compute.clusters`, una fila per canvi), es fa servir
+    la darrera configuració segons `change_time`, o la darrera fila si no hi ha aquesta columna.
+    """
+    if os.path.splitext(ruta)[1].lower() in ('.parquet', '.pq'):
+        taula = pd.read_parquet(ruta)
+    else:
+        taula = pd.read_csv(ruta, dtype={'cluster_id': str})
+    columnes = {}
+    for canonica, alies in ALIES_CONFIGURACIO.items():
+        for nom in alies:
+            if nom in taula:
+                columnes[canonica] = nom
+                break
+    absents = [columna for columna in ('cluster_id', 'num_workers') if columna not in columnes]
+    if absents:
+        raise ValueError(f"Falten columnes a la configuració dels clústers: {', '.join(absents)}")
+    if 'change_time' in taula:
+        taula = taula.sort_values('change_time', kind='stable')
+    taula = taula[list(columnes.values())].rename(columns={nom: canonica for canonica, nom in columnes.items()})
+    taula['num_workers'] = pd.to_numeric(taula['num_workers'])
+    return taula.dropna(subset=['cluster_id']).drop_duplicates('cluster_id', keep='last').set_index('cluster_id')
+
+
+def _completar_amb_configuracio(bloc, configuracio):
+    """
+    Omple les columnes buides (o absents) del bloc amb la configuració del seu clúster.
+    """
+    bloc = bloc.copy()
+    for columna in configuracio.columns:
+        valors = bloc['cluster_id'].map(configuracio[columna])
+        bloc[columna] = bloc[columna].fillna(valors) if columna in bloc else valors
+    return bloc
+
+
+def _index_cataleg(instancies):
+    """
+    Índex {nom normalitzat: posició} de les instàncies i arrays amb el cost per hora i les DBUs de cadascuna.
+    """
+    index = {normalitzar_node_type(inst.name): i for i, inst in enumerate(instancies)}
+    if len(index) < len(instancies):
+        raise ValueError("Hi ha noms d'instància repetits: no es pot saber a quina instància es refereix cada nom")
+    costos = np.array([inst.cost_per_hour for inst in instancies], dtype=np.float64)
+    dbus = np.array([inst.DBUs for inst in instancies], dtype=np.float64)
+    return index, costos, dbus
+
+
+def _mapar_valors(columna, funcio):
+    """
+    Aplica `funcio` a cada valor diferent (no nul) de la columna una sola vegada i en reparteix el resultat.
+    """
+    return columna.map({valor: funcio(valor) for valor in columna.dropna().unique()})
+
+
+def _posicions(columna, index):
+    """
+    Posició al catàleg de cada tipus de node (-1 si no hi és).
+    """
+    posicions = _mapar_valors(columna, lambda valor: index.get(normalitzar_node_type(valor), -1))
+    return posicions.fillna(-1).to_numpy(dtype=np.int64)
+
+
+def modelar_bloc(bloc, instancies, cost_dbu_job=COST_DBU_JOB, cost_dbu_all_purpose=COST_DBU_ALL_PURPOSE,
+                 multiplicador_photon=MULTIPLICADOR_PHOTON_PER_DEFECTE, configuracio=None):
+    """
+    Modela els registres d'un bloc de l'exportació i els redueix a sumes parcials per clúster i job.
+
+    Cada registre es modela com una tasca de la seva durada sense overhead (el spin-up ja és dins de la finestra
+    facturada). Les dades que falten al registre es prenen de `configuracio` (vegeu `llegir_configuracio_clusters`).
+    Els registres sense nombre de workers es compten a `registres_sense_workers` i no es modelen.
+
+    En un All-Purpose compartit, la facturació parteix cada finestra en un registre per job i cadascun correspon
+    al clúster sencer. Per això el model dels registres All-Purpose no es suma a la taula parcial sinó a una taula
+    per finestra, que `repartir_finestres` reparteix quan ja s'han llegit tots els blocs. Retorna la taula parcial
+    per clúster i job, la taula per finestra, un resum dels registres descartats i els tipus de node que no són al
+    catàleg.
+    """
+    resum = dict(_RESUM_BUIT, registres_llegits=len(bloc))
+    if configuracio is not None:
+        bloc = _completar_amb_configuracio(bloc, configuracio)
+    tipus = _mapar_valors(bloc['sku_name'], tipus_sku)
+    valid = tipus.notna().to_numpy().copy()
+    if 'usage_unit' in bloc:
+        valid &= (bloc['usage_unit'].fillna('DBU').str.upper() == 'DBU').to_numpy()
+    resum['registres_altres_sku'] = int((~valid).sum())
+    amb_cluster = bloc['cluster_id'].notna().to_numpy()
+    resum['registres_sense_cluster'] = int((valid & ~amb_cluster).sum())
+    valid &= amb_cluster
+
+    index, costos, dbus = _index_cataleg(instancies)
+    worker = _posicions(bloc['node_type'], index)
+    # Sense tipus de node del driver, es fa servir el dels workers
+    if 'driver_node_type' in bloc:
+        driver = np.where(bloc['driver_node_type'].isna().to_numpy(), worker,
+                          _posicions(bloc['driver_node_type'], index))
+    else:
+        driver = worker
+    amb_instancia = (worker >= 0) & (driver >= 0)
+    desconeguts = set(bloc['node_type'][valid & (worker < 0)].dropna().unique())
+    if 'driver_node_type' in bloc:
+        desconeguts |= set(bloc['driver_node_type'][valid & (driver < 0)].dropna().unique())
+    resum['registres_sense_instancia'] = int((valid & ~amb_instancia).sum())
+    valid &= amb_instancia
+
+    bloc = bloc[valid]
+    tipus = tipus[valid].to_numpy()
+    driver, worker = driver[valid], worker[valid]
+    if 'num_workers' in bloc:
+        nombre_workers = pd.to_numeric(bloc['num_workers']).to_numpy(dtype=np.float64)
+    else:
+        nombre_workers = np.full(len(bloc), np.nan)
+    sense_workers = np.isnan(nombre_workers)
+    resum['registres_sense_workers'] = int(sense_workers.sum())
+    resum['registres_modelats'] = len(bloc) - resum['registres_sense_workers']
+    if not len(bloc):
+        return combinar([]), combinar_finestres([]), resum, desconeguts
+
+    inici = pd.to_datetime(bloc['usage_start_time'], utc=True, format='ISO8601')
+    final = pd.to_datetime(bloc['usage_end_time'], utc=True, format='ISO8601')
+    minuts = ((final - inici).dt.total_seconds() / 60).clip(lower=0).to_numpy()
+    dbus_facturades = pd.to_numeric(bloc['usage_quantity']).to_numpy(dtype=np.float64)
+    if 'is_photon' in bloc:
+        photon = bloc['is_photon'].astype(str).str.lower().isin(('true', '1')).to_numpy().copy()
+    else:
+        photon = np.zeros(len(bloc), dtype=bool)
+    photon |= bloc['sku_name'].str.upper().str.contains('PHOTON').to_numpy()
+    multiplicador = np.where(photon, multiplicador_photon, 1.0)
+
+    es_job = tipus == TIPUS_JOB
+    preu_dbu = np.where(es_job, cost_dbu_job, cost_dbu_all_purpose)
+    hores = minuts / 60
+    # Sense nombre de workers, les columnes del model queden buides
+    total_dbus = dbus[driver] + nombre_workers * dbus[worker]
+    cost_vm_driver = costos[driver]
+    cost_vm_workers = nombre_workers * costos[worker]
+    cost_dbu = preu_dbu * multiplicador
+    _, cost_vm_job, cost_dbu_job_model, _, _ = calcular_cost_job_cluster_lot(
+        cost_vm_driver, cost_vm_workers, total_dbus, cost_dbu, 0.0, minuts, 1, 1)
+    _, cost_dbu_hora, cost_vm_hora, _ = calcular_cost_all_purpose_lot(
+        cost_vm_driver, cost_vm_workers, total_dbus, cost_dbu, minuts)
+    cost_vm_model = np.where(es_job, cost_vm_job, hores * cost_vm_hora)
+    cost_dbu_model = np.where(es_job, cost_dbu_job_model, hores * cost_dbu_hora)
+
+    cost_facturat = dbus_facturades * preu_dbu
+    if 'cost' in bloc:
+        facturat = pd.to_numeric(bloc['cost']).to_numpy(dtype=np.float64)
+        cost_facturat = np.where(np.isnan(facturat), cost_facturat, facturat)
+
+    noms = np.array([inst.name for inst in instancies], dtype=object)
+    registres = pd.DataFrame({
+        'cluster_id': bloc['cluster_id'].array,
+        'tipus': tipus,
+        'job_id': bloc['job_id'].array if 'job_id' in bloc else None,
+        'driver': noms[driver],
+        'worker': noms[worker],
+        'nombre_workers': nombre_workers,
+        'registres': 1,
+        'registres_sense_workers': sense_workers.astype(np.int64),
+        'inici': inici.array,
+        'final': final.array,
+        'minuts': minuts,
+        'dbus_facturades': dbus_facturades,
+        'cost_facturat': cost_facturat,
+        'dbus_model': total_dbus * multiplicador * hores,
+        'cost_dbu_model': cost_dbu_model,
+        'cost_vm_model': cost_vm_model,
+        'cost_total_model': cost_dbu_model + cost_vm_model,
+    })
+    compartit = tipus == TIPUS_ALL_PURPOSE
+    finestres = combinar_finestres([registres[compartit].set_index(_CLAUS_FINESTRA)])
+    registres.loc[compartit, list(_MODEL)] = 0.0
+    return combinar([registres.set_index(_CLAUS)]), finestres, resum, desconeguts
+
+
+def combinar(parcials):
+    """
+    Combina taules de sumes parcials per (clúster, job) en una de sola. Els registres sense job_id formen el seu
+    propi grup dins del clúster.
+    """
+    parcials = [parcial for parcial in parcials if len(parcial)]
+    if not parcials:
+        return pd.DataFrame(columns=list(_AGREGACIO), index=pd.MultiIndex.from_arrays([[], []], names=_CLAUS))
+    taula = pd.concat(parcials) if len(parcials) > 1 else parcials[0]
+    return taula.groupby(level=[0, 1], sort=False, dropna=False).agg(_AGREGACIO)
+
+
+def combinar_finestres(parcials):
+    """
+    Combina taules parcials per finestra facturada (clúster, job, inici i final) en una de sola. El model de la
+    finestra és el del clúster sencer i no se suma entre registres.
+    """
+    parcials = [parcial for parcial in parcials if len(parcial)]
+    if not parcials:
+        return pd.DataFrame(columns=list(_AGREGACIO_FINESTRA),
+                            index=pd.MultiIndex.from_arrays([[], [], [], []], names=_CLAUS_FINESTRA))
+    taula = pd.concat(parcials) if len(parcials) > 1 else parcials[0]
+    return taula.groupby(level=[0, 1, 2, 3], sort=False, dropna=False).agg(_AGREGACIO_FINESTRA)
+
+
+def repartir_finestres(finestres):
+    """
+    Reparteix el model de cada finestra entre els jobs que la comparteixen, en proporció a les DBUs facturades de
+    cada job (a parts iguals si la finestra no en té). Retorna les sumes del model per (clúster, job).
+    """
+    finestres = finestres.reset_index()
+    grups = finestres.groupby(['cluster_id', 'inici', 'final'], sort=False)['dbus_facturades']
+    total = grups.transform('sum').to_numpy(dtype=np.float64)
+    dbus_facturades = finestres['dbus_facturades'].to_numpy(dtype=np.float64)
+    quota = np.divide(dbus_facturades, total, out=1 / grups.transform('size').to_numpy(dtype=np.float64),
+                      where=total > 0)
+    model = finestres[list(_MODEL)].astype(np.float64).mul(quota, axis=0)
+    model[_CLAUS] = finestres[_CLAUS]
+    return model.groupby(_CLAUS, sort=False, dropna=False)[list(_MODEL)].sum()
+
+
+def _afegir_variacio(taula):
+    # Un clúster o job amb registres sense modelar no té un cost modelat comparable amb el facturat
+    incomplet = taula['registres_sense_workers'] > 0
+    for columna in _MODEL:
+        taula[columna] = taula[columna].mask(incomplet)
+    taula['variacio_dbus'] = taula['dbus_model'] - taula['dbus_facturades']
+    taula['variacio_cost'] = taula['cost_dbu_model'] - taula['cost_facturat']
+    facturat = taula['cost_facturat'].where(taula['cost_facturat'] != 0)
+    taula['variacio_pct'] = 100 * taula['variacio_cost'] / facturat
+    return taula
+
+
+def _modelar_en_paral_lel(blocs, processos, **opcions):
+    """
+    Modela els blocs repartint-los entre `processos` processos, amb un nombre limitat de blocs pendents perquè
+    la memòria no creixi.
+    """
+    if processos <= 1:
+        for bloc in blocs:
+            yield modelar_bloc(bloc, **opcions)
+        return
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        pendents = deque()
+        for bloc in blocs:
+            pendents.append(executor.submit(modelar_bloc, bloc, **opcions))
+            if len(pendents) >= 2 * processos:
+                yield pendents.popleft().result()
+        while pendents:
+            yield pendents.popleft().result()
+
+
+def conciliar_fitxer(entrada, instancies, mida_bloc=MIDA_BLOC_PER_DEFECTE, processos=1,
+                     cost_dbu_job=COST_DBU_JOB, cost_dbu_all_purpose=COST_DBU_ALL_PURPOSE,
+                     multiplicador_photon=MULTIPLICADOR_PHOTON_PER_DEFECTE, configuracio=None):
+    """
+    Calcula la variació entre el cost modelat i el facturat d'una exportació d'ús.
+
+    `configuracio` és la taula de `llegir_configuracio_clusters`, que completa els registres sense nombre de
+    workers o sense tipus de node. Els clústers i jobs amb registres que no s'han pogut modelar tenen les
+    columnes del model i de variació buides.
+
+    Retorna la taula per clúster, la taula per job (només registres amb job_id; el model de cada finestra d'un
+    All-Purpose compartit es reparteix entre els jobs que hi han corregut segons les DBUs facturades de cadascun)
+    i un resum amb el nombre de registres llegits, modelats i descartats i els tipus de node que no són al
+    catàleg. A la taula per job, `execucions` és el nombre de clústers diferents on ha corregut el job.
+    """
+    resum = dict(_RESUM_BUIT, node_types_desconeguts=set())
+    pendents, finestres = [], []
+    files_pendents = files_finestres = 0
+    for parcial, finestres_bloc, resum_bloc, desconeguts in _modelar_en_paral_lel(
+            llegir_blocs(entrada, mida_bloc), processos, instancies=instancies, cost_dbu_job=cost_dbu_job,
+            cost_dbu_all_purpose=cost_dbu_all_purpose, multiplicador_photon=multiplicador_photon,
+            configuracio=configuracio):
+        for clau, valor in resum_bloc.items():
+            resum[clau] += valor
+        resum['node_types_desconeguts'] |= desconeguts
+        pendents.append(parcial)
+        files_pendents += len(parcial)
+        if files_pendents > MAX_FILES_PARCIALS:
+            pendents = [combinar(pendents)]
+            files_pendents = len(pendents[0])
+        finestres.append(finestres_bloc)
+        files_finestres += len(finestres_bloc)
+        if files_finestres > MAX_FILES_PARCIALS:
+            finestres = [combinar_finestres(finestres)]
+            files_finestres = len(finestres[0])
+
+    parells = combinar(pendents).reset_index()
+    repartit = repartir_finestres(combinar_finestres(finestres)).reset_index()
+    parells = parells.merge(repartit, on=_CLAUS, how='left', suffixes=('', '_finestres'))
+    for columna in _MODEL:
+        parells[columna] = parells[columna] + parells.pop(f'{columna}_finestres').fillna(0.0)
+    clusters = parells.groupby('cluster_id', sort=False).agg(
+        nombre_jobs=('job_id', 'nunique'), **{columna: (columna, funcio) for columna, funcio in _AGREGACIO.items()})
+    clusters = _afegir_variacio(clusters)
+    clusters['nombre_workers'] = clusters['nombre_workers'].astype(np.float64)
+
+    jobs = parells[parells['job_id'].notna()].groupby('job_id', sort=False).agg(
+        tipus=('tipus', 'first'), execucions=('cluster_id', 'nunique'), registres=('registres', 'sum'),
+        registres_sense_workers=('registres_sense_workers', 'sum'), inici=('inici', 'min'), final=('final', 'max'),
+        **{columna: (columna, 'sum') for columna in _SUMES})
+    jobs = _afegir_variacio(jobs)
+    resum['node_types_desconeguts'] = sorted(resum['node_types_desconeguts'])
+    return clusters.reset_index(), jobs.reset_index(), resum
+
+
+def _desar(taula, ruta):
+    if os.path.splitext(ruta)[1].lower() in ('.parquet', '.pq'):
+        taula.to_parquet(ruta, index=False)
+    else:
+        taula.to_csv(ruta, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara el cost modelat amb el facturat d'una exportació "
+                                                 "de system.billing.usage, per clúster i per job.")
+    parser.add_argument('entrada', help="Exportació d'ús (.csv o .parquet)")
+    parser.add_argument('sortida', help="Fitxer de variació per clúster (.csv o .parquet)")
+    parser.add_argument('--jobs', help="Fitxer de variació per job (.csv o .parquet)")
+    parser.add_argument('--clusters', help="Configuració dels clústers (.csv o .parquet, p. ex. una exportació de "
+                                           "system.compute.clusters) per als registres sense num_workers")
+    parser.add_argument('--chunk-size', type=int, default=MIDA_BLOC_PER_DEFECTE,
+                        help="Nombre de registres per bloc (per defecte: %(default)s)")
+    parser.add_argument('--processos', type=int, default=1,
+                        help="Nombre de processos per modelar blocs en paral·lel (0 = tots els nuclis)")
+    parser.add_argument('--cataleg', help="Full de preus d'instàncies (.json o .csv); per defecte, les instàncies de l'aplicació")
+    parser.add_argument('--regio', help="Regió del catàleg a fer servir")
+    parser.add_argument('--modalitat', default=PREU_ON_DEMAND, help="Modalitat de preu (per defecte: %(default)s)")
+    parser.add_argument('--cost-dbu-job', type=float, help="€/DBU del Job Cluster (per defecte, el del catàleg)")
+    parser.add_argument('--cost-dbu-all-purpose', type=float,
+                        help="€/DBU de l'All-Purpose Cluster (per defecte, el del catàleg)")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size ha de ser com a mínim 1")
+
+    processos = args.processos if args.processos > 0 else (os.cpu_count() or 1)
+    try:
+        cataleg = carregar_cataleg(args.cataleg)
+        instancies = cataleg.instancies_per_nom(region=args.regio, pricing=args.modalitat)
+        cost_dbu_job = args.cost_dbu_job if args.cost_dbu_job is not None else cataleg.cost_dbu(True)
+        cost_dbu_all_purpose = (args.cost_dbu_all_purpose if args.cost_dbu_all_purpose is not None
+                                else cataleg.cost_dbu(False))
+        configuracio = llegir_configuracio_clusters(args.clusters) if args.clusters else None
+        clusters, jobs, resum = conciliar_fitxer(
+            args.entrada, instancies, mida_bloc=args.chunk_size, processos=processos, cost_dbu_job=cost_dbu_job,
+            cost_dbu_all_purpose=cost_dbu_all_purpose, multiplicador_photon=cataleg.photon_multiplier,
+            configuracio=configuracio)
+        _desar(clusters, args.sortida)
+        if args.jobs:
+            _desar(jobs, args.jobs)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"{resum['registres_modelats']} de {resum['registres_llegits']} registres modelats "
+          f"({len(clusters)} clústers, {len(jobs)} jobs)")
+    if resum['registres_sense_instancia']:
+        print(f"{resum['registres_sense_instancia']} registres amb tipus de node fora del catàleg: "
+              f"{', '.join(map(str, resum['node_types_desconeguts']))}", file=sys.stderr)
+    if resum['registres_sense_workers']:
+        print(f"{resum['registres_sense_workers']} registres sense nombre de workers no s'han modelat "
+              f"(vegeu --clusters)", file=sys.stderr)
+    modelats = clusters[clusters['registres_sense_workers'] == 0]
+    if len(modelats):
+        print(f"Cost DBU facturat: €{modelats['cost_facturat'].sum():.2f}, modelat: "
+              f"€{modelats['cost_dbu_model'].sum():.2f} (VM modelat: €{modelats['cost_vm_model'].sum():.2f}) "
+              f"en {len(modelats)} clústers modelats")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())